@@ -0,0 +1,113 @@
+# Range requests made by adjacent splits of a VCF read over HTTP, with and
+# without the block cache, against a local server standing in for S3.
+#
+# usage: PYTHONPATH=shared_resources/python-modules/python \
+#   python benchmarks/block_cache.py <bgzipped and indexed vcf> <chrom> <start> <end> [splits]
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+import os
+import sys
+import threading
+import time
+
+from shared.vcfutils import VcfReader, block_cache
+
+
+class RangeHandler(SimpleHTTPRequestHandler):
+    gets = 0
+
+    def log_message(self, *args):
+        pass
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return None
+        size = os.path.getsize(path)
+        stat = os.stat(path)
+        start, end = 0, size - 1
+        ranged = self.headers.get("Range")
+        if ranged:
+            first, last = ranged[len("bytes=") :].split("-")
+            start, end = int(first), min(int(last), size - 1)
+            if start >= size:
+                self.send_error(416)
+                return None
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("ETag", f'"{stat.st_mtime_ns}"')
+        self.end_headers()
+        f = open(path, "rb")
+        f.seek(start)
+        self.remaining = end - start + 1
+        return f
+
+    def do_GET(self):
+        RangeHandler.gets += 1
+        f = self.send_head()
+        if f:
+            with f:
+                self.wfile.write(f.read(self.remaining))
+
+
+def read_splits(location, chrom, start, end, splits, etag, scan=False):
+    step = (end - start) // splits + 1
+    regions = [(s, min(end, s + step - 1)) for s in range(start, end + 1, step)]
+    records = []
+    reader = VcfReader(location, etag=etag)
+    if scan:
+        # the regions of a multi-region payload are prefetched together
+        reader.prefetch(chrom, regions)
+    for region_start, region_end in regions:
+        # otherwise a reader per split, as in separate invocations of a container
+        if not scan:
+            reader = VcfReader(location, etag=etag)
+        records.extend(
+            (record.pos, record.ref, record.alts)
+            for record in reader.fetch(chrom, region_start, region_end)
+        )
+    return records
+
+
+def main(vcf, chrom, start, end, splits):
+    directory, name = os.path.split(os.path.abspath(vcf))
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", 0), lambda *args: RangeHandler(*args, directory=directory)
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    location = f"http://127.0.0.1:{server.server_port}/{name}"
+    etag = VcfReader(location).source.etag()
+
+    print("cache\tsplits\tGET requests\tseconds\trecords")
+    results = []
+    runs = [
+        ("off", None, False),
+        ("cold", etag, False),
+        ("warm", etag, False),
+        ("scan", etag, True),
+    ]
+    for label, split_etag, scan in runs:
+        if label in ("cold", "scan"):
+            block_cache.clear()
+        RangeHandler.gets = 0
+        begin = time.perf_counter()
+        records = read_splits(location, chrom, start, end, splits, split_etag, scan)
+        seconds = time.perf_counter() - begin
+        results.append(records)
+        print(f"{label}\t{splits}\t{RangeHandler.gets}\t{seconds:.3f}\t{len(records)}")
+    assert all(records == results[0] for records in results)
+    print(f"cached blocks: {len(block_cache.blocks)} ({block_cache.size} bytes)")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main(
+        sys.argv[1],
+        sys.argv[2],
+        int(sys.argv[3]),
+        int(sys.argv[4]),
+        int(sys.argv[5]) if len(sys.argv) > 5 else 20,
+    )
@@ -0,0 +1,64 @@
+# Compares the genotype counting used when INFO/AC or INFO/AN are missing
+# with the regex based implementation it replaced.
+#
+# usage: PYTHONPATH=shared_resources/python-modules/python \
+#   python benchmarks/genotype_counting.py [samples ...]
+from itertools import compress, count
+import random
+import re
+import sys
+import time
+
+from shared.vcfutils import allele_counts, carrier_mask
+
+
+RECORDS = 200
+ALTS = 2
+HITS = [1]
+get_all_calls = re.compile("[0-9]+").findall
+
+
+def make_genotypes(samples):
+    alleles = [0] * 6 + list(range(1, ALTS + 1)) + ["."]
+    return ",".join(
+        f"{random.choice(alleles)}|{random.choice(alleles)}" for _ in range(samples)
+    )
+
+
+def regex_counts(genotypes):
+    all_calls = [int(g) for g in get_all_calls(genotypes)]
+    hit_set = set(HITS)
+    call_count = sum(1 for call in all_calls if call in hit_set)
+    hit_string = "|".join(str(i) for i in HITS)
+    pattern = re.compile(f"(^|[|/])({hit_string})([|/]|$)")
+    carriers = [i for i, gt in enumerate(genotypes.split(",")) if pattern.search(gt)]
+    return call_count, len(all_calls), carriers
+
+
+def string_counts(genotypes):
+    calls = allele_counts(genotypes, ALTS)
+    carriers = list(compress(count(), carrier_mask(genotypes, HITS, ALTS)))
+    return sum(calls[i] for i in HITS), sum(calls), carriers
+
+
+def measure(counter, records):
+    start = time.perf_counter()
+    results = [counter(genotypes) for genotypes in records]
+    return len(records) / (time.perf_counter() - start), results
+
+
+def main(sample_counts):
+    random.seed(0)
+    print("samples\tregex records/s\tstring records/s\tspeedup")
+    for samples in sample_counts:
+        records = [make_genotypes(samples) for _ in range(RECORDS)]
+        regex_rate, expected = measure(regex_counts, records)
+        string_rate, results = measure(string_counts, records)
+        assert results == expected
+        print(
+            f"{samples}\t{regex_rate:.0f}\t{string_rate:.0f}\t{string_rate / regex_rate:.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [100, 1000, 10000, 100000])
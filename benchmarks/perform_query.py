@@ -0,0 +1,144 @@
+# Runs query_engine.perform_query over synthetic VCFs for every granularity
+# and variant type, printing one JSON line per case with records/s, latency
+# percentiles and the peak RSS of the process that ran the case.
+#
+# usage: PYTHONPATH=shared_resources/python-modules/python:lambda/performQuery \
+#   python benchmarks/perform_query.py [--quick] [--bcftools] [--calls N] [--dir DIR]
+# needs the environment of the performQuery lambda; the split cache is
+# disabled so that every call scans, sidecar lookups are warmed up first.
+# records are those of the queried regions, boolean queries can stop early
+import argparse
+import bisect
+import contextlib
+import json
+import multiprocessing
+import os
+import random
+import resource
+import time
+
+from synthetic_vcf import VcfSpec, write_vcf
+
+
+GRANULARITIES = ["boolean", "count", "record"]
+VARIANT_TYPES = [None, "SNP", "DEL", "INS", "DUP", "DUP:TANDEM", "CNV", "INV"]
+SPECS = [
+    VcfSpec(samples=10, records=50000),
+    VcfSpec(samples=1000, records=10000),
+    VcfSpec(samples=1000, records=10000, ac_an=False),
+    VcfSpec(samples=100, records=20000, spacing=5000),
+    VcfSpec(samples=100, records=20000, multiallelic_rate=0.5, sv_rate=0.2),
+]
+QUICK_SPECS = [
+    VcfSpec(samples=10, records=5000),
+    VcfSpec(samples=200, records=2000, ac_an=False),
+]
+REGION_WIDTH = 100000
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def make_payload(location, region, granularity, variant_type):
+    return {
+        "region": region,
+        "vcf_location": location,
+        "reference_bases": "N",
+        "alternate_bases": "N",
+        "variant_type": variant_type,
+        "end_min": 0,
+        "end_max": 0,
+        "variant_min_length": 0,
+        "variant_max_length": -1,
+        "requested_granularity": granularity,
+        "include_details": True,
+        "include_samples": granularity == "record",
+        "samples": [],
+        "dataset_id": "benchmark",
+    }
+
+
+def run_case(location, regions, granularity, variant_type, bcftools):
+    # runs in a fresh process so that its peak RSS belongs to the case
+    import query_engine
+    import split_cache
+
+    split_cache.split_cache.tiers = []
+    if bcftools:
+        query_engine.is_supported_location = lambda location: False
+
+    latencies = []
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        # index, header and sidecar lookups of a warm container
+        query_engine.perform_query(
+            make_payload(location, regions[0][0], granularity, variant_type)
+        )
+        for region, _ in regions:
+            payload = make_payload(location, region, granularity, variant_type)
+            start = time.perf_counter()
+            query_engine.perform_query(payload)
+            latencies.append(time.perf_counter() - start)
+
+    return {
+        "latencies": latencies,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        # bcftools processes
+        "children_peak_rss_kb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    }
+
+
+def make_regions(spec, positions, calls):
+    rng = random.Random(spec.seed)
+    regions = []
+    for _ in range(calls):
+        chrom = rng.choice(spec.chromosomes)
+        start = rng.randint(1, max(1, positions[chrom][-1] - REGION_WIDTH))
+        end = start + REGION_WIDTH - 1
+        scanned = bisect.bisect_right(positions[chrom], end) - bisect.bisect_left(
+            positions[chrom], start
+        )
+        regions.append((f"{chrom}:{start}-{end}", scanned))
+    return regions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--quick", action="store_true")
+    parser.add_argument("--bcftools", action="store_true")
+    parser.add_argument("--calls", type=int, default=20)
+    parser.add_argument("--dir", default="/tmp/perform-query-benchmark")
+    args = parser.parse_args()
+    os.makedirs(args.dir, exist_ok=True)
+    context = multiprocessing.get_context("spawn")
+
+    for spec in QUICK_SPECS if args.quick else SPECS:
+        location = os.path.join(args.dir, spec.name() + ".vcf.gz")
+        positions = write_vcf(location, spec)
+        regions = make_regions(spec, positions, args.calls)
+        scanned = sum(count for _, count in regions)
+
+        for granularity in GRANULARITIES:
+            for variant_type in VARIANT_TYPES:
+                with context.Pool(1) as pool:
+                    case = (location, regions, granularity, variant_type, args.bcftools)
+                    result = pool.apply(run_case, case)
+                latencies = result.pop("latencies")
+                summary = {
+                    "vcf": spec.name(),
+                    "engine": "bcftools" if args.bcftools else "reader",
+                    "granularity": granularity,
+                    "variant_type": variant_type,
+                    "calls": len(latencies),
+                    "records_scanned": scanned,
+                    "records_per_s": round(scanned / sum(latencies)),
+                }
+                for name, fraction in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99)):
+                    latency = percentile(latencies, fraction)
+                    summary[f"latency_{name}_ms"] = round(latency * 1000, 2)
+                summary["latency_max_ms"] = round(max(latencies) * 1000, 2)
+                print(json.dumps({**summary, **result}), flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# Records per second through the predicates of performQuery for each
+# variant type, over in-memory records so that only filtering is measured.
+#
+# usage: PYTHONPATH=shared_resources/python-modules/python:lambda/performQuery \
+#   python benchmarks/record_filtering.py [records]
+import random
+import sys
+import time
+
+from shared.vcfutils import VcfRecord
+from record_filter import RecordFilter
+
+
+VARIANT_TYPES = [None, "SNP", "DEL", "INS", "DUP", "DUP:TANDEM", "CNV", "BND"]
+SYMBOLIC = ["<DEL>", "<INS>", "<DUP>", "<DUP:TANDEM>", "<CN0>", "<CN2>", "<INV>"]
+
+
+class NotCancelled:
+    def is_cancelled(self):
+        return False
+
+
+def make_records(count):
+    records = []
+    pos = 1
+    for _ in range(count):
+        pos += random.randint(1, 100)
+        ref = random.choice(["A", "C", "G", "T", "AC", "ACG"])
+        if random.random() < 0.1:
+            alts = [random.choice(SYMBOLIC)]
+        else:
+            alts = random.sample(["A", "C", "G", "T", "AT", ref + ref], random.randint(1, 2))
+        records.append(VcfRecord("chr1", pos, ref, alts, "AC=1;AN=2"))
+    return records
+
+
+def measure(records, variant_type, alternate_bases="N"):
+    matches = RecordFilter(
+        iter(records),
+        first_base_pos=1,
+        last_base_pos=records[-1].pos,
+        reference_bases="N",
+        alternate_bases=alternate_bases,
+        variant_type=variant_type,
+        variant_min_length=0,
+        variant_max_length=float("inf"),
+        cancellation=NotCancelled(),
+    )
+    start = time.perf_counter()
+    hits = sum(1 for _ in matches)
+    return len(records) / (time.perf_counter() - start), hits
+
+
+def main(count):
+    random.seed(0)
+    records = make_records(count)
+    print("variant_type\talternate_bases\trecords/s\thits")
+    for variant_type in VARIANT_TYPES:
+        rate, hits = measure(records, variant_type)
+        print(f"{variant_type}\tN\t{rate:.0f}\t{hits}")
+    rate, hits = measure(records, None, "T")
+    print(f"None\tT\t{rate:.0f}\t{hits}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
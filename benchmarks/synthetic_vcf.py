@@ -0,0 +1,211 @@
+# Writes synthetic bgzipped VCFs with a tabix index for the benchmarks,
+# without htslib, so that generated files are identical on every machine.
+#
+# usage: python benchmarks/synthetic_vcf.py <path.vcf.gz> [samples] [records]
+from dataclasses import dataclass
+import random
+import struct
+import sys
+import zlib
+
+
+BGZF_EOF = bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000")
+# uncompressed bytes per block, as written by bgzip
+BLOCK_DATA_SIZE = 0xFF00
+TBI_MIN_SHIFT = 14
+TBI_DEPTH = 5
+META_BIN = 37450
+SYMBOLIC_ALTS = ["<DEL>", "<INS>", "<DUP>", "<DUP:TANDEM>", "<CN0>", "<CN2>", "<INV>"]
+BASES = "ACGT"
+
+
+@dataclass
+class VcfSpec:
+    samples: int = 100
+    # records of each chromosome
+    records: int = 20000
+    chromosomes: tuple = ("chr1",)
+    # mean distance between records in bases
+    spacing: int = 100
+    multiallelic_rate: float = 0.1
+    sv_rate: float = 0.05
+    ac_an: bool = True
+    seed: int = 0
+
+    def name(self):
+        return (
+            f"s{self.samples}-r{self.records}-d{self.spacing}"
+            f"-m{self.multiallelic_rate}-sv{self.sv_rate}-{'acan' if self.ac_an else 'gt'}"
+        )
+
+
+class BgzfWriter:
+    def __init__(self, file):
+        self.file = file
+        self.buffer = bytearray()
+        self.block_offset = 0
+
+    def tell(self):
+        # virtual offset of the next byte
+        return (self.block_offset << 16) | len(self.buffer)
+
+    def write(self, data):
+        self.buffer += data
+        while len(self.buffer) >= BLOCK_DATA_SIZE:
+            self.flush_block(BLOCK_DATA_SIZE)
+
+    def flush_block(self, size):
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+        cdata = compressor.compress(data) + compressor.flush()
+        header = struct.pack(
+            "<4BI2BH2BHH", 31, 139, 8, 4, 0, 0, 255, 6, 66, 67, 2, len(cdata) + 25
+        )
+        trailer = struct.pack("<II", zlib.crc32(data), len(data))
+        self.file.write(header + cdata + trailer)
+        self.block_offset += len(header) + len(cdata) + len(trailer)
+
+    def close(self):
+        if self.buffer:
+            self.flush_block(len(self.buffer))
+        self.file.write(BGZF_EOF)
+
+
+def reg2bin(beg, end):
+    # smallest bin containing the 0-based half open interval [beg, end)
+    end -= 1
+    shift = TBI_MIN_SHIFT
+    for level in range(TBI_DEPTH, 0, -1):
+        if beg >> shift == end >> shift:
+            return ((1 << (3 * level)) - 1) // 7 + (beg >> shift)
+        shift += 3
+    return 0
+
+
+class TabixIndexer:
+    def __init__(self, names):
+        self.names = names
+        # per reference: bin -> chunks, linear index, first and last offsets, count
+        self.bins = [dict() for _ in names]
+        self.intervals = [[] for _ in names]
+        self.extents = [None for _ in names]
+        self.counts = [0 for _ in names]
+
+    def add(self, ref, beg, end, voffset_beg, voffset_end):
+        chunks = self.bins[ref].setdefault(reg2bin(beg, end), [])
+        if chunks and chunks[-1][1] == voffset_beg:
+            chunks[-1][1] = voffset_end
+        else:
+            chunks.append([voffset_beg, voffset_end])
+        intervals = self.intervals[ref]
+        for window in range(beg >> TBI_MIN_SHIFT, ((end - 1) >> TBI_MIN_SHIFT) + 1):
+            while len(intervals) <= window:
+                intervals.append(None)
+            if intervals[window] is None:
+                intervals[window] = voffset_beg
+        first = self.extents[ref][0] if self.extents[ref] else voffset_beg
+        self.extents[ref] = (first, voffset_end)
+        self.counts[ref] += 1
+
+    def serialise(self):
+        names = b"".join(name.encode() + b"\x00" for name in self.names)
+        # VCF preset: sequence, begin and end columns with # comments
+        data = bytearray(b"TBI\x01")
+        data += struct.pack("<8i", len(self.names), 2, 1, 2, 0, ord("#"), 0, len(names))
+        data += names
+        for ref in range(len(self.names)):
+            bins = dict(self.bins[ref])
+            if self.extents[ref]:
+                bins[META_BIN] = [list(self.extents[ref]), [self.counts[ref], 0]]
+            data += struct.pack("<i", len(bins))
+            for bin, chunks in sorted(bins.items()):
+                data += struct.pack("<Ii", bin, len(chunks))
+                for chunk_beg, chunk_end in chunks:
+                    data += struct.pack("<QQ", chunk_beg, chunk_end)
+            # empty windows point at the next record
+            intervals = self.intervals[ref]
+            following = 0
+            for window in range(len(intervals) - 1, -1, -1):
+                if intervals[window] is None:
+                    intervals[window] = following
+                following = intervals[window]
+            data += struct.pack(f"<i{len(intervals)}Q", len(intervals), *intervals)
+        return bytes(data)
+
+
+def make_record(rng, spec):
+    ref = rng.choice(["A", "C", "G", "T", "AC", "ACG"])
+    if rng.random() < spec.sv_rate:
+        alts = [rng.choice(SYMBOLIC_ALTS)]
+    else:
+        count = 2 + (rng.random() < 0.3) if rng.random() < spec.multiallelic_rate else 1
+        candidates = dict.fromkeys([*BASES, "AT", ref + ref, ref[0]])
+        alts = rng.sample([a for a in candidates if a != ref], count)
+    weights = [0.8] + [0.2 / len(alts)] * len(alts)
+    alleles = rng.choices(range(len(alts) + 1), weights, k=2 * spec.samples)
+    genotypes = [f"{a}|{b}" for a, b in zip(alleles[::2], alleles[1::2])]
+    if spec.ac_an:
+        ac = ",".join(str(alleles.count(n)) for n in range(1, len(alts) + 1))
+        info = f"AC={ac};AN={len(alleles)}"
+    else:
+        info = "."
+    return ref, alts, info, genotypes
+
+
+def write_vcf(path, spec):
+    """
+    Writes a bgzipped VCF and its .tbi index to path, returns the sorted
+    positions of every chromosome so that scanned records can be counted.
+    """
+    rng = random.Random(spec.seed)
+    sample_names = [f"S{n}" for n in range(spec.samples)]
+    header = [
+        "##fileformat=VCFv4.2",
+        *(f"##contig=<ID={chrom},length=250000000>" for chrom in spec.chromosomes),
+        '##INFO=<ID=AC,Number=A,Type=Integer,Description="Allele count">',
+        '##INFO=<ID=AN,Number=1,Type=Integer,Description="Allele number">',
+        '##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">',
+        "\t".join(
+            ["#CHROM", "POS", "ID", "REF", "ALT", "QUAL", "FILTER", "INFO", "FORMAT"]
+            + sample_names
+        ),
+    ]
+    indexer = TabixIndexer(list(spec.chromosomes))
+    positions = {}
+
+    with open(path, "wb") as f:
+        writer = BgzfWriter(f)
+        writer.write(("\n".join(header) + "\n").encode())
+        for ref_id, chrom in enumerate(spec.chromosomes):
+            pos = 0
+            positions[chrom] = []
+            for _ in range(spec.records):
+                pos += rng.randint(1, 2 * spec.spacing - 1)
+                ref, alts, info, genotypes = make_record(rng, spec)
+                line = "\t".join(
+                    [chrom, str(pos), ".", ref, ",".join(alts), ".", "PASS", info, "GT"]
+                    + genotypes
+                )
+                begin = writer.tell()
+                writer.write((line + "\n").encode())
+                indexer.add(ref_id, pos - 1, pos - 1 + len(ref), begin, writer.tell())
+                positions[chrom].append(pos)
+        writer.close()
+
+    with open(path + ".tbi", "wb") as f:
+        writer = BgzfWriter(f)
+        writer.write(indexer.serialise())
+        writer.close()
+
+    return positions
+
+
+if __name__ == "__main__":
+    write_vcf(
+        sys.argv[1],
+        VcfSpec(
+            samples=int(sys.argv[2]) if len(sys.argv) > 2 else 100,
+            records=int(sys.argv[3]) if len(sys.argv) > 3 else 20000,
+        ),
+    )
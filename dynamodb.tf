@@ -147,3 +147,36 @@ resource "aws_dynamodb_table" "variant_query_responses" {
     enabled        = true
   }
 }
+
+# this table holds rolling latencies of the query lambdas
+# used to choose the fan out parallelism of variant searches
+resource "aws_dynamodb_table" "invocation_stats" {
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "id"
+  name         = "InvocationStats"
+  tags         = var.common-tags
+
+  attribute {
+    name = "id"
+    type = "S"
+  }
+}
+
+# this table holds performQuery results keyed by vcf etag and predicate
+# shared by all queries touching the same split
+resource "aws_dynamodb_table" "split_results" {
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "id"
+  name         = "SplitResults"
+  tags         = var.common-tags
+
+  attribute {
+    name = "id"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "timeToExist"
+    enabled        = true
+  }
+}
@@ -26,6 +26,7 @@ data "aws_iam_policy_document" "lambda-submitDataset" {
     ]
     resources = [
       aws_dynamodb_table.datasets.arn,
+      aws_dynamodb_table.variant_queries.arn,
     ]
   }
 
@@ -45,7 +46,10 @@ data "aws_iam_policy_document" "lambda-submitDataset" {
     actions = [
       "lambda:InvokeFunction",
     ]
-    resources = [module.lambda-indexer.lambda_function_arn]
+    resources = [
+      module.lambda-indexer.lambda_function_arn,
+      module.lambda-summariseVcf.lambda_function_arn,
+    ]
   }
 }
 
@@ -136,6 +140,7 @@ data "aws_iam_policy_document" "lambda-getAnalyses" {
     ]
     resources = [
       aws_dynamodb_table.variant_queries.arn,
+      aws_dynamodb_table.variant_query_responses.arn,
     ]
   }
 
@@ -163,6 +168,7 @@ data "aws_iam_policy_document" "lambda-getAnalyses" {
   statement {
     actions = [
       "lambda:InvokeFunction",
+      "lambda:GetFunctionConcurrency",
     ]
     resources = [module.lambda-splitQuery.lambda_function_arn]
   }
@@ -198,6 +204,7 @@ data "aws_iam_policy_document" "lambda-getGenomicVariants" {
     ]
     resources = [
       aws_dynamodb_table.variant_queries.arn,
+      aws_dynamodb_table.variant_query_responses.arn,
     ]
   }
 
@@ -219,6 +226,7 @@ data "aws_iam_policy_document" "lambda-getGenomicVariants" {
   statement {
     actions = [
       "lambda:InvokeFunction",
+      "lambda:GetFunctionConcurrency",
     ]
     resources = [module.lambda-splitQuery.lambda_function_arn]
   }
@@ -262,6 +270,7 @@ data "aws_iam_policy_document" "lambda-getIndividuals" {
     ]
     resources = [
       aws_dynamodb_table.variant_queries.arn,
+      aws_dynamodb_table.variant_query_responses.arn,
     ]
   }
 
@@ -289,6 +298,7 @@ data "aws_iam_policy_document" "lambda-getIndividuals" {
   statement {
     actions = [
       "lambda:InvokeFunction",
+      "lambda:GetFunctionConcurrency",
     ]
     resources = [module.lambda-splitQuery.lambda_function_arn]
   }
@@ -324,6 +334,7 @@ data "aws_iam_policy_document" "lambda-getBiosamples" {
     ]
     resources = [
       aws_dynamodb_table.variant_queries.arn,
+      aws_dynamodb_table.variant_query_responses.arn,
     ]
   }
 
@@ -351,6 +362,7 @@ data "aws_iam_policy_document" "lambda-getBiosamples" {
   statement {
     actions = [
       "lambda:InvokeFunction",
+      "lambda:GetFunctionConcurrency",
     ]
     resources = [module.lambda-splitQuery.lambda_function_arn]
   }
@@ -386,6 +398,7 @@ data "aws_iam_policy_document" "lambda-getDatasets" {
     ]
     resources = [
       aws_dynamodb_table.variant_queries.arn,
+      aws_dynamodb_table.variant_query_responses.arn,
     ]
   }
 
@@ -413,6 +426,7 @@ data "aws_iam_policy_document" "lambda-getDatasets" {
   statement {
     actions = [
       "lambda:InvokeFunction",
+      "lambda:GetFunctionConcurrency",
     ]
     resources = [module.lambda-splitQuery.lambda_function_arn]
   }
@@ -448,6 +462,7 @@ data "aws_iam_policy_document" "lambda-getCohorts" {
     ]
     resources = [
       aws_dynamodb_table.variant_queries.arn,
+      aws_dynamodb_table.variant_query_responses.arn,
     ]
   }
 
@@ -494,6 +509,7 @@ data "aws_iam_policy_document" "lambda-getRuns" {
     ]
     resources = [
       aws_dynamodb_table.variant_queries.arn,
+      aws_dynamodb_table.variant_query_responses.arn,
     ]
   }
 
@@ -521,6 +537,7 @@ data "aws_iam_policy_document" "lambda-getRuns" {
   statement {
     actions = [
       "lambda:InvokeFunction",
+      "lambda:GetFunctionConcurrency",
     ]
     resources = [module.lambda-splitQuery.lambda_function_arn]
   }
@@ -547,6 +564,16 @@ data "aws_iam_policy_document" "lambda-indexer" {
       aws_sns_topic.indexer.arn,
     ]
   }
+
+  statement {
+    actions = [
+      "dynamodb:DescribeTable",
+      "dynamodb:UpdateItem",
+    ]
+    resources = [
+      aws_dynamodb_table.variant_queries.arn,
+    ]
+  }
 }
 
 #
@@ -560,6 +587,16 @@ data "aws_iam_policy_document" "lambda-splitQuery" {
     resources = [module.lambda-performQuery.lambda_function_arn]
   }
 
+  statement {
+    actions = [
+      "dynamodb:DescribeTable",
+      "dynamodb:GetItem",
+    ]
+    resources = [
+      aws_dynamodb_table.variant_queries.arn,
+    ]
+  }
+
   statement {
     actions = [
       "SNS:Publish",
@@ -568,6 +605,14 @@ data "aws_iam_policy_document" "lambda-splitQuery" {
       aws_sns_topic.performQuery.arn,
     ]
   }
+
+  statement {
+    actions = [
+      "s3:GetObject",
+      "s3:PutObject",
+    ]
+    resources = ["${aws_s3_bucket.variants-bucket.arn}/variant-queries/*"]
+  }
 }
 
 #
@@ -585,6 +630,7 @@ data "aws_iam_policy_document" "lambda-performQuery" {
       aws_dynamodb_table.datasets.arn,
       aws_dynamodb_table.variant_queries.arn,
       aws_dynamodb_table.variant_query_responses.arn,
+      aws_dynamodb_table.split_results.arn,
     ]
   }
 
@@ -598,6 +644,39 @@ data "aws_iam_policy_document" "lambda-performQuery" {
   }
 }
 
+#
+# summariseVcf Lambda Function
+#
+data "aws_iam_policy_document" "lambda-summariseVcf" {
+  statement {
+    actions = [
+      "s3:GetObject",
+      "s3:ListBucket",
+    ]
+    resources = ["*"]
+  }
+
+  statement {
+    actions = [
+      "s3:PutObject",
+      "s3:CreateMultipartUpload",
+      "s3:UploadPart",
+      "s3:CompleteMultipartUpload",
+    ]
+    resources = ["${aws_s3_bucket.variants-bucket.arn}/*"]
+  }
+
+  statement {
+    actions = [
+      "dynamodb:DescribeTable",
+      "dynamodb:UpdateItem",
+    ]
+    resources = [
+      aws_dynamodb_table.variant_queries.arn,
+    ]
+  }
+}
+
 # 
 # Generic IAM policies
 # 
@@ -672,6 +751,21 @@ data "aws_iam_policy_document" "dynamodb-onto-write-access" {
   }
 }
 
+# DynamoDB Invocation Statistics Access
+data "aws_iam_policy_document" "dynamodb-invocation-stats-access" {
+  statement {
+    actions = [
+      "dynamodb:DescribeTable",
+      "dynamodb:GetItem",
+      "dynamodb:PutItem",
+      "dynamodb:UpdateItem",
+    ]
+    resources = [
+      aws_dynamodb_table.invocation_stats.arn,
+    ]
+  }
+}
+
 # Admin Lambda Access
 data "aws_iam_policy_document" "admin-lambda-access" {
   statement {
@@ -5,6 +5,7 @@ from route_analyses_filtering_terms import route as route_analyses_filtering_ter
 from route_analyses_id import route as route_analyses_id
 from route_analyses_id_g_variants import route as route_analyses_id_g_variants
 from shared.apiutils import parse_request, bundle_response
+from shared.variantutils import cached_route
 
 
 def lambda_handler(event, context):
@@ -26,8 +27,11 @@ def lambda_handler(event, context):
         )
 
     elif event["resource"] == "/analyses/{id}/g_variants":
-        return route_analyses_id_g_variants(
-            request_params, event["pathParameters"].get("id", None)
+        return cached_route(
+            event,
+            route_analyses_id_g_variants,
+            request_params,
+            event["pathParameters"].get("id", None),
         )
 
 
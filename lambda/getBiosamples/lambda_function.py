@@ -7,6 +7,7 @@ from route_biosamples_id_analyses import route as route_biosamples_id_analyses
 from route_biosamples_id_runs import route as route_biosamples_id_runs
 from route_biosamples_filtering_terms import route as route_biosamples_filtering_terms
 from shared.apiutils import parse_request, bundle_response
+from shared.variantutils import cached_route
 
 
 def lambda_handler(event, context):
@@ -25,8 +26,11 @@ def lambda_handler(event, context):
         )
 
     elif event["resource"] == "/biosamples/{id}/g_variants":
-        return route_biosamples_id_g_variants(
-            request_params, event["pathParameters"].get("id", None)
+        return cached_route(
+            event,
+            route_biosamples_id_g_variants,
+            request_params,
+            event["pathParameters"].get("id", None),
         )
 
     elif event["resource"] == "/biosamples/{id}/analyses":
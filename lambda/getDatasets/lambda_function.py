@@ -7,6 +7,7 @@ from route_datasets_id_biosamples import route as route_datasets_id_biosamples
 from route_datasets_id_individuals import route as route_datasets_id_individuals
 from route_datasets_id_filtering_terms import route as route_datasets_id_filtering_terms
 from shared.apiutils import bundle_response, parse_request
+from shared.variantutils import cached_route
 
 
 def lambda_handler(event, context):
@@ -25,8 +26,11 @@ def lambda_handler(event, context):
         )
 
     elif event["resource"] == "/datasets/{id}/g_variants":
-        return route_datasets_id_g_variants(
-            request_params, event["pathParameters"].get("id", None)
+        return cached_route(
+            event,
+            route_datasets_id_g_variants,
+            request_params,
+            event["pathParameters"].get("id", None),
         )
 
     elif event["resource"] == "/datasets/{id}/biosamples":
@@ -2,10 +2,13 @@ from collections import defaultdict
 import json
 import base64
 
-from shared.variantutils import perform_variant_search
+from shared.variantutils import (
+    count_from_tiles,
+    get_catalog_datasets,
+    perform_variant_search,
+)
 from shared.utils import ENV_ATHENA
 from shared.athena import (
-    Dataset,
     parse_datasets_with_samples,
     entity_search_conditions,
     run_custom_query,
@@ -37,16 +40,6 @@ def datasets_query(conditions, assembly_id, dataset_id):
     return query
 
 
-def datasets_query_fast(assembly_id, dataset_id):
-    query = f"""
-    SELECT id, _vcflocations, _vcfchromosomemap
-    FROM "{ENV_ATHENA.ATHENA_METADATA_DATABASE}"."{ENV_ATHENA.ATHENA_DATASETS_TABLE}"
-    WHERE _assemblyid='{assembly_id}' 
-    AND id='{dataset_id}'
-    """
-    return query
-
-
 def route(request: RequestParams, dataset_id):
     conditions, execution_parameters = entity_search_conditions(
         request.query.filters, "analyses", "datasets", id_modifier="A.id"
@@ -64,12 +57,32 @@ def route(request: RequestParams, dataset_id):
         )
         datasets, samples = parse_datasets_with_samples(exec_id)
     else:
-        query = datasets_query_fast(query_params.assembly_id, dataset_id)
-        datasets = Dataset.get_by_query(
-            query, execution_parameters=execution_parameters
-        )
+        # datasets come from the catalog unless samples are restricted
+        datasets = get_catalog_datasets(query_params.assembly_id, dataset_id)
         samples = []
 
+    # counts of whole tiles are precomputed, only the edges of the range and
+    # tiles with variants in more than one vcf are scanned
+    if request.query.requested_granularity == Granularity.COUNT and check_all:
+        count = count_from_tiles(
+            datasets=datasets,
+            reference_name=query_params.reference_name,
+            reference_bases=query_params.reference_bases,
+            alternate_bases=query_params.alternate_bases,
+            start=query_params.start,
+            end=query_params.end,
+            variant_type=query_params.variant_type,
+            variant_min_length=query_params.variant_min_length,
+            variant_max_length=query_params.variant_max_length,
+            dataset_samples=samples,
+        )
+        if count is not None:
+            response = build_beacon_count_response(
+                {}, count, request, {}, DefaultSchemas.GENOMICVARIATIONS
+            )
+            print("Returning Response: {}".format(json.dumps(response)))
+            return bundle_response(200, response)
+
     query_responses = perform_variant_search(
         datasets=datasets,
         reference_name=query_params.reference_name,
@@ -5,6 +5,7 @@ from route_g_variants_id import route as route_g_variants_id
 from route_g_variants_id_individuals import route as route_g_variants_id_individuals
 from route_g_variants_id_biosamples import route as route_g_variants_id_biosamples
 from shared.apiutils import parse_request, bundle_response
+from shared.variantutils import cached_route
 
 
 def lambda_handler(event, context):
@@ -15,21 +16,30 @@ def lambda_handler(event, context):
         return bundle_response(status, errors)
 
     if event["resource"] == "/g_variants":
-        return route_g_variants(request_params)
+        return cached_route(event, route_g_variants, request_params)
 
     elif event["resource"] == "/g_variants/{id}":
-        return route_g_variants_id(
-            request_params, event["pathParameters"].get("id", None)
+        return cached_route(
+            event,
+            route_g_variants_id,
+            request_params,
+            event["pathParameters"].get("id", None),
         )
 
     elif event["resource"] == "/g_variants/{id}/individuals":
-        return route_g_variants_id_individuals(
-            request_params, event["pathParameters"].get("id", None)
+        return cached_route(
+            event,
+            route_g_variants_id_individuals,
+            request_params,
+            event["pathParameters"].get("id", None),
         )
 
     elif event["resource"] == "/g_variants/{id}/biosamples":
-        return route_g_variants_id_biosamples(
-            request_params, event["pathParameters"].get("id", None)
+        return cached_route(
+            event,
+            route_g_variants_id_biosamples,
+            request_params,
+            event["pathParameters"].get("id", None),
         )
 
 
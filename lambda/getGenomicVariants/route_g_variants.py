@@ -2,10 +2,13 @@ from collections import defaultdict
 import json
 import base64
 
-from shared.variantutils import perform_variant_search
+from shared.variantutils import (
+    count_from_tiles,
+    get_catalog_datasets,
+    perform_variant_search,
+)
 from shared.utils import ENV_ATHENA
 from shared.athena import (
-    Dataset,
     parse_datasets_with_samples,
     run_custom_query,
     entity_search_conditions,
@@ -15,6 +18,7 @@ from shared.apiutils import (
     Granularity,
     DefaultSchemas,
     IncludeResultsetResponses,
+    build_bad_request,
     build_beacon_boolean_response,
     build_beacon_resultset_response,
     build_beacon_count_response,
@@ -36,13 +40,28 @@ def datasets_query(conditions, assembly_id):
     return query
 
 
-def datasets_query_fast(assembly_id):
-    query = f"""
-    SELECT id, _vcflocations, _vcfchromosomemap
-    FROM "{ENV_ATHENA.ATHENA_METADATA_DATABASE}"."{ENV_ATHENA.ATHENA_DATASETS_TABLE}"
-    WHERE _assemblyid='{assembly_id}' 
-    """
-    return query
+# a page token holds the position of the last variant of a page and the
+# number of variants at that position already returned
+def encode_page_token(pos, returned):
+    return base64.urlsafe_b64encode(f"{pos}\t{returned}".encode()).decode()
+
+
+def decode_page_token(token):
+    pos, returned = base64.urlsafe_b64decode(token.encode()).decode().split("\t")
+    return int(pos), int(returned)
+
+
+def next_page_token(keys):
+    # keys of the variants up to the end of the page, in order
+    pos = keys[-1][0]
+    return encode_page_token(pos, sum(1 for key in keys if key[0] == pos))
+
+
+def resume_start(start, pos):
+    # query starts are 0-based, the next page begins at the 1-based pos
+    if len(start) == 2:
+        return [max(start[0], pos - 1), start[1]]
+    return [max(start[0], pos - 1)]
 
 
 def route(request: RequestParams):
@@ -55,6 +74,32 @@ def route(request: RequestParams):
         IncludeResultsetResponses.ALL,
     )
 
+    pagination = request.query.pagination
+    start = query_params.start
+    skip = pagination.skip
+
+    # a continuation token replaces skip, a record search resumes at its position
+    resumed = False
+    if (
+        pagination.current_page
+        and request.query.requested_granularity == Granularity.RECORD
+    ):
+        try:
+            pos, skip = decode_page_token(pagination.current_page)
+        except ValueError:
+            response = build_bad_request(
+                code=400, message="Invalid currentPage token", qparams=request
+            )
+            return bundle_response(400, response)
+        start = resume_start(start, pos)
+        resumed = True
+
+    # records are returned a page at a time, the search stops once
+    # the variants up to the end of the page are known
+    page_size = None
+    if request.query.requested_granularity == Granularity.RECORD and check_all:
+        page_size = skip + pagination.limit
+
     if conditions:
         query = datasets_query(conditions, query_params.assembly_id)
         exec_id = run_custom_query(
@@ -62,18 +107,38 @@ def route(request: RequestParams):
         )
         datasets, samples = parse_datasets_with_samples(exec_id)
     else:
-        query = datasets_query_fast(query_params.assembly_id)
-        datasets = Dataset.get_by_query(
-            query, execution_parameters=execution_parameters
-        )
+        # datasets come from the catalog unless samples are restricted
+        datasets = get_catalog_datasets(query_params.assembly_id)
         samples = []
 
+    # counts of whole tiles are precomputed, only the edges of the range and
+    # tiles with variants in more than one vcf are scanned
+    if request.query.requested_granularity == Granularity.COUNT and check_all:
+        count = count_from_tiles(
+            datasets=datasets,
+            reference_name=query_params.reference_name,
+            reference_bases=query_params.reference_bases,
+            alternate_bases=query_params.alternate_bases,
+            start=start,
+            end=query_params.end,
+            variant_type=query_params.variant_type,
+            variant_min_length=query_params.variant_min_length,
+            variant_max_length=query_params.variant_max_length,
+            dataset_samples=samples,
+        )
+        if count is not None:
+            response = build_beacon_count_response(
+                {}, count, request, {}, DefaultSchemas.GENOMICVARIATIONS
+            )
+            print("Returning Response: {}".format(json.dumps(response)))
+            return bundle_response(200, response)
+
     query_responses = perform_variant_search(
         datasets=datasets,
         reference_name=query_params.reference_name,
         reference_bases=query_params.reference_bases,
         alternate_bases=query_params.alternate_bases,
-        start=query_params.start,
+        start=start,
         end=query_params.end,
         variant_type=query_params.variant_type,
         variant_min_length=query_params.variant_min_length,
@@ -81,6 +146,7 @@ def route(request: RequestParams):
         requested_granularity=request.query.requested_granularity,
         include_datasets=request.query.include_resultset_responses,
         dataset_samples=samples,
+        page_size=page_size,
     )
 
     variants = set()
@@ -111,17 +177,16 @@ def route(request: RequestParams):
                     )
 
                     if internal_id not in found:
-                        results.append(
-                            get_variant_entry(
-                                base64.b64encode(f"{internal_id}".encode()).decode(),
-                                query_params.assembly_id,
-                                ref,
-                                alt,
-                                int(pos),
-                                int(pos) + len(alt),
-                                typ,
-                            )
+                        entry = get_variant_entry(
+                            base64.b64encode(f"{internal_id}".encode()).decode(),
+                            query_params.assembly_id,
+                            ref,
+                            alt,
+                            int(pos),
+                            int(pos) + len(alt),
+                            typ,
                         )
+                        results.append(((int(pos), ref, alt), entry))
                         found.add(internal_id)
 
     if request.query.requested_granularity == Granularity.BOOLEAN:
@@ -139,9 +204,25 @@ def route(request: RequestParams):
         return bundle_response(200, response)
 
     if request.query.requested_granularity == Granularity.RECORD:
+        results.sort(key=lambda result: result[0])
+        page = results[skip : skip + pagination.limit]
         response = build_beacon_resultset_response(
-            results, len(variants), request, {}, DefaultSchemas.GENOMICVARIATIONS
+            [entry for _, entry in page],
+            len(variants),
+            request,
+            {},
+            DefaultSchemas.GENOMICVARIATIONS,
         )
+        # a search stopped at the end of the page only knows a lower bound
+        # of the total, it can only stop once the page is full; a resumed
+        # search misses the variants before its position
+        if resumed or (page_size is not None and len(results) >= page_size):
+            response["responseSummary"]["countPrecision"] = "imprecise"
+        if page and len(page) == pagination.limit:
+            keys = [key for key, _ in results[: skip + pagination.limit]]
+            response["response"]["resultSets"][0]["info"] = {
+                "nextPage": next_page_token(keys)
+            }
         print("Returning Response: {}".format(json.dumps(response)))
         return bundle_response(200, response)
 
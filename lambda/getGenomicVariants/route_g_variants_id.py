@@ -2,10 +2,9 @@ from collections import defaultdict
 import json
 import base64
 
-from shared.variantutils import perform_variant_search
+from shared.variantutils import get_catalog_datasets, perform_variant_search
 from shared.utils import ENV_ATHENA
 from shared.athena import (
-    Dataset,
     parse_datasets_with_samples,
     run_custom_query,
     entity_search_conditions,
@@ -35,15 +34,6 @@ def datasets_query(conditions, assembly_id):
     return query
 
 
-def datasets_query_fast(assembly_id):
-    query = f"""
-    SELECT id, _vcflocations, _vcfchromosomemap
-    FROM "{ENV_ATHENA.ATHENA_METADATA_DATABASE}"."{ENV_ATHENA.ATHENA_DATASETS_TABLE}"
-    WHERE _assemblyid='{assembly_id}' 
-    """
-    return query
-
-
 def route(request: RequestParams, variant_id):
     dataset_hash = base64.b64decode(variant_id.encode()).decode()
     (
@@ -54,7 +44,7 @@ def route(request: RequestParams, variant_id):
         alternate_bases,
     ) = dataset_hash.split("\t")
     pos = int(pos) - 1
-    start = [pos]
+    start = [pos, pos]
     end = [pos + len(alternate_bases)]
 
     conditions, execution_parameters = entity_search_conditions(
@@ -68,10 +58,8 @@ def route(request: RequestParams, variant_id):
         )
         datasets, samples = parse_datasets_with_samples(exec_id)
     else:
-        query = datasets_query_fast(assembly_id)
-        datasets = Dataset.get_by_query(
-            query, execution_parameters=execution_parameters
-        )
+        # datasets come from the catalog unless samples are restricted
+        datasets = get_catalog_datasets(assembly_id)
         samples = []
 
     variants = set()
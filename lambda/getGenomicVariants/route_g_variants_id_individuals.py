@@ -4,11 +4,10 @@ import base64
 
 import jsons
 
-from shared.variantutils import perform_variant_search
+from shared.variantutils import get_catalog_datasets, perform_variant_search
 from shared.utils import ENV_ATHENA
 from shared.athena import (
     Individual,
-    Dataset,
     parse_datasets_with_samples,
     entity_search_conditions,
     run_custom_query,
@@ -37,15 +36,6 @@ def datasets_query(conditions, assembly_id):
     return query
 
 
-def datasets_query_fast(assembly_id):
-    query = f"""
-    SELECT id, _vcflocations, _vcfchromosomemap
-    FROM "{ENV_ATHENA.ATHENA_METADATA_DATABASE}"."{ENV_ATHENA.ATHENA_DATASETS_TABLE}"
-    WHERE _assemblyid='{assembly_id}' 
-    """
-    return query
-
-
 def get_count_query(dataset_id, sample_names):
     query = f"""
     SELECT count("{{database}}"."{ENV_ATHENA.ATHENA_ANALYSES_TABLE}".id) as cnt
@@ -89,7 +79,7 @@ def route(request: RequestParams, variant_id):
         "\t"
     )
     pos = int(pos) - 1
-    start = [pos]
+    start = [pos, pos]
     end = [pos + len(alternate_bases)]
     dataset_samples = defaultdict(set)
 
@@ -104,10 +94,8 @@ def route(request: RequestParams, variant_id):
         )
         datasets, samples = parse_datasets_with_samples(exec_id)
     else:
-        query = datasets_query_fast(assembly_id)
-        datasets = Dataset.get_by_query(
-            query, execution_parameters=execution_parameters
-        )
+        # datasets come from the catalog unless samples are restricted
+        datasets = get_catalog_datasets(assembly_id)
         samples = []
 
     query_responses = perform_variant_search(
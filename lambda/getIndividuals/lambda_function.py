@@ -1,6 +1,7 @@
 import json
 
 from shared.apiutils import parse_request, bundle_response
+from shared.variantutils import cached_route
 from route_individuals import route as route_individuals
 from route_individuals_id import route as route_individuals_id
 from route_individuals_id_g_variants import route as route_individuals_id_g_variants
@@ -27,8 +28,11 @@ def lambda_handler(event, context):
         )
 
     elif event["resource"] == "/individuals/{id}/g_variants":
-        return route_individuals_id_g_variants(
-            request_params, event["pathParameters"].get("id", None)
+        return cached_route(
+            event,
+            route_individuals_id_g_variants,
+            request_params,
+            event["pathParameters"].get("id", None),
         )
 
     elif event["resource"] == "/individuals/{id}/biosamples":
@@ -6,6 +6,7 @@ from route_runs_id_g_variants import route as route_runs_id_g_variants
 from route_runs_id_analyses import route as route_runs_id_analyses
 from route_runs_filtering_terms import route as route_runs_filtering_terms
 from shared.apiutils import parse_request, bundle_response
+from shared.variantutils import cached_route
 
 
 def lambda_handler(event, context):
@@ -22,8 +23,11 @@ def lambda_handler(event, context):
         return route_runs_id(request_params, event["pathParameters"].get("id", None))
 
     elif event["resource"] == "/runs/{id}/g_variants":
-        return route_runs_id_g_variants(
-            request_params, event["pathParameters"].get("id", None)
+        return cached_route(
+            event,
+            route_runs_id_g_variants,
+            request_params,
+            event["pathParameters"].get("id", None),
         )
 
     elif event["resource"] == "/runs/{id}/analyses":
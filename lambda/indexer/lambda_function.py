@@ -7,7 +7,7 @@ import json
 from smart_open import open as sopen
 import boto3
 
-from shared.dynamodb import Descendants, Anscestors, Ontology
+from shared.dynamodb import Descendants, Anscestors, Ontology, bump_datasets_generation
 from shared.ontoutils import request_hierarchy
 from shared.apiutils import bundle_response
 from shared.utils import ENV_ATHENA, ENV_SNS
@@ -371,6 +371,8 @@ def lambda_handler(event, context):
         index_thread.join()
         relations_thread.join()
 
+    # cached variant query results may use the old tables
+    bump_datasets_generation()
     print("Indexing complete!")
 
 
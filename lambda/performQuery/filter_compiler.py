@@ -0,0 +1,67 @@
+import re
+
+
+# request values that are written into expressions without escaping
+BASES = re.compile("[A-Za-z]+")
+SYMBOL = re.compile("[A-Za-z0-9_:]+")
+
+# record level conditions that every hit of a variant type satisfies
+# alleles are matched with the rules of RecordFilter afterwards
+LONGER_ALT = "strlen(ALT)>strlen(REF)"
+VARIANT_TYPE_FILTERS = {
+    "DEL": ['ALT~"^<DEL"', 'ALT="<CN0>"', "strlen(ALT)<strlen(REF)"],
+    "INS": ['ALT~"^<INS"', LONGER_ALT],
+    "DUP": ['ALT~"^<DUP"', 'ALT~"^<CN"', LONGER_ALT],
+    "DUP:TANDEM": ['ALT~"^<DUP:TANDEM"', 'ALT="<CN2>"', LONGER_ALT],
+}
+
+
+def case_insensitive(bases):
+    # eg: ^[Aa][Cc]$
+    return "^" + "".join(f"[{b.upper()}{b.lower()}]" for b in bases) + "$"
+
+
+def compile_include(
+    *,
+    reference_bases,
+    alternate_bases,
+    variant_type,
+    variant_min_length,
+    variant_max_length,
+):
+    """
+    Translates the allele predicates of a query into a bcftools --include
+    expression so that bcftools only prints records that can match.
+    Every expression accepts a superset of the hits, predicates that can
+    not be expressed exactly are left to the python filter.
+    Returns None when nothing can be pushed down.
+    """
+    conditions = []
+
+    if reference_bases != "N" and BASES.fullmatch(reference_bases):
+        conditions.append(f'REF~"{case_insensitive(reference_bases)}"')
+
+    if alternate_bases != "N":
+        if BASES.fullmatch(alternate_bases):
+            conditions.append(f'ALT~"{case_insensitive(alternate_bases)}"')
+    elif variant_type is not None:
+        if variant_type in VARIANT_TYPE_FILTERS:
+            alternatives = VARIANT_TYPE_FILTERS[variant_type]
+            conditions.append("(" + " || ".join(alternatives) + ")")
+        elif variant_type != "CNV" and SYMBOL.fullmatch(variant_type):
+            # structural variants that aren't otherwise recognisable
+            conditions.append(f'ALT~"^<{variant_type}"')
+
+    # any allele within the lengths, the same allele must also be a hit
+    if variant_min_length > 0:
+        conditions.append(f"strlen(ALT)>={variant_min_length}")
+    if variant_max_length != float("inf") and variant_max_length >= 0:
+        conditions.append(f"strlen(ALT)<={variant_max_length}")
+
+    if not conditions:
+        return None
+    return " && ".join(conditions)
+
+
+if __name__ == "__main__":
+    pass
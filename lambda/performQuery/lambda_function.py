@@ -1,7 +1,16 @@
 import json
+import os
 
-from shared.utils import clear_tmp
-from query_engine import perform_query
+from shared.payloads import encode_response
+from shared.utils import clear_tmp, spill_responses
+from shared.vcfutils import INDEX_CACHE_DIR
+from query_engine import perform_queries, perform_query
+
+
+VARIANTS_BUCKET = os.environ["VARIANTS_BUCKET"]
+# larger responses are sent through s3 so that splitQuery stays within its
+# own response limit while collecting many of them
+SPILL_SIZE = 1024 * 1024
 
 
 def lambda_handler(event, context):
@@ -14,8 +23,20 @@ def lambda_handler(event, context):
         is_async = False
         print("using invoke event")
 
-    response = perform_query(event, is_async)
-    clear_tmp()
+    # payloads with several regions get a list with a response per region
+    if "regions" in event:
+        response = [
+            encode_response(result) for result in perform_queries(event, is_async)
+        ]
+    else:
+        response = encode_response(perform_query(event, is_async))
+    # downloaded indexes are kept for the next invocation
+    clear_tmp(keep=[INDEX_CACHE_DIR])
+
+    if len(json.dumps(response)) > SPILL_SIZE:
+        response = spill_responses(
+            response if isinstance(response, list) else [response], VARIANTS_BUCKET
+        )
     return response
 
 
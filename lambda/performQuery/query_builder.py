@@ -7,7 +7,8 @@ class QueryBuiler:
         self.samples = []
         self.format = "%POS\t%REF\t%ALT\t%INFO\t[%GT,]"
         self.vcf = ""
-        self.parser_attrs = []
+        self.index = None
+        self.include = None
 
     def set_region(self, region: str):
         self.region = region
@@ -24,12 +25,19 @@ class QueryBuiler:
 
         return self
 
-    def set_return_samples(self, flag=True):
-        if flag:
-            self.format += "\t[%SAMPLE,]"
+    def set_index(self, index: str):
+        self.index = index
+
+        return self
+
+    def set_include(self, include: str):
+        self.include = include
+
         return self
 
     def build(self):
+        # a local index stops htslib from downloading one into the cwd
+        vcf = f"{self.vcf}##idx##{self.index}" if self.index else self.vcf
         args = [
             "bcftools",
             "query",
@@ -39,19 +47,19 @@ class QueryBuiler:
             f"{self.format}\n",
         ]
 
+        if self.include:
+            args.extend(["--include", self.include])
+
         if self.samples:
-            args.extend(["--samples", ",".join(self.samples), self.vcf])
+            # samples of other vcfs of the dataset are ignored
+            args.extend(["--samples", ",".join(self.samples), "--force-samples", vcf])
         else:
-            args.append(self.vcf)
+            args.append(vcf)
 
             # TODO if this is the case, must be piped for correct AC/AN
             # Use bcftools view for this
         print(f"Built query: {str(args)}")
-        self.parser_attrs = len(self.format.split("\t"))
         return args
 
     def parse_line(self, line):
-        if self.parser_attrs == 5:
-            return line.split("\t") + [""]
-        elif self.parser_attrs == 6:
-            return line.split("\t")
+        return line.split("\t")
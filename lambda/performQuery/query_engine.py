@@ -1,29 +1,317 @@
 import os
 import re
 import subprocess
+import time
 
 import boto3
 
 from shared.apiutils.requests import Granularity
+from shared.dynamodb import QueryCancellation
+from shared.vcfutils import (
+    IndexNotFoundError,
+    SidecarReader,
+    SourceError,
+    VcfReader,
+    VcfRecord,
+    allele_counts,
+    CarrierBitset,
+    carrier_mask,
+    cache_index,
+    is_supported_location,
+    open_source,
+    sidecar_key,
+)
+from filter_compiler import compile_include
 from query_builder import QueryBuiler
+from record_filter import RecordFilter
+from sample_manifest import get_sample_names
+from split_cache import (
+    MIN_SHARED_SECONDS,
+    get_etag,
+    split_cache,
+    split_cache_keys,
+)
 
 
 # uncomment below for debugging
 # os.environ['LD_DEBUG'] = 'all'
 all_count_pattern = re.compile("[0-9]+")
 get_all_calls = all_count_pattern.findall
+# sidecars are written by summariseVcf, the local backend may run without
+VARIANTS_BUCKET = os.environ.get("VARIANTS_BUCKET")
+# how long a sidecar, or its absence, is remembered by a warm container
+SIDECAR_RETRY_SECONDS = 300
 s3 = boto3.client("s3")
+# sidecar key -> (reader or None, time checked)
+sidecars = dict()
 
 
-def perform_query(payload: dict(), is_async: bool = False):
-    region = payload["region"]
-    variant_type = payload.get("variant_type", "")
-    variant_prefix = f"<{variant_type}"
+def get_sidecar(vcf_location, chromosome):
+    if not VARIANTS_BUCKET:
+        return None
+    key = sidecar_key(vcf_location, chromosome)
+    sidecar, checked = sidecars.get(key, (None, 0))
+
+    # found sidecars are reopened too, summariseVcf may have rebuilt them
+    if time.time() - checked > SIDECAR_RETRY_SECONDS:
+        sidecar = None
+        try:
+            sidecar = SidecarReader.open(open_source(f"s3://{VARIANTS_BUCKET}/{key}"))
+        except (SourceError, ValueError) as e:
+            print(f"Sidecar not available for {vcf_location} {chromosome}: {e}")
+        sidecars[key] = (sidecar, time.time())
+
+    # the vcf may have been replaced since it was summarised
+    if sidecar is not None and sidecar.etag != get_etag(vcf_location):
+        print(f"Sidecar of {vcf_location} {chromosome} is out of date")
+        return None
+    return sidecar
+
+
+def cached_index(vcf_location):
+    # local copy of the index for bcftools, htslib finds it otherwise
+    if not is_supported_location(vcf_location):
+        return None
+    try:
+        return cache_index(vcf_location)
+    except (IndexNotFoundError, SourceError) as e:
+        print(f"Index not cached for {vcf_location}: {e}")
+        return None
+
+
+def bcftools_records(vcf_location, region, chosen_samples, include):
+    chromosome = region[: region.find(":")]
+    bcftools_query = QueryBuiler()
+    bcftools_query = bcftools_query.set_samples(chosen_samples)
+    bcftools_query = bcftools_query.set_region(region)
+    bcftools_query = bcftools_query.set_include(include)
 
-    ## region is of form: "chrom:start-end"
+    bcftools_query = bcftools_query.set_vcf(vcf_location)
+    bcftools_query = bcftools_query.set_index(cached_index(vcf_location))
+    args = bcftools_query.build()
+
+    query_process = subprocess.Popen(
+        args, stdout=subprocess.PIPE, cwd="/tmp", encoding="ascii"
+    )
+
+    try:
+        for line in query_process.stdout:
+            try:
+                (
+                    vcf_position,
+                    vcf_reference,
+                    vcf_all_alts,
+                    vcf_info_str,
+                    vcf_genotypes,
+                ) = bcftools_query.parse_line(line.rstrip("\n"))
+            except ValueError as e:
+                print(repr(line.split("\t")))
+                raise e
+
+            yield VcfRecord(
+                chromosome,
+                int(vcf_position),
+                vcf_reference,
+                vcf_all_alts.split(","),
+                vcf_info_str,
+                genotypes=vcf_genotypes,
+            )
+    finally:
+        query_process.stdout.close()
+
+
+def parse_region(region):
+    # region is of form: "chrom:start-end"
+    chromosome = region[: region.find(":")]
     first_base_pos = int(region[region.find(":") + 1 : region.find("-")])
     last_base_pos = int(region[region.find("-") + 1 :])
-    chromosome = region[: region.find(":")]
+    return chromosome, first_base_pos, last_base_pos
+
+
+class VcfScan:
+    """
+    Records of the regions of a payload, regions are on one chromosome,
+    sorted and not overlapping. The sites sidecar is used when genotypes
+    are not needed, otherwise the in-process reader is used unless the
+    location or index is unsupported. The reader and its index, or a
+    single bcftools process, serve every region of the scan.
+    """
+
+    def __init__(
+        self,
+        vcf_location,
+        regions,
+        chosen_samples,
+        include_samples,
+        include,
+        voffset=None,
+    ):
+        self.vcf_location = vcf_location
+        self.regions = regions
+        # virtual offset of the first record of a point lookup
+        self.voffset = voffset
+        self.chosen_samples = chosen_samples
+        self.include_samples = include_samples
+        # bcftools expression selecting the records that can match
+        self.include = include
+        self.opened = False
+        self.reader = None
+        self.sample_names = []
+        self.stream = None
+        self.pending = None
+
+    def open(self):
+        if self.opened:
+            return
+        self.opened = True
+
+        if is_supported_location(self.vcf_location):
+            try:
+                reader = VcfReader(
+                    self.vcf_location, etag=get_etag(self.vcf_location)
+                )
+                # records at a known offset are read without the index
+                if self.voffset is None:
+                    reader.index
+            except (IndexNotFoundError, SourceError) as e:
+                print(f"Falling back to bcftools: {e}")
+            else:
+                self.reader = reader
+                if self.voffset is None:
+                    # blocks of all regions are read in as few requests as possible
+                    chromosome = parse_region(self.regions[0])[0]
+                    reader.prefetch(
+                        chromosome,
+                        [parse_region(region)[1:] for region in self.regions],
+                    )
+                indices = reader.sample_indices(self.chosen_samples)
+                self.sample_names = reader.samples()
+                if indices is not None:
+                    self.sample_names = [self.sample_names[i] for i in indices]
+                return
+
+        # bcftools prints the chosen samples in header order and skips
+        # names that are not in the vcf
+        if self.include_samples:
+            self.sample_names = get_sample_names(self.vcf_location)
+            if self.chosen_samples:
+                chosen = set(self.chosen_samples)
+                self.sample_names = [
+                    name for name in self.sample_names if name in chosen
+                ]
+
+    def records(self, region):
+        # returns the sample names of the genotype columns and a record iterator
+        chromosome, first_base_pos, last_base_pos = parse_region(region)
+
+        if self.voffset is not None:
+            self.open()
+            if self.reader is not None:
+                print("Reading records at their offset")
+                records = self.reader.fetch_from(
+                    self.voffset,
+                    chromosome,
+                    first_base_pos,
+                    last_base_pos,
+                    self.chosen_samples,
+                )
+                return self.sample_names, records
+
+        if not self.include_samples and not self.chosen_samples:
+            sidecar = get_sidecar(self.vcf_location, chromosome)
+            if sidecar is not None and sidecar.has_counts:
+                print("Using sites sidecar")
+                return [], sidecar.fetch(first_base_pos, last_base_pos)
+
+        self.open()
+        if self.reader is not None:
+            records = self.reader.fetch(
+                chromosome, first_base_pos, last_base_pos, self.chosen_samples
+            )
+            return self.sample_names, records
+
+        if self.stream is None:
+            self.stream = bcftools_records(
+                self.vcf_location,
+                ",".join(self.regions),
+                self.chosen_samples,
+                self.include,
+            )
+        return self.sample_names, self.demultiplex(first_base_pos, last_base_pos)
+
+    def demultiplex(self, first_base_pos, last_base_pos):
+        # bcftools prints the records of all regions in order, regions
+        # that are skipped or left early are discarded here
+        while True:
+            record = self.pending or next(self.stream, None)
+            self.pending = None
+            if record is None:
+                return
+            if record.pos > last_base_pos:
+                self.pending = record
+                return
+            if record.pos >= first_base_pos:
+                yield record
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.close()
+
+
+def payload_include(payload):
+    variant_max_length = payload.get("variant_max_length", -1)
+    return compile_include(
+        reference_bases=payload.get("reference_bases", "N"),
+        alternate_bases=payload.get("alternate_bases", "N"),
+        variant_type=payload.get("variant_type", ""),
+        variant_min_length=payload.get("variant_min_length", 0),
+        variant_max_length=(
+            variant_max_length if variant_max_length >= 0 else float("inf")
+        ),
+    )
+
+
+def perform_queries(payload: dict, is_async: bool = False):
+    # regions of a payload are scanned in one pass, one response per region
+    scan = VcfScan(
+        payload["vcf_location"],
+        payload["regions"],
+        payload.get("samples", []),
+        payload.get("include_samples", False),
+        payload_include(payload),
+    )
+    cancellation = QueryCancellation(payload.get("query_id"))
+    first_hit_only = (
+        not payload.get("include_details", False)
+        or payload.get("requested_granularity", Granularity.BOOLEAN)
+        == Granularity.BOOLEAN
+    )
+    responses = []
+
+    try:
+        for region in payload["regions"]:
+            region_payload = {k: v for k, v in payload.items() if k != "regions"}
+            region_payload["region"] = region
+            response = perform_query(region_payload, is_async, scan, cancellation)
+            responses.append(response)
+            # the other regions can not change the answer
+            if first_hit_only and response["exists"]:
+                break
+            if cancellation.is_cancelled():
+                break
+    finally:
+        scan.close()
+
+    return responses
+
+
+def perform_query(
+    payload: dict(), is_async: bool = False, scan=None, cancellation=None
+):
+    region = payload["region"]
+    variant_type = payload.get("variant_type", "")
+
+    chromosome, first_base_pos, last_base_pos = parse_region(region)
     # alleles requested
     reference_bases = payload.get("reference_bases", "N")
     alternate_bases = payload.get("alternate_bases", "N")
@@ -53,177 +341,71 @@ def perform_query(payload: dict(), is_async: bool = False):
     variants = []
     call_count = 0
     all_alleles_count = 0
-    sample_indices = set()
-    all_sample_names = []
+    carriers = CarrierBitset()
     sample_names = []
-    
-    bcftools_query = QueryBuiler()
-    bcftools_query = bcftools_query.set_samples(chosen_samples)
-    bcftools_query = bcftools_query.set_region(region)
-    bcftools_query = bcftools_query.set_return_samples(include_samples)
 
-    bcftools_query = bcftools_query.set_vcf(payload["vcf_location"])
-    args = bcftools_query.build()
-    
-    print("Iterating bcftools result")
-    query_process = subprocess.Popen(
-        args, stdout=subprocess.PIPE, cwd="/tmp", encoding="ascii"
+    # set when another split already answered the query
+    cancellation = cancellation or QueryCancellation(payload.get("query_id"))
+    complete = False
+    # scans stopping at the first hit can reuse the result of a complete scan
+    first_hit_only = (
+        not include_details or requested_granularity == Granularity.BOOLEAN
     )
-    
-    # iterate through bcftools output
-    for line in query_process.stdout:
-        try:
-            (
-                vcf_position,
-                vcf_reference,
-                vcf_all_alts,
-                vcf_info_str,
-                vcf_genotypes,
-                vcf_samples,
-            ) = bcftools_query.parse_line(line)
+    collect_samples = requested_granularity == Granularity.RECORD and include_samples
+    cache_keys = split_cache_keys(payload, collect_samples)
 
-            if not all_sample_names and vcf_samples:
-                all_sample_names = [
-                    sample for sample in vcf_samples.strip().strip(",").split(",")
-                ]
-        except ValueError as e:
-            print(repr(line.split("\t")))
-            raise e
-
-        vcf_position = int(vcf_position)
-        # Ensure each variant will only be found by one process
-        # TODO handle CNVs
-        if not first_base_pos <= vcf_position <= last_base_pos:
-            continue
-
-        vcf_reference_length = len(vcf_reference)
-
-        # must be within end range
-        # TODO this seems to be incorrect
-        # if not end_min <= vcf_position + vcf_reference_length - 1 <= end_max:
-        #     continue
-
-        # validation; if not N validate
-        if vcf_reference.upper() != reference_bases and reference_bases != "N":
-            continue
-
-        vcf_all_alts = vcf_all_alts.split(",")
-
-        # alternate base not defined
-        if alternate_bases == "N" and variant_type is not None:
-            if variant_type == "DEL":
-                hit_indexes = [
-                    i
-                    for i, alt in enumerate(vcf_all_alts)
-                    if (
-                        (alt.startswith(variant_prefix) or alt == "<CN0>")
-                        if alt.startswith("<")
-                        else len(alt) < vcf_reference_length
-                    )
-                    and variant_min_length <= len(alt) <= variant_max_length
-                ]
-            elif variant_type == "INS":
-                hit_indexes = [
-                    i
-                    for i, alt in enumerate(vcf_all_alts)
-                    if (
-                        alt.startswith(variant_prefix)
-                        if alt.startswith("<")
-                        else len(alt) > vcf_reference_length
-                    )
-                    and variant_min_length <= len(alt) <= variant_max_length
-                ]
-            elif variant_type == "DUP":
-                pattern = re.compile("({}){{2,}}".format(vcf_reference))
-                hit_indexes = [
-                    i
-                    for i, alt in enumerate(vcf_all_alts)
-                    if (
-                        (
-                            alt.startswith(variant_prefix)
-                            or (alt.startswith("<CN") and alt not in ("<CN0>", "<CN1>"))
-                        )
-                        if alt.startswith("<")
-                        else pattern.fullmatch(alt)
-                    )
-                    and variant_min_length <= len(alt) <= variant_max_length
-                ]
-            elif variant_type == "DUP:TANDEM":
-                tandem = vcf_reference + vcf_reference
-                hit_indexes = [
-                    i
-                    for i, alt in enumerate(vcf_all_alts)
-                    if (
-                        (alt.startswith(variant_prefix) or alt == "<CN2>")
-                        if alt.startswith("<")
-                        else alt == tandem
-                    )
-                    and variant_min_length <= len(alt) <= variant_max_length
-                ]
-            elif variant_type == "CNV":
-                pattern = re.compile("\.|({})*".format(vcf_reference))
-                hit_indexes = [
-                    i
-                    for i, alt in enumerate(vcf_all_alts)
-                    if (
-                        (
-                            alt.startswith(variant_prefix)
-                            or alt.startswith("<CN")
-                            or alt.startswith("<DEL")
-                            or alt.startswith("<DUP")
-                        )
-                        if alt.startswith("<")
-                        else pattern.fullmatch(alt)
-                    )
-                    and variant_min_length <= len(alt) <= variant_max_length
-                ]
-            else:
-                # For structural variants that aren't otherwise recognisable
-                hit_indexes = [
-                    i
-                    for i, alt in enumerate(vcf_all_alts)
-                    if alt.startswith(variant_prefix)
-                    and variant_min_length <= len(alt) <= variant_max_length
-                ]
-        # if alternate base defined
-        # here we should check for the asked variant lengths
-        elif alternate_bases == "N":
-            hit_indexes = [
-                i
-                for i, alt in enumerate(vcf_all_alts)
-                if variant_min_length <= len(alt) <= variant_max_length
-            ]
-        else:
-            hit_indexes = [
-                i
-                for i, alt in enumerate(vcf_all_alts)
-                if alt.upper() == alternate_bases
-                and variant_min_length <= len(alt) <= variant_max_length
-            ]
+    if cache_keys is not None:
+        complete_key, first_key = cache_keys
+        for key in (complete_key, first_key) if first_hit_only else (complete_key,):
+            if (cached := split_cache.get(key)) is not None:
+                print("Using cached split result")
+                return dict(cached, dataset_id=dataset_id)
 
-        if not hit_indexes:
-            continue
-        # hit_indexes are of form [0, 1] for ALT A,GC
+    # a payload with a single region has a scan of its own
+    own_scan = scan is None
+    if own_scan:
+        # records bcftools has to print, the python filter below verifies them
+        scan = VcfScan(
+            payload["vcf_location"],
+            [region],
+            chosen_samples,
+            include_samples,
+            payload_include(payload),
+            payload.get("voffset"),
+        )
+
+    print("Iterating vcf records")
+    scan_start = time.time()
+    all_sample_names, records = scan.records(region)
+
+    matches = RecordFilter(
+        records,
+        first_base_pos=first_base_pos,
+        last_base_pos=last_base_pos,
+        reference_bases=reference_bases,
+        alternate_bases=alternate_bases,
+        variant_type=variant_type,
+        variant_min_length=variant_min_length,
+        variant_max_length=variant_max_length,
+        cancellation=cancellation,
+    )
+
+    for record, hit_indexes in matches:
+        vcf_position = record.pos
+        vcf_reference = record.ref
+        vcf_all_alts = record.alts
 
         # Look through INFO for AC and AN, used for efficient calculations. Note
-        # we cannot request them explicitly in the query, as bcftools will crash
-        # if they aren't present.
-        all_alt_counts = None
-        total_count = None
-        vcf_variant_type = "N/A"
-
-        for info in vcf_info_str.split(";"):
-            if info.startswith("AC="):
-                all_alt_counts = info[3:]
-            elif info.startswith("AN="):
-                total_count = int(info[3:])
-            elif info.startswith("VT="):
-                vcf_variant_type = info[3:]
+        # they are optional, so genotypes are parsed if they aren't present.
+        alt_counts = record.ac
+        total_count = record.an
+        vcf_variant_type = record.vt or "N/A"
 
         all_calls = None
+        # calls per allele number, None if the genotypes must be parsed
+        allele_calls = None
         # if AC=X was there
-        if all_alt_counts is not None:
-            alt_counts = [int(c) for c in all_alt_counts.split(",")]
+        if alt_counts is not None:
             call_counts = [alt_counts[i] for i in hit_indexes]
             # ["Chr1 123 A G SNP"]
             variants += [
@@ -232,11 +414,21 @@ def perform_query(payload: dict(), is_async: bool = False):
                 if alt_counts[i] != 0
             ]
             call_count += sum(call_counts)
-        # otherwise
+        # otherwise count the calls of each allele in the genotypes
+        elif (
+            allele_calls := allele_counts(record.genotypes, len(vcf_all_alts))
+        ) is not None:
+            # ["Chr1 123 A G SNP"]
+            variants += [
+                f"{chromosome}\t{vcf_position}\t{vcf_reference}\t{vcf_all_alts[i]}\t{vcf_variant_type}"
+                for i in hit_indexes
+                if allele_calls[i + 1]
+            ]
+            call_count += sum(allele_calls[i + 1] for i in hit_indexes)
         else:
             # Much slower, but doesn't require INFO/AC
             # parsing 0|0,0|0,0|0,0|0
-            all_calls = [int(g) for g in get_all_calls(vcf_genotypes)]
+            all_calls = [int(g) for g in get_all_calls(record.genotypes)]
             hit_set = {i + 1 for i in hit_indexes}
             # ["Chr1 123 A G SNP"]
             variants += [
@@ -250,16 +442,22 @@ def perform_query(payload: dict(), is_async: bool = False):
             exists = True
             if not include_details:
                 break
-            hit_string = "|".join(str(i + 1) for i in hit_indexes)
-            pattern = re.compile(f"(^|[|/])({hit_string})([|/]|$)")
             if requested_granularity == Granularity.RECORD and include_samples:
-                sample_indices.update(
-                    [
-                        i
-                        for i, gt in enumerate(vcf_genotypes.split(","))
-                        if pattern.search(gt)
-                    ]
+                mask = carrier_mask(
+                    record.genotypes,
+                    [i + 1 for i in hit_indexes],
+                    len(vcf_all_alts),
                 )
+                if mask is not None:
+                    carriers.add_mask(mask)
+                else:
+                    hit_string = "|".join(str(i + 1) for i in hit_indexes)
+                    pattern = re.compile(f"(^|[|/])({hit_string})([|/]|$)")
+                    genotypes = record.genotypes.split(",")
+                    carriers.add_indices(
+                        [i for i, gt in enumerate(genotypes) if pattern.search(gt)],
+                        len(genotypes),
+                    )
 
         # Used for calculating frequency. This will be a misleading value if the
         # alleles are spread over multiple vcf records. Ideally we should
@@ -271,21 +469,30 @@ def perform_query(payload: dict(), is_async: bool = False):
             all_alleles_count += total_count
         else:
             # Much slower, but doesn't require INFO/AN
-            if all_calls is None:
-                all_calls = get_all_calls(vcf_genotypes)
-            all_alleles_count += len(all_calls)
+            if allele_calls is None and all_calls is None:
+                allele_calls = allele_counts(record.genotypes, len(vcf_all_alts))
+            if allele_calls is not None:
+                all_alleles_count += sum(allele_calls)
+            else:
+                if all_calls is None:
+                    all_calls = get_all_calls(record.genotypes)
+                all_alleles_count += len(all_calls)
 
         # if only bool is asked and a variant if found
         if requested_granularity == Granularity.BOOLEAN and exists:
             break
-    query_process.stdout.close()
+    else:
+        complete = not matches.cancelled
+    matches.close()
+    if own_scan:
+        scan.close()
+    if matches.cancelled:
+        print(f"Query {query_id} cancelled")
 
-    if requested_granularity == Granularity.RECORD and include_samples:
-        sample_names = [
-            sample for n, sample in enumerate(all_sample_names) if n in sample_indices
-        ]
+    if collect_samples:
+        sample_names = carriers.select(all_sample_names)
 
-    print("Iterating bcftools result complete")
+    print("Iterating vcf records complete")
 
     response = {
         "dataset_id": dataset_id,
@@ -296,4 +503,12 @@ def perform_query(payload: dict(), is_async: bool = False):
         "sample_names": [] if not include_samples else sample_names,
     }
 
+    if cache_keys is not None and not matches.cancelled:
+        result = {k: v for k, v in response.items() if k != "dataset_id"}
+        split_cache.put(
+            complete_key if complete else first_key,
+            result,
+            shared=exists or time.time() - scan_start > MIN_SHARED_SECONDS,
+        )
+
     return response
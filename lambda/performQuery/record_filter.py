@@ -0,0 +1,150 @@
+from itertools import islice
+
+
+# records read from the scan before the predicates are evaluated
+BATCH_SIZE = 256
+
+
+def is_repeat(unit, sequence, min_repeats):
+    # sequence is unit repeated at least min_repeats times
+    repeats, remainder = divmod(len(sequence), len(unit))
+    return not remainder and repeats >= min_repeats and sequence == unit * repeats
+
+
+def alt_predicate(variant_type, alternate_bases):
+    # returns is_hit(ref, alt), built once per query instead of per record
+    prefix = f"<{variant_type}"
+
+    # alternate base not defined
+    if alternate_bases == "N" and variant_type is not None:
+        if variant_type == "DEL":
+
+            def is_hit(ref, alt):
+                if alt.startswith("<"):
+                    return alt.startswith(prefix) or alt == "<CN0>"
+                return len(alt) < len(ref)
+
+        elif variant_type == "INS":
+
+            def is_hit(ref, alt):
+                if alt.startswith("<"):
+                    return alt.startswith(prefix)
+                return len(alt) > len(ref)
+
+        elif variant_type == "DUP":
+
+            def is_hit(ref, alt):
+                if alt.startswith("<"):
+                    return alt.startswith(prefix) or (
+                        alt.startswith("<CN") and alt not in ("<CN0>", "<CN1>")
+                    )
+                return is_repeat(ref, alt, 2)
+
+        elif variant_type == "DUP:TANDEM":
+
+            def is_hit(ref, alt):
+                if alt.startswith("<"):
+                    return alt.startswith(prefix) or alt == "<CN2>"
+                return alt == ref + ref
+
+        elif variant_type == "CNV":
+
+            def is_hit(ref, alt):
+                if alt.startswith("<"):
+                    return alt.startswith(("<CN", "<DEL", "<DUP", prefix))
+                return alt == "." or is_repeat(ref, alt, 0)
+
+        else:
+            # For structural variants that aren't otherwise recognisable
+            def is_hit(ref, alt):
+                return alt.startswith(prefix)
+
+    # if alternate base defined
+    # here we should check for the asked variant lengths
+    elif alternate_bases == "N":
+        is_hit = None
+    else:
+
+        def is_hit(ref, alt):
+            return alt.upper() == alternate_bases
+
+    return is_hit
+
+
+class RecordFilter:
+    """
+    Records of a scan that can match a query, with the indexes of their
+    hit alleles. Records are read in batches and every predicate is
+    applied to a whole batch before the next one runs, the predicates
+    are built once per query. Stops early when the query is cancelled.
+    """
+
+    def __init__(
+        self,
+        records,
+        *,
+        first_base_pos,
+        last_base_pos,
+        reference_bases,
+        alternate_bases,
+        variant_type,
+        variant_min_length,
+        variant_max_length,
+        cancellation,
+    ):
+        self.records = records
+        self.iterator = iter(records)
+        self.first_base_pos = first_base_pos
+        self.last_base_pos = last_base_pos
+        self.reference_bases = reference_bases
+        self.is_hit = alt_predicate(variant_type, alternate_bases)
+        self.variant_min_length = variant_min_length
+        self.variant_max_length = variant_max_length
+        self.cancellation = cancellation
+        self.cancelled = False
+
+    def hit_indexes(self, ref, alts):
+        # hit_indexes are of form [0, 1] for ALT A,GC
+        min_length = self.variant_min_length
+        max_length = self.variant_max_length
+        if self.is_hit is None:
+            return [i for i, alt in enumerate(alts) if min_length <= len(alt) <= max_length]
+        is_hit = self.is_hit
+        return [
+            i
+            for i, alt in enumerate(alts)
+            if min_length <= len(alt) <= max_length and is_hit(ref, alt)
+        ]
+
+    def __iter__(self):
+        first_base_pos = self.first_base_pos
+        last_base_pos = self.last_base_pos
+        reference_bases = self.reference_bases
+        hit_indexes = self.hit_indexes
+
+        while batch := list(islice(self.iterator, BATCH_SIZE)):
+            if self.cancellation.is_cancelled():
+                self.cancelled = True
+                return
+            # Ensure each variant will only be found by one process
+            # TODO handle CNVs
+            # TODO must be within end range, the old check seemed incorrect
+            batch = [
+                record
+                for record in batch
+                if first_base_pos <= record.pos <= last_base_pos
+            ]
+            # validation; if not N validate
+            if reference_bases != "N":
+                batch = [
+                    record for record in batch if record.ref.upper() == reference_bases
+                ]
+            hits = [hit_indexes(record.ref, record.alts) for record in batch]
+            yield from ((record, hit) for record, hit in zip(batch, hits) if hit)
+
+    def close(self):
+        self.records.close()
+
+
+if __name__ == "__main__":
+    pass
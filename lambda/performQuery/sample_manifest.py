@@ -0,0 +1,38 @@
+import hashlib
+import subprocess
+
+from split_cache import get_etag, split_cache
+
+
+def manifest_key(vcf_location, etag):
+    return hashlib.sha256(f"samples\t{vcf_location}\t{etag}".encode()).hexdigest()
+
+
+def read_sample_names(vcf_location):
+    output = subprocess.run(
+        ["bcftools", "query", "--list-samples", vcf_location],
+        cwd="/tmp",
+        capture_output=True,
+        encoding="ascii",
+        check=True,
+    )
+    return output.stdout.split()
+
+
+# sample columns of a vcf in header order, read once per etag and shared
+# through the split cache instead of printing the names with every record
+def get_sample_names(vcf_location):
+    etag = get_etag(vcf_location)
+    if etag is None:
+        return read_sample_names(vcf_location)
+
+    key = manifest_key(vcf_location, etag)
+    if (sample_names := split_cache.get(key)) is None:
+        sample_names = read_sample_names(vcf_location)
+        split_cache.put(key, sample_names)
+
+    return sample_names
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,144 @@
+from collections import OrderedDict
+import hashlib
+import json
+import time
+
+from shared.dynamodb import SplitResult
+from shared.utils import ENV_CONFIG
+from shared.vcfutils import SourceError, open_source
+
+
+# results kept by a warm container
+LOCAL_ENTRIES = 512
+# how long a warm container trusts the etag of a vcf
+ETAG_SECONDS = 60
+# dynamodb items are limited to 400 kb
+MAX_SHARED_SIZE = 350 * 1024
+# empty results of quicker scans are not worth a dynamodb write
+MIN_SHARED_SECONDS = 0.5
+# vcf location -> (etag or None, time checked)
+etags = dict()
+
+
+def get_etag(vcf_location):
+    etag, checked = etags.get(vcf_location, (None, 0))
+
+    if time.time() - checked > ETAG_SECONDS:
+        try:
+            etag = open_source(vcf_location).etag()
+        except SourceError as e:
+            print(f"Split cache disabled for {vcf_location}: {e}")
+            etag = None
+        etags[vcf_location] = (etag, time.time())
+
+    return etag
+
+
+def split_cache_keys(payload, collect_samples):
+    # returns the key of a complete scan and the key of a scan that stopped
+    # at the first hit, or None when the vcf can not be identified
+    etag = get_etag(payload["vcf_location"])
+    if etag is None:
+        return None
+
+    # end_min and end_max are not used by the scan
+    predicate = {
+        "vcf_location": payload["vcf_location"],
+        "etag": etag,
+        "region": payload["region"],
+        "reference_bases": payload.get("reference_bases", "N"),
+        "alternate_bases": payload.get("alternate_bases", "N"),
+        "variant_type": payload.get("variant_type"),
+        "variant_min_length": payload.get("variant_min_length", 0),
+        "variant_max_length": payload.get("variant_max_length", -1),
+        "samples": payload.get("samples", []),
+        "collect_samples": collect_samples,
+    }
+    key = hashlib.sha256(json.dumps(predicate, sort_keys=True).encode()).hexdigest()
+    # scans without details stop before the hit adds its alleles count
+    first_predicate = dict(
+        predicate,
+        include_details=payload.get("include_details", False),
+        requested_granularity=payload.get("requested_granularity", "boolean"),
+    )
+    first_key = hashlib.sha256(
+        json.dumps(first_predicate, sort_keys=True).encode()
+    ).hexdigest()
+
+    return key, f"{first_key}-first"
+
+
+class LocalTier:
+    shared = False
+
+    def __init__(self, capacity=LOCAL_ENTRIES):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        if key not in self.entries:
+            return None
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def put(self, key, result):
+        self.entries[key] = result
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+
+class DynamoTier:
+    shared = True
+
+    def get(self, key):
+        try:
+            return json.loads(SplitResult.get(key).result)
+        except SplitResult.DoesNotExist:
+            return None
+
+    def put(self, key, result):
+        data = json.dumps(result)
+        if len(data) > MAX_SHARED_SIZE:
+            return
+        SplitResult(key, result=data).save()
+
+
+# tiers are ordered from fastest to slowest
+class SplitCache:
+    def __init__(self, tiers):
+        self.tiers = tiers
+
+    def get(self, key):
+        for n, tier in enumerate(self.tiers):
+            try:
+                result = tier.get(key)
+            except Exception as e:
+                print(f"Split cache tier {n} unavailable: {e}")
+                continue
+            if result is not None:
+                # promote to the faster tiers
+                for faster in self.tiers[:n]:
+                    faster.put(key, result)
+                return result
+        return None
+
+    def put(self, key, result, shared=True):
+        for n, tier in enumerate(self.tiers):
+            if tier.shared and not shared:
+                continue
+            try:
+                tier.put(key, result)
+            except Exception as e:
+                print(f"Split cache tier {n} unavailable: {e}")
+
+
+# results of the local backend stay on this machine
+if ENV_CONFIG.CONFIG_EXECUTION_BACKEND == "local":
+    split_cache = SplitCache([LocalTier()])
+else:
+    split_cache = SplitCache([LocalTier(), DynamoTier()])
+
+
+if __name__ == "__main__":
+    pass
@@ -1,39 +1,80 @@
-from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import json
 import os
 from typing import List
 import gzip
 import base64
+import time
 
 import boto3
 
-from shared.utils import LambdaClient
+from shared.dynamodb import (
+    PERFORM_QUERY_LATENCY,
+    QueryCancellation,
+    flush_latencies,
+    record_latency,
+)
+from shared.utils import (
+    MAX_INLINE_RESPONSE_SIZE,
+    AsyncLambdaClient,
+    get_backend,
+    spill_responses,
+)
 
 
 PERFORM_QUERY = os.environ["PERFORM_QUERY_LAMBDA"]
+VARIANTS_BUCKET = os.environ["VARIANTS_BUCKET"]
+# performQuery invocations in flight
 THREADS = 50
 
 
-aws_lambda = LambdaClient()
+aws_lambda = AsyncLambdaClient(THREADS)
+backend = get_backend(PERFORM_QUERY, aws_lambda)
 sns = boto3.client("sns")
 
 
-def perform_query(payload: dict):
-    response = aws_lambda.invoke(
-        FunctionName=PERFORM_QUERY,
-        InvocationType="RequestResponse",
-        Payload=json.dumps(payload),
-    )
+def cancelled_response(payload: dict):
+    return {
+        "dataset_id": payload.get("dataset_id", "-"),
+        "exists": False,
+        "all_alleles_count": 0,
+        "variants": [],
+        "call_count": 0,
+        "sample_names": [],
+    }
+
 
-    return json.loads(response["Payload"].read())
+async def perform_query(payload: dict, cancellation: QueryCancellation):
+    start_time = time.time()
+    # the flag is checked once the payload has a slot, right before it runs
+    result = await backend.run(payload, cancelled=cancellation.is_cancelled)
+    if result is None:
+        return cancelled_response(payload)
+    if backend.remote:
+        record_latency(PERFORM_QUERY_LATENCY, time.time() - start_time)
+
+    return result
+
+
+async def perform_queries(payloads: List[dict], cancellation: QueryCancellation):
+    return await asyncio.gather(
+        *(perform_query(payload, cancellation) for payload in payloads)
+    )
 
 
-# TODO if the response is too big upload to S3
 def split_query(payloads: List[dict], is_async: bool = False):
-    executor = ThreadPoolExecutor(THREADS)
-    futures = [executor.submit(perform_query, payload) for payload in payloads]
+    # payloads of a chunk belong to the same query
+    cancellation = QueryCancellation(payloads[0].get("query_id") if payloads else None)
+
+    results = []
+    for result in asyncio.run(perform_queries(payloads, cancellation)):
+        # payloads with several regions have a response per region
+        results.extend(result if isinstance(result, list) else [result])
 
-    return [future.result() for future in futures]
+    # many responses below the spill size of performQuery can still add up
+    if len(json.dumps(results)) > MAX_INLINE_RESPONSE_SIZE:
+        return spill_responses(results, VARIANTS_BUCKET)
+    return results
 
 
 def lambda_handler(event, context):
@@ -52,6 +93,8 @@ def lambda_handler(event, context):
         event = json.loads(event)
     print("Event Received: {}".format(json.dumps(event)))
     response = split_query(event, is_async)
+    flush_latencies()
+    backend.flush_metrics()
     return response
 
 
@@ -7,13 +7,14 @@ import jsons
 from jsonschema import Draft202012Validator, RefResolver
 from shared.apiutils import build_bad_request, bundle_response
 from shared.athena import Analysis, Biosample, Cohort, Dataset, Individual, Run
-from shared.dynamodb import Dataset as DynamoDataset
+from shared.dynamodb import Dataset as DynamoDataset, bump_datasets_generation
 from shared.utils import clear_tmp
 from smart_open import open as sopen
 from util import get_vcf_chromosome_maps
 
 DATASETS_TABLE_NAME = os.environ["DYNAMO_DATASETS_TABLE"]
 INDEXER_LAMBDA = os.environ["INDEXER_LAMBDA"]
+SUMMARISE_VCF_LAMBDA = os.environ["SUMMARISE_VCF_LAMBDA"]
 
 # uncomment below for debugging
 # os.environ['LD_DEBUG'] = 'all'
@@ -44,13 +45,23 @@ def create_dataset(attributes, vcf_chromosome_maps):
             item.save()
             completed.append("Added dataset info")
 
+            # sites sidecars are built in the background
+            for vcf_location in item.vcfLocations:
+                aws_lambda.invoke(
+                    FunctionName=SUMMARISE_VCF_LAMBDA,
+                    InvocationType="Event",
+                    Payload=json.dumps({"vcf_location": vcf_location}),
+                )
+            if item.vcfLocations:
+                pending.append("Summarising VCFs")
+
             # dataset metadata entry information
             dataset = jsons.load(json_dataset, Dataset)
             dataset.id = datasetId
             dataset._assemblyId = item.assemblyId
             dataset._vcfLocations = item.vcfLocations
             dataset._vcfChromosomeMap = [
-                vcfm.attribute_values for vcfm in vcf_chromosome_maps
+                vcfm.as_dict() for vcfm in vcf_chromosome_maps
             ]
             dataset.createDateTime = str(item.createDateTime)
             dataset.updateDateTime = str(item.updateDateTime)
@@ -120,6 +131,8 @@ def create_dataset(attributes, vcf_chromosome_maps):
     print("Awaiting uploads")
     [thread.join() for thread in threads]
     print("Upload finished")
+    # cached variant query results no longer apply
+    bump_datasets_generation()
 
     if index:
         aws_lambda.invoke(
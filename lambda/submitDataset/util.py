@@ -2,6 +2,7 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from shared.utils import get_vcf_chromosomes
 from shared.dynamodb import VcfChromosomeMap
+from shared.vcfutils import vcf_coverage
 
 
 def get_vcf_chromosome_map(vcf_location):
@@ -11,6 +12,9 @@ def get_vcf_chromosome_map(vcf_location):
         vcf_chromosome_map = VcfChromosomeMap()
         vcf_chromosome_map.vcf = vcf_location
         vcf_chromosome_map.chromosomes = chroms
+        # lets the search skip vcfs and splits without records
+        if (coverage := vcf_coverage(vcf_location)) is not None:
+            vcf_chromosome_map.coverage = coverage
 
     return errored, error, vcf_chromosome_map
 
@@ -0,0 +1,117 @@
+from array import array
+import json
+import os
+import tempfile
+
+import boto3
+
+from shared.dynamodb import bump_datasets_generation
+from shared.utils import clear_tmp
+from shared.vcfutils import (
+    BloomFilter,
+    KeyIndexWriter,
+    SidecarWriter,
+    TileWriter,
+    VcfReader,
+    allele_hash,
+    filter_key,
+    key_index_key,
+    sidecar_key,
+    tiles_key,
+)
+
+
+VARIANTS_BUCKET = os.environ["VARIANTS_BUCKET"]
+
+
+s3 = boto3.client("s3")
+
+
+def upload_sidecar(vcf_location, writer, sidecar_file):
+    writer.close()
+    sidecar_file.flush()
+    key = sidecar_key(vcf_location, writer.chrom)
+    s3.upload_file(sidecar_file.name, VARIANTS_BUCKET, key)
+    sidecar_file.close()
+    print(f"Uploaded sidecar s3://{VARIANTS_BUCKET}/{key}")
+
+
+def upload_tiles(vcf_location, writer, tiles_file):
+    writer.close()
+    tiles_file.flush()
+    key = tiles_key(vcf_location, writer.chrom)
+    s3.upload_file(tiles_file.name, VARIANTS_BUCKET, key)
+    tiles_file.close()
+    print(f"Uploaded tiles s3://{VARIANTS_BUCKET}/{key}")
+
+
+def upload_filter(vcf_location, hashes, etag):
+    key = filter_key(vcf_location)
+    bloom = BloomFilter.from_hashes(hashes, etag)
+    s3.put_object(Bucket=VARIANTS_BUCKET, Key=key, Body=bytes(bloom.to_bytes()))
+    print(f"Uploaded filter of {len(hashes)} alleles s3://{VARIANTS_BUCKET}/{key}")
+
+
+def upload_key_index(vcf_location, key_index, etag):
+    key = key_index_key(vcf_location)
+    with tempfile.NamedTemporaryFile(dir="/tmp", suffix=".keys") as key_index_file:
+        key_index.write(key_index_file, etag)
+        key_index_file.flush()
+        s3.upload_file(key_index_file.name, VARIANTS_BUCKET, key)
+    print(f"Uploaded key index s3://{VARIANTS_BUCKET}/{key}")
+
+
+# builds a sites only sidecar and count tiles per chromosome, and an
+# allele filter and key index of the vcf in a single pass over the vcf
+def summarise_vcf(vcf_location):
+    reader = VcfReader(vcf_location)
+    # sidecars and indexes record the vcf they were built from
+    etag = reader.source.etag()
+    writer = None
+    tile_writer = None
+    sidecar_file = None
+    tiles_file = None
+    summary = dict()
+    hashes = array("Q")
+    key_index = KeyIndexWriter()
+
+    for voffset, record in reader.scan_offsets():
+        if writer is None or record.chrom != writer.chrom:
+            if writer is not None:
+                upload_sidecar(vcf_location, writer, sidecar_file)
+                upload_tiles(vcf_location, tile_writer, tiles_file)
+                summary[writer.chrom] = writer.records
+            sidecar_file = tempfile.NamedTemporaryFile(dir="/tmp", suffix=".sites")
+            tiles_file = tempfile.NamedTemporaryFile(dir="/tmp", suffix=".tiles")
+            writer = SidecarWriter(sidecar_file, record.chrom, vcf_location, etag)
+            tile_writer = TileWriter(tiles_file, record.chrom, etag)
+        writer.add(record)
+        tile_writer.add(record)
+        for alt in record.alts:
+            value = allele_hash(record.chrom, record.pos, record.ref, alt)
+            hashes.append(value)
+            key_index.add(value, voffset)
+
+    if writer is not None:
+        upload_sidecar(vcf_location, writer, sidecar_file)
+        upload_tiles(vcf_location, tile_writer, tiles_file)
+        summary[writer.chrom] = writer.records
+    upload_filter(vcf_location, hashes, etag)
+    upload_key_index(vcf_location, key_index, etag)
+
+    return summary
+
+
+def lambda_handler(event, context):
+    print("Event Received: {}".format(json.dumps(event)))
+    vcf_location = event["vcf_location"]
+    summary = summarise_vcf(vcf_location)
+    print(f"Summarised {vcf_location}: {summary}")
+    # allele filters cached by coordinators are reloaded in the next generation
+    bump_datasets_generation()
+    clear_tmp()
+    return summary
+
+
+if __name__ == "__main__":
+    pass
@@ -49,7 +49,8 @@ locals {
     # authentication variables
     BEACON_ENABLE_AUTH = var.beacon-enable-auth
     # configurations
-    CONFIG_MAX_VARIANT_SEARCH_BASE_RANGE = var.config-max-variant-search-base-range
+    CONFIG_MAX_VARIANT_SEARCH_BASE_RANGE  = var.config-max-variant-search-base-range
+    CONFIG_MAX_VARIANT_SEARCH_CONCURRENCY = var.config-max-variant-search-concurrency
   }
   # athena related variables
   athena_variables = {
@@ -83,6 +84,8 @@ locals {
     DYNAMO_ONTOLOGIES_TABLE              = aws_dynamodb_table.ontologies.name
     DYNAMO_ANSCESTORS_TABLE              = aws_dynamodb_table.anscestor_terms.name
     DYNAMO_DESCENDANTS_TABLE             = aws_dynamodb_table.descendant_terms.name
+    DYNAMO_INVOCATION_STATS_TABLE        = aws_dynamodb_table.invocation_stats.name
+    DYNAMO_SPLIT_RESULTS_TABLE           = aws_dynamodb_table.split_results.name
   }
   # layers
   binaries_layer         = "${aws_lambda_layer_version.binaries_layer.layer_arn}:${aws_lambda_layer_version.binaries_layer.version}"
@@ -118,6 +121,7 @@ module "lambda-submitDataset" {
     {
       DYNAMO_DATASETS_TABLE           = aws_dynamodb_table.datasets.name
       INDEXER_LAMBDA                  = module.lambda-indexer.lambda_function_name
+      SUMMARISE_VCF_LAMBDA            = module.lambda-summariseVcf.lambda_function_name
     },
     local.sbeacon_variables,
     local.athena_variables,
@@ -300,9 +304,10 @@ module "lambda-getAnalyses" {
   policy_jsons = [
     data.aws_iam_policy_document.lambda-getAnalyses.json,
     data.aws_iam_policy_document.athena-full-access.json,
-    data.aws_iam_policy_document.dynamodb-onto-access.json
+    data.aws_iam_policy_document.dynamodb-onto-access.json,
+    data.aws_iam_policy_document.dynamodb-invocation-stats-access.json
   ]
-  number_of_policy_jsons = 3
+  number_of_policy_jsons = 4
   source_path            = "${path.module}/lambda/getAnalyses"
 
   tags = var.common-tags
@@ -339,9 +344,10 @@ module "lambda-getGenomicVariants" {
   policy_jsons = [
     data.aws_iam_policy_document.lambda-getGenomicVariants.json,
     data.aws_iam_policy_document.athena-full-access.json,
-    data.aws_iam_policy_document.dynamodb-onto-access.json
+    data.aws_iam_policy_document.dynamodb-onto-access.json,
+    data.aws_iam_policy_document.dynamodb-invocation-stats-access.json
   ]
-  number_of_policy_jsons = 3
+  number_of_policy_jsons = 4
   source_path            = "${path.module}/lambda/getGenomicVariants"
 
   tags = var.common-tags
@@ -349,7 +355,8 @@ module "lambda-getGenomicVariants" {
   environment_variables = merge(
     {
       SPLIT_QUERY_LAMBDA    = module.lambda-splitQuery.lambda_function_name,
-      SPLIT_QUERY_TOPIC_ARN = aws_sns_topic.splitQuery.arn
+      SPLIT_QUERY_TOPIC_ARN = aws_sns_topic.splitQuery.arn,
+      VARIANTS_BUCKET       = aws_s3_bucket.variants-bucket.bucket
     },
     local.athena_variables,
     local.sbeacon_variables,
@@ -378,9 +385,10 @@ module "lambda-getIndividuals" {
   policy_jsons = [
     data.aws_iam_policy_document.lambda-getIndividuals.json,
     data.aws_iam_policy_document.athena-full-access.json,
-    data.aws_iam_policy_document.dynamodb-onto-access.json
+    data.aws_iam_policy_document.dynamodb-onto-access.json,
+    data.aws_iam_policy_document.dynamodb-invocation-stats-access.json
   ]
-  number_of_policy_jsons = 3
+  number_of_policy_jsons = 4
   source_path            = "${path.module}/lambda/getIndividuals"
 
   tags = var.common-tags
@@ -417,9 +425,10 @@ module "lambda-getBiosamples" {
   policy_jsons = [
     data.aws_iam_policy_document.lambda-getBiosamples.json,
     data.aws_iam_policy_document.athena-full-access.json,
-    data.aws_iam_policy_document.dynamodb-onto-access.json
+    data.aws_iam_policy_document.dynamodb-onto-access.json,
+    data.aws_iam_policy_document.dynamodb-invocation-stats-access.json
   ]
-  number_of_policy_jsons = 3
+  number_of_policy_jsons = 4
   source_path            = "${path.module}/lambda/getBiosamples"
 
   tags = var.common-tags
@@ -456,9 +465,10 @@ module "lambda-getDatasets" {
   policy_jsons = [
     data.aws_iam_policy_document.lambda-getDatasets.json,
     data.aws_iam_policy_document.athena-full-access.json,
-    data.aws_iam_policy_document.dynamodb-onto-access.json
+    data.aws_iam_policy_document.dynamodb-onto-access.json,
+    data.aws_iam_policy_document.dynamodb-invocation-stats-access.json
   ]
-  number_of_policy_jsons = 3
+  number_of_policy_jsons = 4
   source_path            = "${path.module}/lambda/getDatasets"
 
   tags = var.common-tags
@@ -466,7 +476,8 @@ module "lambda-getDatasets" {
   environment_variables = merge(
     {
       SPLIT_QUERY_LAMBDA    = module.lambda-splitQuery.lambda_function_name,
-      SPLIT_QUERY_TOPIC_ARN = aws_sns_topic.splitQuery.arn
+      SPLIT_QUERY_TOPIC_ARN = aws_sns_topic.splitQuery.arn,
+      VARIANTS_BUCKET       = aws_s3_bucket.variants-bucket.bucket
     },
     local.athena_variables,
     local.sbeacon_variables,
@@ -495,9 +506,10 @@ module "lambda-getCohorts" {
   policy_jsons = [
     data.aws_iam_policy_document.lambda-getCohorts.json,
     data.aws_iam_policy_document.athena-full-access.json,
-    data.aws_iam_policy_document.dynamodb-onto-access.json
+    data.aws_iam_policy_document.dynamodb-onto-access.json,
+    data.aws_iam_policy_document.dynamodb-invocation-stats-access.json
   ]
-  number_of_policy_jsons = 3
+  number_of_policy_jsons = 4
   source_path            = "${path.module}/lambda/getCohorts"
 
   tags = var.common-tags
@@ -533,9 +545,10 @@ module "lambda-getRuns" {
   policy_jsons = [
     data.aws_iam_policy_document.lambda-getRuns.json,
     data.aws_iam_policy_document.athena-full-access.json,
-    data.aws_iam_policy_document.dynamodb-onto-access.json
+    data.aws_iam_policy_document.dynamodb-onto-access.json,
+    data.aws_iam_policy_document.dynamodb-invocation-stats-access.json
   ]
-  number_of_policy_jsons = 3
+  number_of_policy_jsons = 4
   source_path            = "${path.module}/lambda/getRuns"
 
   tags = var.common-tags
@@ -562,21 +575,27 @@ module "lambda-getRuns" {
 module "lambda-splitQuery" {
   source = "terraform-aws-modules/lambda/aws"
 
-  function_name      = "splitQuery"
-  description        = "Splits a dataset into smaller slices of VCFs and invokes performQuery on each."
-  handler            = "lambda_function.lambda_handler"
-  runtime            = "python3.12"
-  memory_size        = 1769
-  timeout            = 30
-  attach_policy_json = true
-  policy_json        = data.aws_iam_policy_document.lambda-splitQuery.json
-  source_path        = "${path.module}/lambda/splitQuery"
-  tags               = var.common-tags
+  function_name       = "splitQuery"
+  description         = "Splits a dataset into smaller slices of VCFs and invokes performQuery on each."
+  handler             = "lambda_function.lambda_handler"
+  runtime             = "python3.12"
+  memory_size         = 1769
+  timeout             = 30
+  attach_policy_jsons = true
+  policy_jsons = [
+    data.aws_iam_policy_document.lambda-splitQuery.json,
+    data.aws_iam_policy_document.dynamodb-invocation-stats-access.json
+  ]
+  number_of_policy_jsons = 2
+  source_path            = "${path.module}/lambda/splitQuery"
+  tags                   = var.common-tags
 
-  environment_variables = {
+  environment_variables = merge({
     PERFORM_QUERY_LAMBDA    = module.lambda-performQuery.lambda_function_name,
     PERFORM_QUERY_TOPIC_ARN = aws_sns_topic.performQuery.arn
-  }
+    VARIANTS_BUCKET         = aws_s3_bucket.variants-bucket.bucket
+    },
+  local.dynamodb_variables)
 
   layers = [
     local.python_libraries_layer,
@@ -615,6 +634,36 @@ module "lambda-performQuery" {
   local.dynamodb_variables)
 }
 
+#
+# summariseVcf Lambda Function
+#
+module "lambda-summariseVcf" {
+  source = "terraform-aws-modules/lambda/aws"
+
+  function_name          = "summariseVcf"
+  description            = "Builds the sites sidecars, count tiles, allele filters and key index of a vcf."
+  handler                = "lambda_function.lambda_handler"
+  runtime                = "python3.12"
+  memory_size            = 1769
+  timeout                = 900
+  ephemeral_storage_size = 4096
+  attach_policy_json     = true
+  policy_json            = data.aws_iam_policy_document.lambda-summariseVcf.json
+  source_path            = "${path.module}/lambda/summariseVcf"
+  tags                   = var.common-tags
+
+  layers = [
+    local.python_libraries_layer,
+    local.python_modules_layer
+  ]
+
+  environment_variables = merge({
+    VARIANTS_BUCKET = aws_s3_bucket.variants-bucket.bucket
+    },
+    local.sbeacon_variables,
+  local.dynamodb_variables)
+}
+
 #
 # indexer Lambda Function
 #
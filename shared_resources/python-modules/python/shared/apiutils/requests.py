@@ -153,6 +153,8 @@ class CustomFilter(CamelModel):
 class Pagination(CamelModel):
     skip: int = 0
     limit: int = 10
+    # CHANGE: continuation token of a previous page, replaces skip
+    current_page: Optional[str] = None
 
 
 # Thirdparty Code
@@ -203,6 +205,8 @@ class RequestParams(CamelModel):
                 self.query.pagination.skip = int(v)
             elif k == "limit":
                 self.query.pagination.limit = int(v)
+            elif k == "currentPage":
+                self.query.pagination.current_page = v
             elif k == "includeResultsetResponses":
                 self.query.include_resultset_responses = IncludeResultsetResponses(v)
             elif k == "requestedGranularity":
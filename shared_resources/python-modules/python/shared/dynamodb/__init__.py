@@ -1,3 +1,26 @@
 from .datasets import Dataset, VcfChromosomeMap
 from .ontologies import Anscestors, Descendants, Ontology
-from .variant_queries import VariantQuery, VariantResponse, VariantResponseIndex, S3Location
+from .variant_queries import (
+    VariantQuery,
+    VariantResponse,
+    VariantResponseIndex,
+    S3Location,
+    QueryCancellation,
+    JobStatus,
+    bump_datasets_generation,
+    cancel_query,
+    complete_job,
+    get_datasets_generation,
+    get_job_result,
+    get_job_status,
+    start_job,
+)
+from .split_results import SplitResult
+from .invocation_stats import (
+    InvocationStats,
+    PERFORM_QUERY_LATENCY,
+    SPLIT_QUERY_OVERHEAD,
+    flush_latencies,
+    get_latency,
+    record_latency,
+)
@@ -35,6 +35,8 @@ class DatasetIndex(GlobalSecondaryIndex):
 class VcfChromosomeMap(MapAttribute):
     vcf = UnicodeAttribute()
     chromosomes = UnicodeSetAttribute(default_for_new=list)
+    # chromosome -> extents and occupied bins, see shared.vcfutils.coverage
+    coverage = MapAttribute(null=True)
 
 
 # datasets table
@@ -0,0 +1,107 @@
+from datetime import datetime, timezone
+import threading
+import time
+
+import boto3
+from pynamodb.models import Model
+from pynamodb.attributes import (
+    NumberAttribute,
+    UnicodeAttribute,
+    UTCDateTimeAttribute,
+)
+
+from shared.utils import ENV_DYNAMO
+
+
+SESSION = boto3.session.Session()
+REGION = SESSION.region_name
+# latency of a single performQuery invocation as seen by splitQuery
+PERFORM_QUERY_LATENCY = "performQuery.latency"
+# time of a splitQuery invocation not spent waiting for performQuery
+SPLIT_QUERY_OVERHEAD = "splitQuery.overhead"
+# weight of each new sample in the rolling mean
+SMOOTHING = 0.05
+FLUSH_INTERVAL_SECONDS = 30
+CACHE_SECONDS = 60
+
+
+def get_current_time_utc():
+    return datetime.now(timezone.utc)
+
+
+# rolling latency statistics used to size the query fan out
+class InvocationStats(Model):
+    class Meta:
+        table_name = ENV_DYNAMO.DYNAMO_INVOCATION_STATS_TABLE
+        region = REGION
+
+    id = UnicodeAttribute(hash_key=True)
+    mean = NumberAttribute(default=0)
+    samples = NumberAttribute(default=0)
+    updated = UTCDateTimeAttribute(null=True)
+
+
+# samples are buffered per container and merged into the table in batches
+# metric -> [sum, count]
+pending = dict()
+pending_lock = threading.Lock()
+last_flush = time.time()
+# metric -> (mean or None, time read)
+cached = dict()
+
+
+def record_latency(metric, seconds):
+    with pending_lock:
+        totals = pending.setdefault(metric, [0, 0])
+        totals[0] += seconds
+        totals[1] += 1
+
+
+def flush_latencies(force=False):
+    global last_flush
+
+    with pending_lock:
+        if not pending or (
+            not force and time.time() - last_flush < FLUSH_INTERVAL_SECONDS
+        ):
+            return
+        batch = dict(pending)
+        pending.clear()
+        last_flush = time.time()
+
+    for metric, (total, count) in batch.items():
+        # concurrent writers may overwrite each other, losing a few samples
+        # is acceptable for a rolling estimate
+        try:
+            try:
+                item = InvocationStats.get(metric)
+            except InvocationStats.DoesNotExist:
+                item = InvocationStats(metric)
+            weight = 1 - (1 - SMOOTHING) ** count if item.samples else 1
+            item.mean += weight * (total / count - item.mean)
+            item.samples += count
+            item.updated = get_current_time_utc()
+            item.save()
+            cached[metric] = (item.mean, time.time())
+        except Exception as e:
+            print(f"Unable to save {metric} statistics: {e}")
+
+
+def get_latency(metric, default):
+    mean, read_time = cached.get(metric, (None, 0))
+
+    if time.time() - read_time > CACHE_SECONDS:
+        try:
+            item = InvocationStats.get(metric)
+            mean = item.mean if item.samples else None
+        except InvocationStats.DoesNotExist:
+            mean = None
+        except Exception as e:
+            print(f"Unable to read {metric} statistics: {e}")
+        cached[metric] = (mean, time.time())
+
+    return default if mean is None else mean
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+import boto3
+from pynamodb.models import Model
+from pynamodb.attributes import UnicodeAttribute, TTLAttribute
+
+from shared.utils import ENV_DYNAMO
+
+
+SESSION = boto3.session.Session()
+REGION = SESSION.region_name
+
+
+# results of performQuery keyed by vcf etag, region and predicate
+class SplitResult(Model):
+    class Meta:
+        table_name = ENV_DYNAMO.DYNAMO_SPLIT_RESULTS_TABLE
+        region = REGION
+
+    id = UnicodeAttribute(hash_key=True)
+    result = UnicodeAttribute()
+    timeToExist = TTLAttribute(default_for_new=timedelta(days=7))
+
+
+if __name__ == "__main__":
+    pass
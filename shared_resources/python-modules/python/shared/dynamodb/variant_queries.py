@@ -1,5 +1,8 @@
 from datetime import datetime, timezone, timedelta
 from enum import Enum
+import os
+import tempfile
+import time
 
 import boto3
 from pynamodb.models import Model
@@ -13,11 +16,20 @@ from pynamodb.attributes import (
     UTCDateTimeAttribute,
 )
 
-from shared.utils import ENV_DYNAMO
+from shared.utils import ENV_CONFIG, ENV_DYNAMO
 
 
 SESSION = boto3.session.Session()
 REGION = SESSION.region_name
+# minimum time between two reads of the cancellation flag
+CANCEL_CHECK_SECONDS = 0.5
+# cancellations of the local backend are files seen by all of its processes
+LOCAL_CANCELLATIONS_DIR = os.path.join(tempfile.gettempdir(), "query-cancellations")
+# item counting dataset submissions, cached results of older generations are not used
+DATASETS_GENERATION_ID = "datasets-generation"
+RESULT_TTL = timedelta(hours=24)
+# dynamodb items are limited to 400 kb
+MAX_RESULT_SIZE = 350 * 1024
 
 
 def get_current_time_utc():
@@ -39,11 +51,13 @@ class VariantQuery(Model):
     responsesCounter = NumberAttribute(default=0)
     responses = NumberAttribute(default=0)
     fanOut = NumberAttribute(default=0)
-    startTime = UTCDateTimeAttribute(default_for_new=get_current_time_utc())
+    startTime = UTCDateTimeAttribute(default_for_new=get_current_time_utc)
     endTime = UTCDateTimeAttribute(null=True)
     elapsedTime = NumberAttribute(default_for_new=-1)
     timeToExist = TTLAttribute(default_for_new=timedelta(minutes=5))
     complete = BooleanAttribute(default_for_new=False)
+    cancelled = BooleanAttribute(null=True)
+    generation = NumberAttribute(null=True)
 
     # atomically increment
     def getResponseNumber(self):
@@ -65,6 +79,57 @@ class VariantQuery(Model):
         )
 
 
+def local_cancellation(query_id):
+    return os.path.join(LOCAL_CANCELLATIONS_DIR, query_id)
+
+
+def cancel_query(query_id):
+    if ENV_CONFIG.CONFIG_EXECUTION_BACKEND == "local":
+        os.makedirs(LOCAL_CANCELLATIONS_DIR, exist_ok=True)
+        open(local_cancellation(query_id), "w").close()
+        return
+    # creates the item if the query was not recorded
+    try:
+        VariantQuery(query_id).update(
+            actions=[
+                VariantQuery.cancelled.set(True),
+                VariantQuery.timeToExist.set(timedelta(minutes=5)),
+            ]
+        )
+    except Exception as e:
+        print(f"Unable to cancel query {query_id}: {e}")
+
+
+# polled by the lambdas working on a query so that work stops
+# once the answer is known, reads are rate limited
+class QueryCancellation:
+    def __init__(self, query_id):
+        self.query_id = query_id
+        self.cancelled = False
+        self.checked = 0
+        self.local = ENV_CONFIG.CONFIG_EXECUTION_BACKEND == "local"
+
+    def is_cancelled(self):
+        if self.cancelled or not self.query_id:
+            return self.cancelled
+        if self.local:
+            self.cancelled = os.path.exists(local_cancellation(self.query_id))
+            return self.cancelled
+
+        now = time.time()
+        if now - self.checked >= CANCEL_CHECK_SECONDS:
+            self.checked = now
+            try:
+                item = VariantQuery.get(self.query_id, attributes_to_get=["cancelled"])
+                self.cancelled = bool(item.cancelled)
+            except VariantQuery.DoesNotExist:
+                pass
+            except Exception as e:
+                print(f"Unable to check query {self.query_id}: {e}")
+
+        return self.cancelled
+
+
 class VariantResponseIndex(LocalSecondaryIndex):
     class Meta:
         index_name = "responseNumber_index"
@@ -98,15 +163,68 @@ class JobStatus(Enum):
 
 
 def get_job_status(query_id):
-    # TODO implement caching
-    # try:
-    #     item = VariantQuery.get(query_id)
-    #     if item.complete:
-    #         return JobStatus.COMPLETED
-    #     else:
-    #         return JobStatus.RUNNING
-    # except VariantQuery.DoesNotExist:
-    return JobStatus.NEW
+    try:
+        item = VariantQuery.get(query_id)
+    except VariantQuery.DoesNotExist:
+        return JobStatus.NEW
+
+    # expired items are removed by dynamodb with a delay
+    if item.timeToExist is not None and item.timeToExist < get_current_time_utc():
+        return JobStatus.NEW
+    if item.complete:
+        return JobStatus.COMPLETED
+    return JobStatus.RUNNING
+
+
+def start_job(query_id):
+    VariantQuery(query_id).save()
+
+
+def complete_job(query_id, result):
+    # result is a json string, returns False if it was too large to keep
+    if len(result) > MAX_RESULT_SIZE:
+        return False
+
+    response = VariantResponse(query_id, 0)
+    response.checkS3 = False
+    response.result = result
+    response.timeToExist = RESULT_TTL
+    response.save()
+
+    query = VariantQuery(query_id)
+    query.update(
+        actions=[
+            VariantQuery.complete.set(True),
+            VariantQuery.endTime.set(get_current_time_utc()),
+            VariantQuery.timeToExist.set(RESULT_TTL),
+        ]
+    )
+    return True
+
+
+def get_job_result(query_id):
+    try:
+        response = VariantResponse.get(query_id, 0)
+    except VariantResponse.DoesNotExist:
+        return None
+    return response.result
+
+
+def get_datasets_generation():
+    try:
+        item = VariantQuery.get(
+            DATASETS_GENERATION_ID, attributes_to_get=["generation"]
+        )
+    except VariantQuery.DoesNotExist:
+        return 0
+    return int(item.generation or 0)
+
+
+def bump_datasets_generation():
+    # the item has no ttl and lives as long as the table
+    VariantQuery(DATASETS_GENERATION_ID).update(
+        actions=[VariantQuery.generation.add(1)]
+    )
 
 
 if __name__ == "__main__":
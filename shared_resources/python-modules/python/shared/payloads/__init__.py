@@ -1,2 +1,3 @@
 from .lambda_payloads import PerformQueryPayload, SplitQueryPayload
 from .lambda_responses import PerformQueryResponse, SplitQueryResponse
+from .wire_format import decode_response, encode_response, is_encoded
@@ -0,0 +1,173 @@
+from array import array
+from collections.abc import Sequence
+import base64
+import struct
+import sys
+import zlib
+
+from .lambda_responses import PerformQueryResponse
+
+
+# version of the compact encoding of PerformQueryResponse
+# plain json responses carry no encoding and are still accepted
+ENCODING = "pqr/1"
+# all_alleles_count, call_count, strings, variants, samples, string bytes
+HEADER = struct.Struct("<QQIIII")
+# columns of a variant, each an index into the string table except POS
+POS, CHROM, REF, ALT, TYPE = range(5)
+COLUMNS = 5
+
+
+class StringTable:
+    def __init__(self):
+        self.indices = dict()
+        self.strings = []
+
+    def add(self, string):
+        if (index := self.indices.get(string)) is None:
+            index = self.indices[string] = len(self.strings)
+            self.strings.append(string)
+        return index
+
+
+def to_little_endian(values):
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values.tobytes()
+
+
+def encode_response(response: dict) -> dict:
+    """
+    Encodes the variants and sample names of a performQuery response as
+    columns of integers and a string table, compressed and base64 encoded.
+    dataset_id and exists are kept readable for the fan out and spilling.
+    """
+    variants = response["variants"]
+    sample_names = response["sample_names"]
+    if not variants and not sample_names:
+        return response
+
+    table = StringTable()
+    columns = array("I")
+    if variants:
+        chroms, positions, refs, alts, types = zip(
+            *(variant.split("\t") for variant in variants)
+        )
+        columns.extend(map(int, positions))
+        for column in (chroms, refs, alts, types):
+            indices = {string: table.add(string) for string in dict.fromkeys(column)}
+            columns.extend(map(indices.__getitem__, column))
+    samples = array("I", [table.add(sample) for sample in sample_names])
+
+    encoded = [string.encode() for string in table.strings]
+    offsets = array("I", [0])
+    for string in encoded:
+        offsets.append(offsets[-1] + len(string))
+
+    data = b"".join(
+        [
+            HEADER.pack(
+                response["all_alleles_count"],
+                response["call_count"],
+                len(encoded),
+                len(variants),
+                len(samples),
+                offsets[-1],
+            ),
+            to_little_endian(offsets),
+            to_little_endian(columns),
+            to_little_endian(samples),
+            *encoded,
+        ]
+    )
+    # responses are decompressed once, speed matters more than size
+
+    return {
+        "dataset_id": response["dataset_id"],
+        "exists": response["exists"],
+        "encoding": ENCODING,
+        "data": base64.b64encode(zlib.compress(data, 1)).decode(),
+    }
+
+
+def is_encoded(response):
+    return isinstance(response, dict) and "encoding" in response
+
+
+def uint32_view(buffer, offset, count):
+    # reinterprets the buffer without copying on little endian hosts
+    view = memoryview(buffer)[offset : offset + 4 * count]
+    if sys.byteorder == "little":
+        return view.cast("I")
+    values = array("I", bytes(view))
+    values.byteswap()
+    return values
+
+
+class VariantColumns(Sequence):
+    """
+    Variants of a decoded response, rendered as the tab separated
+    strings of performQuery only when they are read.
+    """
+
+    def __init__(self, columns, strings, count):
+        self.columns = columns
+        self.strings = strings
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, n):
+        if isinstance(n, slice):
+            return [self[i] for i in range(*n.indices(self.count))]
+        if n < 0:
+            n += self.count
+        if not 0 <= n < self.count:
+            raise IndexError("variant index out of range")
+        columns, strings, count = self.columns, self.strings, self.count
+        return (
+            f"{strings[columns[CHROM * count + n]]}\t{columns[POS * count + n]}\t"
+            f"{strings[columns[REF * count + n]]}\t{strings[columns[ALT * count + n]]}\t"
+            f"{strings[columns[TYPE * count + n]]}"
+        )
+
+
+def decode_response(response: dict) -> PerformQueryResponse:
+    if response["encoding"] != ENCODING:
+        raise ValueError(f"Unsupported response encoding {response['encoding']}")
+
+    data = zlib.decompress(base64.b64decode(response["data"]))
+    (
+        all_alleles_count,
+        call_count,
+        string_count,
+        variant_count,
+        sample_count,
+        string_bytes,
+    ) = HEADER.unpack_from(data)
+
+    offset = HEADER.size
+    offsets = uint32_view(data, offset, string_count + 1)
+    offset += 4 * (string_count + 1)
+    columns = uint32_view(data, offset, COLUMNS * variant_count)
+    offset += 4 * COLUMNS * variant_count
+    samples = uint32_view(data, offset, sample_count)
+    offset += 4 * sample_count
+    text = data[offset : offset + string_bytes]
+    strings = [
+        text[offsets[n] : offsets[n + 1]].decode() for n in range(string_count)
+    ]
+
+    return PerformQueryResponse(
+        dataset_id=response["dataset_id"],
+        exists=response["exists"],
+        all_alleles_count=all_alleles_count,
+        variants=VariantColumns(columns, strings, variant_count),
+        call_count=call_count,
+        sample_names=[strings[n] for n in samples],
+    )
+
+
+if __name__ == "__main__":
+    pass
@@ -1,4 +1,9 @@
-from .chrom_matching import get_matching_chromosome, get_vcf_chromosomes
+from .chrom_matching import (
+    get_chromosome_lookup,
+    get_matching_chromosome,
+    get_vcf_chromosomes,
+    match_vcf_chromosome,
+)
 from .lambda_utils import (
     ENV_ATHENA,
     ENV_BEACON,
@@ -10,3 +15,11 @@ from .lambda_utils import (
     clear_tmp,
 )
 from .lambda_utils import LambdaClient
+from .async_lambda import AsyncLambdaClient
+from .execution_backends import LambdaBackend, LocalBackend, get_backend
+from .response_spill import (
+    MAX_INLINE_RESPONSE_SIZE,
+    is_spilled,
+    read_spilled,
+    spill_responses,
+)
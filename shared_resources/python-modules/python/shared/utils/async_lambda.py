@@ -0,0 +1,151 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import random
+import time
+
+import botocore
+import boto3
+
+
+# invocation errors that are retried after a backoff
+RETRIED_ERRORS = ("TooManyRequestsException", "ServiceException")
+MAX_ATTEMPTS = 10
+BASE_DELAY = 0.1
+MAX_DELAY = 5
+DECREASE_FACTOR = 0.5
+
+
+class AdaptiveLimit:
+    """
+    Invocations allowed in flight, adjusted by additive increase and
+    multiplicative decrease. Every success grows the limit by 1/limit,
+    about one per round of calls, and throttling halves it. Calls started
+    before the last decrease saw the old limit, so a burst of throttles
+    only halves it once.
+    """
+
+    def __init__(self, initial, maximum):
+        self.value = float(initial)
+        self.maximum = maximum
+        self.decreased = 0
+
+    def increase(self):
+        self.value = min(self.maximum, self.value + 1 / self.value)
+
+    def decrease(self, started):
+        if started < self.decreased:
+            return
+        self.decreased = time.time()
+        self.value = max(1.0, self.value * DECREASE_FACTOR)
+
+    def __int__(self):
+        return int(self.value)
+
+
+def backoff_delay(attempt):
+    # exponential backoff with full jitter
+    return random.uniform(0, min(MAX_DELAY, BASE_DELAY * 2**attempt))
+
+
+class AsyncLambdaClient:
+    """
+    Invokes lambdas from coroutines. Calls share one pooled client and run
+    on worker threads only while a request is in flight; waiting for a
+    slot or a backoff holds no thread. Throttled calls are retried with
+    exponential backoff and shrink the in-flight limit.
+    """
+
+    def __init__(self, max_concurrency, initial_concurrency=None):
+        lambda_config = botocore.config.Config(
+            read_timeout=300,
+            max_pool_connections=max_concurrency,
+            retries={
+                "total_max_attempts": 1,
+            },
+        )
+        self.client = boto3.client("lambda", config=lambda_config)
+        self.executor = ThreadPoolExecutor(max_concurrency)
+        self.limit = AdaptiveLimit(
+            initial_concurrency or max_concurrency, max_concurrency
+        )
+        self.in_flight = 0
+        self.loop = None
+        self.condition = None
+        self.latencies = []
+        self.throttles = 0
+
+    def call(self, kwargs):
+        response = self.client.invoke(**kwargs)
+        # the body is read on the worker thread too
+        response["Payload"] = response["Payload"].read()
+        return response
+
+    async def acquire(self):
+        # asyncio primitives belong to a loop, each handler run has its own
+        loop = asyncio.get_running_loop()
+        if loop is not self.loop:
+            self.loop = loop
+            self.condition = asyncio.Condition()
+            self.in_flight = 0
+        async with self.condition:
+            await self.condition.wait_for(
+                lambda: self.in_flight < int(self.limit)
+            )
+            self.in_flight += 1
+
+    async def release(self):
+        async with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    async def invoke(self, cancelled=None, **kwargs):
+        # returns the invoke response with the payload read into bytes, or
+        # None when cancelled() is true once the call has a slot
+        loop = asyncio.get_running_loop()
+        for attempt in range(MAX_ATTEMPTS):
+            await self.acquire()
+            start_time = time.time()
+            try:
+                # calls queued for a slot are dropped if cancelled meanwhile
+                if cancelled is not None and cancelled():
+                    return None
+                response = await loop.run_in_executor(
+                    self.executor, self.call, kwargs
+                )
+            except botocore.exceptions.ClientError as error:
+                code = error.response["Error"]["Code"]
+                if code not in RETRIED_ERRORS or attempt + 1 == MAX_ATTEMPTS:
+                    raise error
+                self.throttles += 1
+                self.limit.decrease(start_time)
+            else:
+                self.limit.increase()
+                self.latencies.append(time.time() - start_time)
+                return response
+            finally:
+                await self.release()
+            await asyncio.sleep(backoff_delay(attempt))
+
+    def flush_metrics(self):
+        # logs the calls since the last flush
+        if not self.latencies and not self.throttles:
+            return
+        message = (
+            f"Invocations: {len(self.latencies)} throttled: {self.throttles} "
+            f"limit: {int(self.limit)}"
+        )
+        if self.latencies:
+            latencies = sorted(self.latencies)
+            p50 = latencies[len(latencies) // 2]
+            p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+            message += (
+                f" latency p50: {p50:.3f}s p95: {p95:.3f}s"
+                f" max: {latencies[-1]:.3f}s"
+            )
+        print(message)
+        self.latencies = []
+        self.throttles = 0
+
+
+if __name__ == "__main__":
+    pass
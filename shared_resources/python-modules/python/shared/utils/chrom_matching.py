@@ -78,6 +78,25 @@ def get_matching_chromosome(vcf_chromosomes, target_chromosome):
     return None
 
 
+def get_chromosome_lookup(vcf_chromosomes):
+    # target chromosome -> name in the vcf, as get_matching_chromosome matches it
+    lookup = dict()
+    for vcf_chrom in vcf_chromosomes:
+        lookup.setdefault(vcf_chrom, vcf_chrom)
+        if (chrom := _match_chromosome_name(vcf_chrom)) is not None:
+            lookup.setdefault(chrom, vcf_chrom)
+    return lookup
+
+
+def match_vcf_chromosome(vcf_chromosome_map, target_chromosome):
+    # catalog datasets carry a precomputed lookup of their chromosome names
+    if (lookup := vcf_chromosome_map.get("chromosomeLookup")) is not None:
+        return lookup.get(target_chromosome)
+    return get_matching_chromosome(
+        vcf_chromosome_map["chromosomes"], target_chromosome
+    )
+
+
 def _match_chromosome_name(chromosome_name):
     for i in range(len(chromosome_name)):
         chrom = chromosome_name[i:]  # progressively remove prefix
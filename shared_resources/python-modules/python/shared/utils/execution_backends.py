@@ -0,0 +1,125 @@
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import base64
+import gzip
+import json
+import sys
+
+from .lambda_utils import ENV_CONFIG
+
+
+class LambdaBackend:
+    """
+    Runs payloads by invoking a lambda, payloads larger than compress_above
+    bytes are sent gzipped and base64 encoded. A payload is not run, and
+    None returned, when cancelled() is true once an invocation slot is free.
+    """
+
+    remote = True
+
+    def __init__(self, function_name, client, compress_above=None):
+        self.function_name = function_name
+        self.client = client
+        self.compress_above = compress_above
+
+    async def run(self, payload, cancelled=None):
+        payload_str = json.dumps(payload)
+        if self.compress_above is not None and len(payload_str) > self.compress_above:
+            payload_str = json.dumps(
+                base64.b64encode(gzip.compress(payload_str.encode())).decode()
+            )
+        response = await self.client.invoke(
+            cancelled=cancelled,
+            FunctionName=self.function_name,
+            InvocationType="RequestResponse",
+            Payload=payload_str,
+        )
+        if response is None:
+            return None
+        return json.loads(response["Payload"])
+
+    def flush_metrics(self):
+        self.client.flush_metrics()
+
+
+def add_perform_query_path(path):
+    sys.path.insert(0, path)
+
+
+def perform_local_query(payload):
+    # runs in a worker process, performQuery is imported from its sources
+    from query_engine import perform_queries, perform_query
+
+    if "regions" in payload:
+        return perform_queries(payload)
+    return perform_query(payload)
+
+
+class LocalBackend:
+    """
+    Runs performQuery payloads in a process pool of this machine instead
+    of invoking lambdas. A list of payloads is run like splitQuery runs a
+    chunk, with the responses of multi-region payloads flattened.
+    Responses are returned unencoded and never spilled.
+    """
+
+    remote = False
+
+    def __init__(self, processes, perform_query_path):
+        self.processes = processes
+        self.pool = ProcessPoolExecutor(
+            processes,
+            initializer=add_perform_query_path,
+            initargs=(perform_query_path,),
+        )
+        self.loop = None
+        self.slots = None
+
+    async def run_payload(self, payload, cancelled=None):
+        # asyncio primitives belong to a loop, each handler run has its own
+        loop = asyncio.get_running_loop()
+        if loop is not self.loop:
+            self.loop = loop
+            self.slots = asyncio.Semaphore(self.processes)
+        async with self.slots:
+            # payloads queued for a process are dropped if cancelled meanwhile
+            if cancelled is not None and cancelled():
+                return None
+            return await loop.run_in_executor(
+                self.pool, perform_local_query, payload
+            )
+
+    async def run(self, payload, cancelled=None):
+        if not isinstance(payload, list):
+            return await self.run_payload(payload, cancelled)
+
+        results = []
+        for result in await asyncio.gather(
+            *(self.run_payload(item, cancelled) for item in payload)
+        ):
+            if result is not None:
+                results.extend(result if isinstance(result, list) else [result])
+        return results
+
+    def flush_metrics(self):
+        pass
+
+
+local_backend = None
+
+
+def get_backend(function_name, client, compress_above=None):
+    # the backend chosen by configuration, the local pool is shared
+    global local_backend
+
+    if ENV_CONFIG.CONFIG_EXECUTION_BACKEND != "local":
+        return LambdaBackend(function_name, client, compress_above)
+    if local_backend is None:
+        local_backend = LocalBackend(
+            ENV_CONFIG.CONFIG_LOCAL_PROCESSES, ENV_CONFIG.CONFIG_PERFORM_QUERY_PATH
+        )
+    return local_backend
+
+
+if __name__ == "__main__":
+    pass
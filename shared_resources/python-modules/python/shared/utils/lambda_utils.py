@@ -272,6 +272,14 @@ class DynamoDBEnvironment:
     def DYNAMO_ONTO_INDEX_TABLE(self):
         return os.environ["DYNAMO_ONTO_INDEX_TABLE"]
 
+    @property
+    def DYNAMO_INVOCATION_STATS_TABLE(self):
+        return os.environ["DYNAMO_INVOCATION_STATS_TABLE"]
+
+    @property
+    def DYNAMO_SPLIT_RESULTS_TABLE(self):
+        return os.environ["DYNAMO_SPLIT_RESULTS_TABLE"]
+
 
 class SnsEnvironment:
     @property
@@ -290,11 +298,37 @@ class ConfigEnvironment:
     def CONFIG_MAX_VARIANT_SEARCH_BASE_RANGE(self):
         return int(os.environ["CONFIG_MAX_VARIANT_SEARCH_BASE_RANGE"])
 
+    @property
+    def CONFIG_MAX_VARIANT_SEARCH_CONCURRENCY(self):
+        return int(os.environ["CONFIG_MAX_VARIANT_SEARCH_CONCURRENCY"])
+
+    # lambda or local, local runs performQuery in processes of this machine
+    @property
+    def CONFIG_EXECUTION_BACKEND(self):
+        return os.environ.get("CONFIG_EXECUTION_BACKEND", "lambda")
+
+    @property
+    def CONFIG_LOCAL_PROCESSES(self):
+        return int(os.environ.get("CONFIG_LOCAL_PROCESSES", os.cpu_count()))
+
+    # directory of the performQuery sources used by the local backend
+    @property
+    def CONFIG_PERFORM_QUERY_PATH(self):
+        return os.environ.get(
+            "CONFIG_PERFORM_QUERY_PATH",
+            os.path.join(
+                os.path.dirname(__file__), *[".."] * 5, "lambda", "performQuery"
+            ),
+        )
+
 
-def clear_tmp():
+def clear_tmp(keep=()):
+    # keep lists paths under /tmp that survive, eg: caches of warm containers
     try:
         for file_name in os.listdir("/tmp"):
             file_path = "/tmp/" + file_name
+            if file_path in keep:
+                continue
             if os.path.isfile(file_path):
                 os.unlink(file_path)
             elif os.path.isdir(file_path):
@@ -0,0 +1,55 @@
+import json
+import uuid
+
+import boto3
+
+
+# expired by the lifecycle rule of the variants bucket
+SPILL_PREFIX = "variant-queries/responses/"
+# synchronous lambda responses are limited to 6 mb
+MAX_INLINE_RESPONSE_SIZE = 5 * 1024 * 1024
+
+
+s3 = boto3.client("s3")
+
+
+# responses are written as json lines so they can be read one at a time
+# the returned pointer keeps the fields of VariantResponse and the
+# existence of a hit so that boolean queries need not fetch the object
+def spill_responses(responses, bucket):
+    key = f"{SPILL_PREFIX}{uuid.uuid4().hex}.jsonl"
+    body = "\n".join(json.dumps(response) for response in responses).encode()
+    s3.put_object(Bucket=bucket, Key=key, Body=body)
+    dataset_ids = {response.get("dataset_id") for response in responses}
+    print(f"Spilled {len(responses)} responses to s3://{bucket}/{key}")
+
+    return {
+        "dataset_id": dataset_ids.pop() if len(dataset_ids) == 1 else None,
+        "exists": any(response.get("exists", False) for response in responses),
+        "checkS3": True,
+        "responseLocation": {"bucket": bucket, "key": key},
+        "size": len(body),
+    }
+
+
+def is_spilled(response):
+    return isinstance(response, dict) and response.get("checkS3", False)
+
+
+def read_spilled(pointer):
+    # streams the responses of a pointer, nested pointers are followed
+    location = pointer["responseLocation"]
+    body = s3.get_object(Bucket=location["bucket"], Key=location["key"])["Body"]
+
+    for line in body.iter_lines():
+        if not line:
+            continue
+        response = json.loads(line)
+        if is_spilled(response):
+            yield from read_spilled(response)
+        else:
+            yield response
+
+
+if __name__ == "__main__":
+    pass
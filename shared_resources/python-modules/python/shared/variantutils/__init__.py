@@ -1 +1,4 @@
 from .search_variants import perform_variant_search
+from .count_tiles import count_from_tiles
+from .result_cache import cached_route
+from .dataset_catalog import get_catalog_datasets
@@ -0,0 +1,120 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+import time
+
+import boto3
+import botocore
+
+from shared.dynamodb import get_datasets_generation
+from shared.vcfutils import (
+    BloomFilter,
+    SourceError,
+    allele_hash,
+    filter_key,
+    open_source,
+)
+
+
+# filters are written by summariseVcf, lambdas without the bucket search every vcf
+VARIANTS_BUCKET = os.environ.get("VARIANTS_BUCKET")
+# wider ranges are searched in every vcf
+MAX_PROBED_POSITIONS = 1000
+THREADS = 32
+# how long a warm container trusts the etag of a vcf
+ETAG_SECONDS = 60
+s3 = boto3.client("s3")
+# vcf -> (filter or None, datasets generation it was loaded in)
+filters = dict()
+# vcf -> (etag or None, time checked)
+etags = dict()
+
+
+def load_filter(vcf_location, generation):
+    try:
+        response = s3.get_object(Bucket=VARIANTS_BUCKET, Key=filter_key(vcf_location))
+        bloom = BloomFilter.from_bytes(response["Body"].read())
+    except (
+        botocore.exceptions.ClientError,
+        botocore.exceptions.BotoCoreError,
+        ValueError,
+    ) as e:
+        print(f"Allele filter not available for {vcf_location}: {e}")
+        bloom = None
+    filters[vcf_location] = (bloom, generation)
+
+
+def check_etag(vcf_location):
+    try:
+        etag = open_source(vcf_location).etag()
+    except SourceError as e:
+        print(f"Allele filter not checked for {vcf_location}: {e}")
+        etag = None
+    etags[vcf_location] = (etag, time.time())
+
+
+def get_filters(vcf_locations, generation):
+    # filters of warm containers are kept until a vcf is submitted again
+    missing = [
+        vcf
+        for vcf in set(vcf_locations)
+        if filters.get(vcf, (None, None))[1] != generation
+    ]
+    unchecked = [
+        vcf
+        for vcf in set(vcf_locations)
+        if time.time() - etags.get(vcf, (None, 0))[1] > ETAG_SECONDS
+    ]
+    if missing or unchecked:
+        with ThreadPoolExecutor(THREADS) as executor:
+            list(executor.map(lambda vcf: load_filter(vcf, generation), missing))
+            list(executor.map(check_etag, unchecked))
+
+    # a filter of a replaced vcf, not yet summarised again, is not used
+    return {
+        vcf: (
+            filters[vcf][0]
+            if filters[vcf][0] is not None
+            and filters[vcf][0].etag == etags[vcf][0]
+            else None
+        )
+        for vcf in vcf_locations
+    }
+
+
+def prune_vcfs(vcf_chromosomes, reference_bases, alternate_bases, start_min, start_max):
+    """
+    Removes the chromosome of every vcf whose allele filter rules out the
+    queried alleles at all positions from start_min to start_max, so the
+    vcf is not searched. Only queries with both alleles given are pruned.
+    """
+    if not VARIANTS_BUCKET or "N" in (reference_bases or "N", alternate_bases or "N"):
+        return vcf_chromosomes
+    if start_max - start_min + 1 > MAX_PROBED_POSITIONS:
+        return vcf_chromosomes
+    try:
+        generation = get_datasets_generation()
+    except Exception as e:
+        print("Allele filters unavailable", e)
+        return vcf_chromosomes
+
+    candidates = [vcf for vcf, chrom in vcf_chromosomes.items() if chrom]
+    vcf_filters = get_filters(candidates, generation)
+    pruned = dict(vcf_chromosomes)
+    for vcf in candidates:
+        bloom = vcf_filters[vcf]
+        if bloom is not None and not any(
+            allele_hash(vcf_chromosomes[vcf], pos, reference_bases, alternate_bases)
+            in bloom
+            for pos in range(start_min, start_max + 1)
+        ):
+            pruned[vcf] = None
+    print(
+        f"Allele filters ruled out {sum(1 for vcf in candidates if not pruned[vcf])}"
+        f" of {len(candidates)} vcfs"
+    )
+
+    return pruned
+
+
+if __name__ == "__main__":
+    pass
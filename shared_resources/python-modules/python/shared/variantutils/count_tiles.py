@@ -0,0 +1,161 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+from shared.utils import match_vcf_chromosome
+from shared.vcfutils import SourceError, TileReader, open_source, tiles_key
+from .search_variants import perform_variant_search, search_range
+
+
+# tiles are written by summariseVcf, lambdas without the bucket scan instead
+VARIANTS_BUCKET = os.environ.get("VARIANTS_BUCKET")
+THREADS = 32
+# more ranges to scan are left to a single search of the whole range
+MAX_SCANNED_RANGES = 8
+
+
+def open_tiles(vcf_location, chrom):
+    # None without up to date tiles, the query is then scanned
+    key = tiles_key(vcf_location, chrom)
+    try:
+        tiles = TileReader.open(open_source(f"s3://{VARIANTS_BUCKET}/{key}"))
+        # the vcf may have been replaced since it was summarised
+        if tiles.etag != open_source(vcf_location).etag():
+            print(f"Tiles of {vcf_location} {chrom} are out of date")
+            return None
+        return tiles
+    except (SourceError, ValueError) as e:
+        print(f"Tiles not available for {vcf_location} {chrom}: {e}")
+        return None
+
+
+def tile_sites(tiles, first, last):
+    # distinct variants of each tile from first to last
+    sites = [sites for sites, _, _ in tiles.read(first, last)]
+    return sites + [0] * (last - first + 1 - len(sites))
+
+
+def scanned_ranges(start_min, start_max, first, last, shared, size):
+    # 1-based ranges of the partial tiles at the edges and of the tiles
+    # holding variants of more than one vcf, adjacent ranges merged
+    ranges = []
+    for range_start, range_end in (
+        (start_min, first * size),
+        *((tile * size + 1, (tile + 1) * size) for tile in shared),
+        ((last + 1) * size + 1, start_max),
+    ):
+        if range_start > range_end:
+            continue
+        if ranges and ranges[-1][1] + 1 == range_start:
+            ranges[-1] = (ranges[-1][0], range_end)
+        else:
+            ranges.append((range_start, range_end))
+    return ranges
+
+
+def count_from_tiles(
+    *,
+    datasets,
+    reference_name,
+    reference_bases,
+    alternate_bases,
+    start,
+    end,
+    variant_type=None,
+    variant_min_length=0,
+    variant_max_length=-1,
+    dataset_samples=[],
+):
+    """
+    Number of distinct variants of a count query, summed from the count
+    tiles covered by the query range. A tile with variants in more than one
+    vcf may hold the same variant twice, it is scanned with the partial
+    tiles at the edges of the range. Returns None when the tiles cannot
+    answer the query, the query filters alleles or samples, or too many
+    ranges would be scanned.
+    """
+    if not VARIANTS_BUCKET or dataset_samples:
+        return None
+    if (reference_bases or "N") != "N" or (alternate_bases or "N") != "N":
+        return None
+    if variant_type is not None or variant_min_length > 0 or variant_max_length >= 0:
+        return None
+
+    vcf_chromosomes = {
+        vcfm["vcf"]: match_vcf_chromosome(vcfm, reference_name)
+        for dataset in datasets
+        for vcfm in dataset._vcfChromosomeMap
+    }
+    searched = [
+        dataset
+        for dataset in datasets
+        if any(vcf_chromosomes.get(vcf) for vcf in dataset._vcfLocations)
+    ]
+    # a vcf of several datasets is counted once
+    vcf_locations = sorted(
+        {
+            vcf
+            for dataset in searched
+            for vcf in dataset._vcfLocations
+            if vcf_chromosomes.get(vcf)
+        }
+    )
+    if not vcf_locations:
+        return None
+
+    with ThreadPoolExecutor(min(THREADS, len(vcf_locations))) as executor:
+        vcf_tiles = list(
+            executor.map(
+                lambda vcf: open_tiles(vcf, vcf_chromosomes[vcf]), vcf_locations
+            )
+        )
+    if any(tiles is None for tiles in vcf_tiles):
+        return None
+    if len({tiles.tile_size for tiles in vcf_tiles}) != 1:
+        return None
+    start_min, start_max, _, _ = search_range(start, end)
+    start_min += 1
+    start_max += 1
+    size = vcf_tiles[0].tile_size
+    # tiles entirely within the range
+    first = -(-(start_min - 1) // size)
+    last = start_max // size - 1
+    if first > last:
+        return None
+
+    with ThreadPoolExecutor(min(THREADS, len(vcf_tiles))) as executor:
+        sites = list(
+            executor.map(lambda tiles: tile_sites(tiles, first, last), vcf_tiles)
+        )
+    count = 0
+    shared = []
+    for tile, tile_counts in enumerate(zip(*sites), start=first):
+        if sum(1 for tile_count in tile_counts if tile_count) > 1:
+            shared.append(tile)
+        else:
+            count += sum(tile_counts)
+    ranges = scanned_ranges(start_min, start_max, first, last, shared, size)
+    if len(ranges) > MAX_SCANNED_RANGES:
+        return None
+
+    variants = set()
+    for range_start, range_end in ranges:
+        for response in perform_variant_search(
+            datasets=searched,
+            reference_name=reference_name,
+            reference_bases="N",
+            alternate_bases="N",
+            start=[range_start - 1, range_end - 1],
+            end=[range_end - 1],
+            requested_granularity="count",
+        ):
+            variants.update(response.variants)
+    print(
+        f"Counted tiles {first} to {last} of {len(vcf_locations)} vcfs,"
+        f" {len(shared)} tiles shared by several vcfs scanned"
+    )
+
+    return count + len(variants)
+
+
+if __name__ == "__main__":
+    pass
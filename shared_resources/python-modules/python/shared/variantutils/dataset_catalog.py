@@ -0,0 +1,50 @@
+from shared.athena import Dataset
+from shared.dynamodb import Dataset as DynamoDataset, get_datasets_generation
+from shared.utils import get_chromosome_lookup
+
+
+# assembly -> (datasets, datasets generation they were loaded in)
+catalogs = dict()
+
+
+def load_datasets(assembly_id):
+    datasets = []
+    for item in DynamoDataset.datasetIndex.query(assembly_id):
+        vcf_chromosome_maps = []
+        for vcfm in item.vcfChromosomeMap:
+            vcfm = vcfm.as_dict()
+            vcfm["chromosomes"] = sorted(vcfm.get("chromosomes") or [])
+            vcfm["chromosomeLookup"] = get_chromosome_lookup(vcfm["chromosomes"])
+            vcf_chromosome_maps.append(vcfm)
+        datasets.append(
+            Dataset(
+                id=item.id,
+                assemblyId=assembly_id,
+                vcfLocations=sorted(item.vcfLocations or []),
+                vcfChromosomeMap=vcf_chromosome_maps,
+            )
+        )
+    print(f"Loaded {len(datasets)} datasets of {assembly_id} from the catalog")
+
+    return sorted(datasets, key=lambda dataset: dataset.id)
+
+
+def get_catalog_datasets(assembly_id, dataset_id=None):
+    """
+    Returns the datasets of an assembly with their vcfs and chromosome maps,
+    as the datasets table in Athena has them. Warm containers keep them until
+    a dataset or vcf is submitted again.
+    """
+    generation = get_datasets_generation()
+    datasets, loaded_generation = catalogs.get(assembly_id, (None, None))
+    if loaded_generation != generation:
+        datasets = load_datasets(assembly_id)
+        catalogs[assembly_id] = (datasets, generation)
+
+    if dataset_id is not None:
+        return [dataset for dataset in datasets if dataset.id == dataset_id]
+    return datasets
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,78 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+from shared.vcfutils import (
+    KeyIndexReader,
+    SourceError,
+    allele_hash,
+    key_index_key,
+    open_source,
+)
+
+
+# key indexes are written by summariseVcf, lambdas without the bucket plan splits
+VARIANTS_BUCKET = os.environ.get("VARIANTS_BUCKET")
+THREADS = 32
+
+
+def lookup_record(vcf_location, chrom, pos, reference_bases, alternate_bases):
+    # virtual offsets of the allele, None without an up to date key index
+    key = key_index_key(vcf_location)
+    try:
+        key_index = KeyIndexReader.open(open_source(f"s3://{VARIANTS_BUCKET}/{key}"))
+        # the vcf may have been replaced since it was summarised
+        if key_index.etag != open_source(vcf_location).etag():
+            print(f"Key index of {vcf_location} is out of date")
+            return None
+        value = allele_hash(chrom, pos, reference_bases, alternate_bases)
+        return key_index.lookup(value)
+    except (SourceError, ValueError) as e:
+        print(f"Key index not available for {vcf_location}: {e}")
+        return None
+
+
+def find_records(
+    vcf_chromosomes, reference_bases, alternate_bases, start_min, start_max
+):
+    """
+    Looks up an exactly given allele at a single position in the key index
+    of each vcf. Returns the vcf chromosomes without the vcfs that have no
+    record of the allele, and the virtual offset of the first record for
+    every vcf that has one. Vcfs without a key index are left to be searched.
+    """
+    if not VARIANTS_BUCKET or "N" in (reference_bases or "N", alternate_bases or "N"):
+        return vcf_chromosomes, {}
+    candidates = [vcf for vcf, chrom in vcf_chromosomes.items() if chrom]
+    if start_min != start_max or not candidates:
+        return vcf_chromosomes, {}
+
+    with ThreadPoolExecutor(min(THREADS, len(candidates))) as executor:
+        lookups = list(
+            executor.map(
+                lambda vcf: lookup_record(
+                    vcf,
+                    vcf_chromosomes[vcf],
+                    start_min,
+                    reference_bases,
+                    alternate_bases,
+                ),
+                candidates,
+            )
+        )
+
+    found = dict(vcf_chromosomes)
+    record_offsets = dict()
+    for vcf, voffsets in zip(candidates, lookups):
+        if voffsets is None:
+            continue
+        if voffsets:
+            record_offsets[vcf] = voffsets[0]
+        else:
+            found[vcf] = None
+    print(f"Key indexes located {len(record_offsets)} of {len(candidates)} vcfs")
+
+    return found, record_offsets
+
+
+if __name__ == "__main__":
+    pass
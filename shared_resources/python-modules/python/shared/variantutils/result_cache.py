@@ -0,0 +1,49 @@
+import json
+
+from shared.apiutils.request_hash import hash_query
+from shared.dynamodb import (
+    JobStatus,
+    complete_job,
+    get_datasets_generation,
+    get_job_result,
+    get_job_status,
+    start_job,
+)
+
+
+def get_cache_id(event):
+    # results change whenever datasets are submitted or re-indexed
+    return f"{hash_query(event)}-{get_datasets_generation()}"
+
+
+# serves a variant route from the query cache or runs it and caches the response
+def cached_route(event, route, *args):
+    try:
+        cache_id = get_cache_id(event)
+        status = get_job_status(cache_id)
+    except Exception as e:
+        print("Query cache unavailable", e)
+        return route(*args)
+
+    if status == JobStatus.COMPLETED:
+        if (result := get_job_result(cache_id)) is not None:
+            print(f"Returning cached response {cache_id}")
+            return json.loads(result)
+    # identical queries running at the same time are not awaited
+    elif status == JobStatus.NEW:
+        start_job(cache_id)
+
+    response = route(*args)
+
+    if response.get("statusCode") == 200:
+        try:
+            if not complete_job(cache_id, json.dumps(response)):
+                print(f"Response too large to cache {cache_id}")
+        except Exception as e:
+            print("Unable to cache response", e)
+
+    return response
+
+
+if __name__ == "__main__":
+    pass
@@ -1,78 +1,265 @@
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import deque
 from typing import Generator, List
+import asyncio
 import os
 import json
 import math
-import gzip
-import base64
+import time
+import uuid
 
 import boto3
 import jsons
 
-from shared.utils import get_matching_chromosome
-from shared.payloads import PerformQueryResponse
-from shared.utils import LambdaClient
+from shared.dynamodb import (
+    PERFORM_QUERY_LATENCY,
+    SPLIT_QUERY_OVERHEAD,
+    cancel_query,
+    flush_latencies,
+    get_latency,
+    record_latency,
+)
+from shared.utils import match_vcf_chromosome
+from shared.payloads import PerformQueryResponse, decode_response, is_encoded
+from shared.vcfutils import covers
+from shared.utils import (
+    ENV_CONFIG,
+    MAX_INLINE_RESPONSE_SIZE,
+    AsyncLambdaClient,
+    get_backend,
+    is_spilled,
+    read_spilled,
+)
+from .allele_filters import prune_vcfs
+from .record_lookup import find_records
+from .split_planner import get_profiles, group_splits, plan_splits
 
 
 SPLIT_QUERY_LAMBDA = os.environ["SPLIT_QUERY_LAMBDA"]
-SPLIT_SIZE = 20000
+# splitQuery invocations in flight
 THREADS = 200
+# threads used by splitQuery to run the payloads of a chunk
+SPLIT_QUERY_THREADS = 50
+# estimates used until latencies are measured (old fixed 0.05 coefficients)
+DEFAULT_PAYLOAD_LATENCY = 0.05 * SPLIT_QUERY_THREADS
+DEFAULT_CHUNK_OVERHEAD = 0.05 * THREADS
+RESERVED_CONCURRENCY_CACHE_SECONDS = 300
+# rough sizes of the parts of a performQuery response in bytes
+RESPONSE_BYTES = 256
+VARIANT_BYTES = 64
+SAMPLE_NAME_BYTES = 24
 
 
 s3 = boto3.client("s3")
-aws_lambda = LambdaClient()
+aws_lambda = AsyncLambdaClient(THREADS)
+# chunks are run by splitQuery, or locally when configured
+backend = get_backend(SPLIT_QUERY_LAMBDA, aws_lambda, compress_above=100 * 1024)
+# (reserved concurrency of splitQuery or None, time read)
+reserved_concurrency = (None, 0)
 
 
-def fan_out(payload: List[dict]):
-    # stringified payload
-    payload_str = json.dumps(payload)
-
-    # compress if larger than 100 kb
-    if len(payload_str) > 100 * 1024:
-        payload_str = json.dumps(
-            base64.b64encode(gzip.compress(payload_str.encode())).decode()
+async def fan_out(payload: List[dict]):
+    start_time = time.time()
+    parsed = await backend.run(payload)
+    if backend.remote:
+        # invoke overhead and cold starts, performQuery time is measured by splitQuery
+        waves = math.ceil(len(payload) / SPLIT_QUERY_THREADS)
+        payload_latency = get_latency(PERFORM_QUERY_LATENCY, DEFAULT_PAYLOAD_LATENCY)
+        record_latency(
+            SPLIT_QUERY_OVERHEAD,
+            max(0, time.time() - start_time - waves * payload_latency),
         )
-
-    response = aws_lambda.invoke(
-        FunctionName=SPLIT_QUERY_LAMBDA,
-        InvocationType="RequestResponse",
-        Payload=payload_str,
-    )
-    parsed = None
     try:
-        parsed = json.loads(response["Payload"].read())
-        parsed = jsons.default_list_deserializer(parsed, List[PerformQueryResponse])
+        # pointers to spilled responses are read when the results are consumed
+        if is_spilled(parsed):
+            return [parsed]
+        parsed = [
+            result if is_spilled(result) else load_result(result) for result in parsed
+        ]
     except Exception as e:
         print(parsed, e)
         raise e
     return parsed
 
 
-def f_cost(N, P):
-    return 0.05 * N / P + 0.05 * P
+def load_result(result) -> PerformQueryResponse:
+    # compact responses are decoded without parsing the variants
+    if is_encoded(result):
+        return decode_response(result)
+    return jsons.load(result, PerformQueryResponse)
+
+
+def result_exists(result):
+    if is_spilled(result):
+        return result["exists"]
+    return result.exists
+
+
+def stream_results(results) -> Generator[PerformQueryResponse, None, None]:
+    for result in results:
+        if is_spilled(result):
+            for spilled in read_spilled(result):
+                yield load_result(spilled)
+        else:
+            yield result
+
+
+def estimate_response_size(
+    profile, chrom, start, end, samples, include_details, include_samples, granularity
+):
+    # scans without details stop at the first hit
+    if profile is None or not include_details or granularity == "boolean":
+        return RESPONSE_BYTES
+    size = RESPONSE_BYTES + VARIANT_BYTES * profile.records(chrom, start, end)
+    if include_samples and granularity == "record":
+        size += SAMPLE_NAME_BYTES * (len(samples) or profile.sample_count)
+    return size
+
+
+def chunk_payloads(payloads, sizes, chunk_size):
+    # chunks are closed early when their responses would not fit inline
+    chunks = []
+    chunk = []
+    chunk_bytes = 0
+    for payload, size in zip(payloads, sizes):
+        if chunk and (
+            len(chunk) >= chunk_size or chunk_bytes + size > MAX_INLINE_RESPONSE_SIZE
+        ):
+            chunks.append(chunk)
+            chunk = []
+            chunk_bytes = 0
+        chunk.append(payload)
+        chunk_bytes += size
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+# N payloads in P chunks
+# each chunk runs its payloads SPLIT_QUERY_THREADS at a time
+# and the chunk overheads are amortised over THREADS concurrent fan outs
+def f_cost(N, P, payload_cost, chunk_cost):
+    return payload_cost * N / P + chunk_cost * P
+
 
+def df_cost(N, P, payload_cost, chunk_cost):
+    return -payload_cost * N / (P**2) + chunk_cost
 
-def df_cost(N, P):
-    return -0.05 * N / (P**2) + 0.05
+
+def get_reserved_concurrency():
+    global reserved_concurrency
+
+    concurrency, read_time = reserved_concurrency
+    if time.time() - read_time > RESERVED_CONCURRENCY_CACHE_SECONDS:
+        try:
+            response = aws_lambda.client.get_function_concurrency(
+                FunctionName=SPLIT_QUERY_LAMBDA
+            )
+            concurrency = response.get("ReservedConcurrentExecutions")
+        except Exception as e:
+            print("Unable to read reserved concurrency", e)
+        reserved_concurrency = (concurrency, time.time())
+
+    return concurrency
+
+
+# This must be smaller than total available concurrency
+# otherwise the pipeline will hang without enough lambdas to continue
+def max_parallelism():
+    ceiling = ENV_CONFIG.CONFIG_MAX_VARIANT_SEARCH_CONCURRENCY
+    if (reserved := get_reserved_concurrency()) is not None:
+        ceiling = min(ceiling, reserved)
+
+    return max(1, ceiling)
 
 
 # adding scipy will be a huge overhead on lambda layers
 # this finds P such that cost is nil
 # compared to newton method, this seems a faster alternative
 def best_parallelism(N):
+    payload_cost = (
+        get_latency(PERFORM_QUERY_LATENCY, DEFAULT_PAYLOAD_LATENCY)
+        / SPLIT_QUERY_THREADS
+    )
+    chunk_cost = get_latency(SPLIT_QUERY_OVERHEAD, DEFAULT_CHUNK_OVERHEAD) / THREADS
     chosen = 1
     best_cost = float("inf")
-    # This range must be smaller than total available concurrency
-    # otherwise the pipeline will hang without enough lambdas to continue
-    # TODO make 800 an env variable
-    for P in range(1, 800):
-        if (cost := f_cost(N, P)) < best_cost:
+    # more chunks than payloads only adds invocations
+    for P in range(1, min(N, max_parallelism()) + 1):
+        if (cost := f_cost(N, P, payload_cost, chunk_cost)) < best_cost:
             best_cost = cost
             chosen = P
 
     return chosen
 
 
+def dispatch(loop, queue, tasks, window):
+    # chunks are started in their order, at most window of them at a time
+    while queue and len(tasks) < window:
+        chunk_start, chunk = queue.popleft()
+        tasks[loop.create_task(fan_out(chunk))] = chunk_start
+
+
+def completed(loop, queue, tasks, window):
+    # runs the loop until the next task finishes, yielding tasks in
+    # completion order; the loop is idle while the consumer works and
+    # no chunk is started once the consumer stops reading
+    dispatch(loop, queue, tasks, window)
+    while tasks:
+        done, _ = loop.run_until_complete(
+            asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        )
+        for task in done:
+            del tasks[task]
+            yield task
+        dispatch(loop, queue, tasks, window)
+
+
+def payload_start(payload):
+    # first position scanned by a payload
+    region = payload["region"] if "region" in payload else payload["regions"][0]
+    return int(region.rsplit(":", 1)[1].split("-")[0])
+
+
+def variant_key(variant):
+    # chromosome names differ across vcfs, positions identify the variant
+    _, pos, ref, alt, _ = variant.split("\t")
+    return int(pos), ref, alt
+
+
+def confirmed_variants(keys, frontier):
+    # variants before the first unfinished split cannot be preceded by others
+    return sum(1 for pos, _, _ in keys if pos < frontier)
+
+
+def cancel_search(loop, tasks, query_id):
+    print(f"Cancelling query {query_id}")
+    # queued chunks are never started, running lambdas poll the flag
+    for task in tasks:
+        task.cancel()
+    if tasks:
+        loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+    cancel_query(query_id)
+
+
+def search_range(start, end):
+    # 0-based bounds of the start and end of the variants of a query
+    if len(start) == 2:
+        start_min, start_max = start
+    else:
+        start_min = start[0]
+
+    if len(end) == 2:
+        end_min, end_max = end
+    else:
+        end_min = start_min
+        end_max = end[0]
+
+    if len(start) != 2:
+        start_max = end_max
+
+    return start_min, start_max, end_min, end_max
+
+
 def perform_variant_search(
     *,
     datasets,
@@ -86,31 +273,34 @@ def perform_variant_search(
     variant_max_length=-1,
     requested_granularity="boolean",
     include_datasets="ALL",
-    query_id="TEST",
+    query_id=None,
     dataset_samples=[],
     include_samples=False,
+    page_size=None,
 ) -> Generator[PerformQueryResponse, None, None]:
+    """
+    Yields the responses of every split of the query. With a page_size,
+    splits are run in genomic order and the search stops once the first
+    page_size distinct variants by position are known.
+    """
+    # lambdas of a query share its cancellation flag, so ids must be unique
+    query_id = query_id or uuid.uuid4().hex
+
     try:
         # get vcf file and the name of chromosome in it eg: "chr1", "Chr4", "CHR1" or just "1"
         vcf_chromosomes = {
-            vcfm["vcf"]: get_matching_chromosome(vcfm["chromosomes"], reference_name)
+            vcfm["vcf"]: match_vcf_chromosome(vcfm, reference_name)
+            for dataset in datasets
+            for vcfm in dataset._vcfChromosomeMap
+        }
+        # extents and occupied bins of each chromosome, recorded at submission
+        coverages = {
+            vcfm["vcf"]: vcfm.get("coverage") or {}
             for dataset in datasets
             for vcfm in dataset._vcfChromosomeMap
         }
 
-        if len(start) == 2:
-            start_min, start_max = start
-        else:
-            start_min = start[0]
-
-        if len(end) == 2:
-            end_min, end_max = end
-        else:
-            end_min = start_min
-            end_max = end[0]
-
-        if len(start) != 2:
-            start_max = end_max
+        start_min, start_max, end_min, end_max = search_range(start, end)
     except Exception as e:
         print("Error occured ", e)
         return False, []
@@ -119,7 +309,33 @@ def perform_variant_search(
     start_max += 1
     end_min += 1
     end_max += 1
+    # vcfs without records in the range are not searched
+    vcf_chromosomes = {
+        vcf: (
+            chrom
+            if chrom and covers(coverages[vcf].get(chrom), start_min, start_max)
+            else None
+        )
+        for vcf, chrom in vcf_chromosomes.items()
+    }
+    # vcfs that cannot have an exactly given allele are not searched
+    vcf_chromosomes = prune_vcfs(
+        vcf_chromosomes, reference_bases, alternate_bases, start_min, start_max
+    )
+    # the records of an allele at one position are read at their offsets
+    vcf_chromosomes, record_offsets = find_records(
+        vcf_chromosomes, reference_bases, alternate_bases, start_min, start_max
+    )
     payloads = []
+    sizes = []
+    # index based work estimates of every vcf, cached across invocations
+    profiles = get_profiles(
+        [
+            vcf
+            for vcf, chrom in vcf_chromosomes.items()
+            if chrom and vcf not in record_offsets
+        ]
+    )
 
     # parallelism across datasets
     for n, dataset in enumerate(datasets):
@@ -129,12 +345,24 @@ def perform_variant_search(
             if vcf_chromosomes[vcf]
         }
 
-        split_start = start_min
-
-        while split_start <= start_max:
-            # TODO improve SPLIT_SIZE - make dynamic
-            split_end = min(split_start + SPLIT_SIZE - 1, start_max)
-            for vcf_location, chrom in vcf_locations.items():
+        for vcf_location, chrom in vcf_locations.items():
+            profile = profiles.get(vcf_location)
+            chrom_coverage = coverages[vcf_location].get(chrom)
+            if vcf_location in record_offsets:
+                groups = [[(start_min, start_max)]]
+            else:
+                # splits follow the record density of each vcf
+                splits = [
+                    (split_start, split_end)
+                    for split_start, split_end in plan_splits(
+                        profile, chrom, start_min, start_max
+                    )
+                    # splits holding no records are dropped
+                    if covers(chrom_coverage, split_start, split_end)
+                ]
+                # adjacent splits of little work are scanned by one performQuery
+                groups = group_splits(profile, chrom, splits)
+            for group in groups:
                 payload = {
                     "query_id": query_id,
                     "dataset_id": dataset.id,
@@ -148,30 +376,101 @@ def perform_variant_search(
                     "variant_max_length": variant_max_length,
                     "include_details": include_datasets in ("HIT", "ALL"),
                     "include_samples": include_samples,
-                    "region": f"{chrom}:{split_start}-{split_end}",
                     "variant_type": variant_type,
                     "requested_granularity": requested_granularity,
                 }
+                if vcf_location in record_offsets:
+                    payload["voffset"] = record_offsets[vcf_location]
+                regions = [f"{chrom}:{s}-{e}" for s, e in group]
+                if len(regions) == 1:
+                    payload["region"] = regions[0]
+                else:
+                    payload["regions"] = regions
                 payloads.append(payload)
-            # next split
-            split_start += SPLIT_SIZE
+                sizes.append(
+                    sum(
+                        estimate_response_size(
+                            profile,
+                            chrom,
+                            split_start,
+                            split_end,
+                            payload["samples"],
+                            payload["include_details"],
+                            include_samples,
+                            requested_granularity,
+                        )
+                        for split_start, split_end in group
+                    )
+                )
 
     print("Start: event publishing")
-    # TODO further split by sample counts to avoid payload overflow
-    chunk_size = best_parallelism(len(payloads))
+    if page_size is not None:
+        # earlier positions are scanned first and chunks hold adjacent splits
+        order = sorted(
+            range(len(payloads)), key=lambda n: payload_start(payloads[n])
+        )
+        payloads = [payloads[n] for n in order]
+        sizes = [sizes[n] for n in order]
+    if backend.remote:
+        chunk_size = max(
+            1, math.ceil(len(payloads) / best_parallelism(len(payloads)))
+        )
+    else:
+        # the process pool bounds the parallelism of local payloads
+        chunk_size = 1
+    chunks = chunk_payloads(payloads, sizes, chunk_size)
     print(
-        f"PAYLOADS - {len(payloads)} CHUNK SIZE - {chunk_size} NO CHUNKS - {math.ceil(len(payloads)/chunk_size)}"
+        f"PAYLOADS - {len(payloads)} CHUNK SIZE - {chunk_size} NO CHUNKS - {len(chunks)}"
     )
-    executor = ThreadPoolExecutor(THREADS)
-    futures = [
-        executor.submit(fan_out, payloads[itr : itr + chunk_size])
-        for itr in range(0, len(payloads), chunk_size)
-    ]
+    loop = asyncio.new_event_loop()
+    queue = deque((min(map(payload_start, chunk)), chunk) for chunk in chunks)
+    # running task -> first position of its chunk
+    tasks = dict()
+    window = THREADS if backend.remote else backend.processes
+    variant_keys = set()
+
+    # nothing is left to cancel once the search is complete or cancelled
+    settled = False
 
-    for future in as_completed(futures):
-        yield from future.result()
+    try:
+        for task in completed(loop, queue, tasks, window):
+            results = task.result()
+            # a boolean answer is known, the remaining work is not needed
+            if requested_granularity == "boolean" and any(
+                result_exists(result) for result in results
+            ):
+                cancel_search(loop, tasks, query_id)
+                settled = True
+                yield from stream_results(results)
+                break
+            if page_size is not None:
+                # responses are read to count their variants
+                results = list(stream_results(results))
+                variant_keys.update(
+                    variant_key(variant)
+                    for result in results
+                    for variant in result.variants
+                )
+                frontier = min(
+                    [*tasks.values(), *(chunk_start for chunk_start, _ in queue)],
+                    default=math.inf,
+                )
+                confirmed = confirmed_variants(variant_keys, frontier)
+                if frontier < math.inf and confirmed >= page_size:
+                    cancel_search(loop, tasks, query_id)
+                    settled = True
+                    yield from results
+                    break
+            yield from stream_results(results)
+        settled = True
+    finally:
+        # the consumer stopped reading before the search finished
+        if not settled:
+            cancel_search(loop, tasks, query_id)
+        loop.close()
+        flush_latencies()
+        backend.flush_metrics()
 
-    # No need to executor.shutdown() the executor at this point, it'd be an unwatned code line
     print("End: retrieved results")
 
 
@@ -0,0 +1,183 @@
+from concurrent.futures import ThreadPoolExecutor
+import math
+import time
+
+from shared.vcfutils import VcfReader
+
+
+# fixed split size used when the index of a vcf cannot be read
+SPLIT_SIZE = 20000
+# work units of a single split, roughly 200 records of a 2500 sample vcf
+TARGET_SPLIT_WORK = 5000
+# cost of parsing one genotype relative to the fixed cost of a record
+GENOTYPE_WEIGHT = 0.01
+# empty windows still cost something so they end up in large splits
+MIN_WINDOW_WORK = 1
+MIN_SPLIT_BASES = 1000
+MAX_SPLITS_PER_VCF = 200
+PROFILE_TTL_SECONDS = 3600
+# adjacent splits scanned by a single performQuery
+MAX_REGIONS_PER_TASK = 16
+# fixed splits grouped into a task when the density of a vcf is unknown
+FIXED_REGIONS_PER_TASK = 4
+THREADS = 32
+
+
+class DensityProfile:
+    """
+    Estimated query work along each chromosome of a vcf.
+    Built from the index: bytes per window give the distribution of records,
+    the number of records and samples give the cost of each of them.
+    """
+
+    def __init__(self, window_shift, chromosomes, record_cost=1, sample_count=0):
+        self.window_shift = window_shift
+        self.window_size = 1 << window_shift
+        # chrom -> prefix sums of work per window
+        self.chromosomes = chromosomes
+        self.record_cost = record_cost
+        self.sample_count = sample_count
+
+    @classmethod
+    def from_vcf(cls, vcf_location):
+        reader = VcfReader(vcf_location)
+        index = reader.index
+        sample_count = len(reader.samples())
+        record_cost = 1 + GENOTYPE_WEIGHT * sample_count
+        chromosomes = dict()
+
+        for chrom in index.names:
+            weights = index.window_weights(chrom)
+            total_weight = sum(weights)
+            records = index.mapped_records(chrom)
+            prefix = [0]
+            for weight in weights:
+                share = weight / total_weight if total_weight else 0
+                work = max(MIN_WINDOW_WORK, share * records * record_cost)
+                prefix.append(prefix[-1] + work)
+            chromosomes[chrom] = prefix
+
+        return cls(index.min_shift, chromosomes, record_cost, sample_count)
+
+    def work_before(self, chrom, pos):
+        # work of the 1-based positions before pos
+        prefix = self.chromosomes.get(chrom, [0])
+        offset = pos - 1
+        window = offset >> self.window_shift
+        # no records are indexed past the last window
+        if window >= len(prefix) - 1:
+            return prefix[-1]
+        window_work = prefix[window + 1] - prefix[window]
+        within = (offset & (self.window_size - 1)) / self.window_size
+        return prefix[window] + window_work * within
+
+    def work(self, chrom, start, end):
+        return self.work_before(chrom, end + 1) - self.work_before(chrom, start)
+
+    def records(self, chrom, start, end):
+        # estimated number of records in [start, end]
+        return self.work(chrom, start, end) / self.record_cost
+
+    def plan(self, chrom, start, end):
+        # splits of [start, end] with roughly equal work
+        total = self.work(chrom, start, end)
+        count = min(
+            math.ceil(total / TARGET_SPLIT_WORK),
+            math.ceil((end - start + 1) / MIN_SPLIT_BASES),
+            MAX_SPLITS_PER_VCF,
+        )
+        count = max(1, count)
+        base = self.work_before(chrom, start)
+        splits = []
+        split_start = start
+
+        for n in range(1, count):
+            target = base + total * n / count
+            # smallest position whose preceding work reaches the target
+            lo, hi = split_start, end
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self.work_before(chrom, mid + 1) < target:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            if lo >= end:
+                break
+            splits.append((split_start, lo))
+            split_start = lo + 1
+        splits.append((split_start, end))
+
+        return splits
+
+
+# vcf location -> (profile or None, time loaded)
+profiles = dict()
+
+
+def load_profile(vcf_location):
+    try:
+        profile = DensityProfile.from_vcf(vcf_location)
+    except Exception as e:
+        print(f"Could not build density profile of {vcf_location}: {e}")
+        profile = None
+    profiles[vcf_location] = (profile, time.time())
+
+
+def get_profiles(vcf_locations):
+    now = time.time()
+    missing = [
+        vcf
+        for vcf in set(vcf_locations)
+        if now - profiles.get(vcf, (None, 0))[1] > PROFILE_TTL_SECONDS
+    ]
+    if missing:
+        with ThreadPoolExecutor(min(THREADS, len(missing))) as executor:
+            list(executor.map(load_profile, missing))
+
+    return {vcf: profiles[vcf][0] for vcf in vcf_locations}
+
+
+def fixed_splits(start, end):
+    return [
+        (split_start, min(split_start + SPLIT_SIZE - 1, end))
+        for split_start in range(start, end + 1, SPLIT_SIZE)
+    ]
+
+
+def plan_splits(profile, chrom, start, end):
+    if profile is None:
+        return fixed_splits(start, end)
+    return profile.plan(chrom, start, end)
+
+
+def group_splits(profile, chrom, splits):
+    # adjacent splits whose combined work fits a single split are scanned
+    # by one task, saving the index reads and process spawns of the others
+    if profile is None:
+        return [
+            splits[n : n + FIXED_REGIONS_PER_TASK]
+            for n in range(0, len(splits), FIXED_REGIONS_PER_TASK)
+        ]
+
+    groups = []
+    group = []
+    group_work = 0
+    for split_start, split_end in splits:
+        work = profile.work(chrom, split_start, split_end)
+        if group and (
+            group_work + work > TARGET_SPLIT_WORK
+            or len(group) >= MAX_REGIONS_PER_TASK
+        ):
+            groups.append(group)
+            group = []
+            group_work = 0
+        group.append((split_start, split_end))
+        group_work += work
+    if group:
+        groups.append(group)
+
+    return groups
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,11 @@
+from .block_cache import BlockCache, CachedSource, block_cache
+from .coverage import COVERAGE_BIN_SIZE, covers, vcf_coverage
+from .existence_filter import BloomFilter, allele_hash, filter_key
+from .genotypes import CarrierBitset, allele_counts, carrier_mask
+from .index import IndexNotFoundError, VcfIndex, cache_index, load_index
+from .index_cache import INDEX_CACHE_DIR, index_cache
+from .key_index import KeyIndexReader, KeyIndexWriter, key_index_key
+from .reader import VcfReader, VcfRecord
+from .sidecar import SidecarReader, SidecarWriter, sidecar_key
+from .sources import SourceError, is_supported_location, open_source
+from .tiles import TILE_SIZE, TileReader, TileWriter, tiles_key
@@ -0,0 +1,100 @@
+import struct
+import zlib
+
+
+BGZF_MAGIC = b"\x1f\x8b\x08\x04"
+# a bgzf block never exceeds 64 KiB compressed or uncompressed
+MAX_BLOCK_SIZE = 1 << 16
+HEADER_SIZE = 18
+
+
+class BgzfError(Exception):
+    pass
+
+
+def split_virtual_offset(voffset):
+    return voffset >> 16, voffset & 0xFFFF
+
+
+def make_virtual_offset(coffset, uoffset):
+    return (coffset << 16) | uoffset
+
+
+def block_size(data, offset=0):
+    # total compressed size of the block starting at offset
+    # or None if the header is not complete in data
+    if len(data) < offset + HEADER_SIZE:
+        return None
+    if data[offset : offset + 4] != BGZF_MAGIC:
+        raise BgzfError(f"Invalid BGZF block at {offset}")
+    (xlen,) = struct.unpack_from("<H", data, offset + 10)
+    extra = offset + 12
+    extra_end = extra + xlen
+    while extra < extra_end:
+        si1, si2, slen = struct.unpack_from("<BBH", data, extra)
+        if si1 == 66 and si2 == 67:
+            (bsize,) = struct.unpack_from("<H", data, extra + 4)
+            return bsize + 1
+        extra += 4 + slen
+    raise BgzfError(f"BGZF block at {offset} has no BSIZE field")
+
+
+def decompress_block(data, offset=0, size=None):
+    if size is None:
+        size = block_size(data, offset)
+    (xlen,) = struct.unpack_from("<H", data, offset + 10)
+    cdata = data[offset + 12 + xlen : offset + size - 8]
+    return zlib.decompress(cdata, -15)
+
+
+def iter_blocks(data, offset=0):
+    # yields (offset, size, decompressed) for every complete block in data
+    while True:
+        size = block_size(data, offset)
+        if size is None or len(data) < offset + size:
+            return
+        yield offset, size, decompress_block(data, offset, size)
+        offset += size
+
+
+def read_blocks(source, offset=0, step=16 * MAX_BLOCK_SIZE):
+    # sequentially yields (offset, decompressed) for the blocks of a whole file
+    while True:
+        data = source.read_range(offset, offset + step)
+        if not data:
+            return
+        consumed = 0
+        for block_offset, size, block in iter_blocks(data):
+            consumed = block_offset + size
+            yield offset + block_offset, block
+        if consumed == 0:
+            return
+        offset += consumed
+
+
+def decompress_all(data):
+    # whole-file helper, used for small files such as indexes
+    return b"".join(block for _, _, block in iter_blocks(data))
+
+
+def read_virtual_range(source, vstart, vend):
+    # yields decompressed pieces between two virtual offsets
+    # the last block of the range is fetched in the same request
+    cstart, ustart = split_virtual_offset(vstart)
+    cend, uend = split_virtual_offset(vend)
+    data = source.read_block_span(cstart, cend)
+
+    for offset, _, block in iter_blocks(data):
+        coffset = cstart + offset
+        if coffset > cend:
+            break
+        begin = ustart if coffset == cstart else 0
+        finish = uend if coffset == cend else len(block)
+        if begin < finish:
+            yield block[begin:finish]
+        if coffset == cend:
+            break
+
+
+if __name__ == "__main__":
+    pass
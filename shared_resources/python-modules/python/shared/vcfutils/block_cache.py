@@ -0,0 +1,132 @@
+from collections import OrderedDict
+import threading
+
+from .bgzf import MAX_BLOCK_SIZE, block_size
+from .sources import ByteSource
+
+
+# compressed blocks kept by a warm container
+BLOCK_CACHE_BYTES = 128 * 1024 * 1024
+# spans closer than this are fetched by one request, reading the gap
+# costs less than the latency of another request
+COALESCE_GAP = 512 * 1024
+
+
+class BlockCache:
+    """
+    Compressed BGZF blocks keyed by (etag, compressed offset), the least
+    recently used blocks are dropped once the budget is exceeded.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.blocks = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            block = self.blocks.get(key)
+            if block is not None:
+                self.blocks.move_to_end(key)
+            return block
+
+    def put(self, key, block):
+        with self.lock:
+            if key in self.blocks:
+                self.blocks.move_to_end(key)
+                return
+            self.blocks[key] = block
+            self.size += len(block)
+            while self.size > self.max_bytes:
+                _, evicted = self.blocks.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self.lock:
+            self.blocks.clear()
+            self.size = 0
+
+
+block_cache = BlockCache(BLOCK_CACHE_BYTES)
+
+
+def coalesce(spans, gap=COALESCE_GAP):
+    # merges (first, last) block offsets that are close to each other
+    merged = []
+    for first, last in sorted(spans):
+        if merged and first - merged[-1][1] <= gap:
+            merged[-1][1] = max(merged[-1][1], last)
+        else:
+            merged.append([first, last])
+    return [tuple(span) for span in merged]
+
+
+class CachedSource(ByteSource):
+    """
+    A source of a bgzipped file whose blocks are served from the block
+    cache, only missing blocks are read from the wrapped source. The etag
+    identifies the content so replaced files are never served stale.
+    """
+
+    def __init__(self, source, etag, cache=block_cache):
+        super().__init__(source.location)
+        self.source = source
+        self.etag_value = etag
+        self.cache = cache
+        self.requests = 0
+
+    def read_range(self, start, end):
+        self.requests += 1
+        return self.source.read_range(start, end)
+
+    def read_tail(self, length):
+        return self.source.read_tail(length)
+
+    def exists(self):
+        return self.source.exists()
+
+    def etag(self):
+        return self.etag_value
+
+    def store(self, offset, data):
+        # caches the complete blocks of data read from offset
+        position = 0
+        while (size := block_size(data, position)) is not None:
+            if len(data) < position + size:
+                break
+            block = data[position : position + size]
+            self.cache.put((self.etag_value, offset + position), block)
+            position += size
+
+    def read_block_span(self, first, last):
+        pieces = []
+        offset = first
+        while offset <= last:
+            block = self.cache.get((self.etag_value, offset))
+            if block is None:
+                data = self.read_range(offset, last + MAX_BLOCK_SIZE)
+                self.store(offset, data)
+                pieces.append(data)
+                break
+            pieces.append(block)
+            offset += len(block)
+        return b"".join(pieces)
+
+    def prefetch(self, spans):
+        # stops early rather than evicting blocks it read itself
+        budget = self.cache.max_bytes // 4
+        for first, last in coalesce(spans):
+            if last - first > budget:
+                break
+            budget -= last - first
+            cached = (
+                self.cache.get((self.etag_value, first)) is not None
+                and self.cache.get((self.etag_value, last)) is not None
+            )
+            if not cached:
+                self.store(first, self.read_range(first, last + MAX_BLOCK_SIZE))
+
+
+if __name__ == "__main__":
+    pass
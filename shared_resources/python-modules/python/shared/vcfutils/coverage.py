@@ -0,0 +1,72 @@
+import base64
+
+from .index import IndexNotFoundError
+from .reader import VcfReader
+from .sources import SourceError, is_supported_location
+
+
+#
+# Coarse coverage of the chromosomes of a VCF
+#
+# Derived from the bins of the index, so no record is read. For each
+# chromosome the 1-based first and last base of the bins holding records,
+# and a bitmap of the COVERAGE_BIN_SIZE windows they touch, base64 encoded.
+# Records spanning a large bin widen both, a record never starts outside.
+#
+COVERAGE_BIN_SHIFT = 20
+COVERAGE_BIN_SIZE = 1 << COVERAGE_BIN_SHIFT
+
+
+def chromosome_coverage(index, chrom):
+    spans = index.occupied_spans(chrom)
+    if not spans:
+        return None
+    bits = bytearray()
+
+    for beg, end in spans:
+        first = beg >> COVERAGE_BIN_SHIFT
+        for window in range(first, ((end - 1) >> COVERAGE_BIN_SHIFT) + 1):
+            if window >> 3 >= len(bits):
+                bits.extend(bytes((window >> 3) - len(bits) + 1))
+            bits[window >> 3] |= 1 << (window & 7)
+
+    return {
+        "start": min(beg for beg, _ in spans) + 1,
+        "end": max(end for _, end in spans),
+        "bins": base64.b64encode(bits).decode(),
+    }
+
+
+def vcf_coverage(vcf_location):
+    # None when the index cannot be read, the vcf is then always searched
+    if not is_supported_location(vcf_location):
+        return None
+    try:
+        index = VcfReader(vcf_location).index
+    except (IndexNotFoundError, SourceError, ValueError) as e:
+        print(f"Coverage not available for {vcf_location}: {e}")
+        return None
+
+    coverage = dict()
+    for chrom in index.names:
+        if (chrom_coverage := chromosome_coverage(index, chrom)) is not None:
+            coverage[chrom] = chrom_coverage
+    return coverage
+
+
+def covers(chrom_coverage, start, end):
+    # whether records may start between the 1-based positions start and end
+    if not chrom_coverage:
+        return True
+    if end < chrom_coverage["start"] or start > chrom_coverage["end"]:
+        return False
+    bits = base64.b64decode(chrom_coverage["bins"])
+    last = min((end - 1) >> COVERAGE_BIN_SHIFT, 8 * len(bits) - 1)
+    return any(
+        bits[window >> 3] & (1 << (window & 7))
+        for window in range(max(0, start - 1) >> COVERAGE_BIN_SHIFT, last + 1)
+    )
+
+
+if __name__ == "__main__":
+    pass
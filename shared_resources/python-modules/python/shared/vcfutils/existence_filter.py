@@ -0,0 +1,85 @@
+import hashlib
+import math
+import struct
+
+
+#
+# Bloom filter over the alleles of a VCF
+#
+# Keys are chrom:pos:REF:ALT with the chromosome named as in the VCF, every
+# alternate allele of a record is added whether or not it is called, so a
+# negative answer means no record of the VCF has the allele.
+# The file is the magic bytes, the number of hashes (uint32) and of bits
+# (uint64), the etag of the VCF the alleles were read from (64 bytes, null
+# padded) followed by the bits.
+#
+FILTER_MAGIC = b"SBF2"
+FALSE_POSITIVE_RATE = 0.01
+HEADER = struct.Struct("<4sIQ64s")
+
+
+def filter_key(vcf_location):
+    vcf_hash = hashlib.md5(vcf_location.encode()).hexdigest()
+    return f"vcf-filters/{vcf_hash}.bloom"
+
+
+def allele_hash(chrom, pos, ref, alt):
+    key = f"{chrom}:{pos}:{ref.upper()}:{alt.upper()}".encode()
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+class BloomFilter:
+    def __init__(self, bits, hashes, data=None, etag=""):
+        self.bits = bits
+        self.hashes = hashes
+        self.data = bytearray((bits + 7) // 8) if data is None else data
+        # etag of the VCF the alleles were read from
+        self.etag = etag
+
+    @classmethod
+    def from_hashes(cls, hashes, etag="", error_rate=FALSE_POSITIVE_RATE):
+        # sized for the number of keys, with the optimal number of hashes
+        n = max(1, len(hashes))
+        bits = max(64, math.ceil(-n * math.log(error_rate) / math.log(2) ** 2))
+        bloom = cls(bits, max(1, round(bits / n * math.log(2))), etag=etag)
+        for value in hashes:
+            bloom.add(value)
+        return bloom
+
+    def positions(self, value):
+        # double hashing from the two halves of the 64 bit hash
+        h1 = value & 0xFFFFFFFF
+        h2 = (value >> 32) | 1
+        return ((h1 + i * h2) % self.bits for i in range(self.hashes))
+
+    def add(self, value):
+        data = self.data
+        for position in self.positions(value):
+            data[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value):
+        data = self.data
+        return all(
+            data[position >> 3] & (1 << (position & 7))
+            for position in self.positions(value)
+        )
+
+    def to_bytes(self):
+        header = HEADER.pack(
+            FILTER_MAGIC, self.hashes, self.bits, self.etag.encode()[:64]
+        )
+        return header + self.data
+
+    @classmethod
+    def from_bytes(cls, data):
+        if len(data) < HEADER.size:
+            raise ValueError("Not a filter file")
+        magic, hashes, bits, etag = HEADER.unpack_from(data)
+        if magic != FILTER_MAGIC or len(data) < HEADER.size + (bits + 7) // 8:
+            raise ValueError("Not a filter file")
+        etag = etag.rstrip(b"\x00").decode()
+        return cls(bits, hashes, data[HEADER.size :], etag)
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,66 @@
+from itertools import compress
+
+
+# with at most 9 alternate alleles every allele number in a GT value is a
+# single digit, so calls can be counted with C level string operations
+# instead of parsing each sample; records with more alleles return None
+MAX_SINGLE_DIGIT_ALTS = 9
+DIGITS = "0123456789"
+# every byte except the separator of GT values
+NON_SEPARATORS = bytes(range(256)).replace(b",", b"")
+# conversions between masks of 0 and 1 bytes and binary digits
+MASK_DIGITS = bytes.maketrans(b"\x00\x01", b"01")
+DIGIT_MASK = bytes.maketrans(b"01", b"\x00\x01")
+
+
+def allele_counts(genotypes, alt_count):
+    # calls of each allele number, the sum is the number of called alleles
+    if alt_count > MAX_SINGLE_DIGIT_ALTS:
+        return None
+    return [genotypes.count(digit) for digit in DIGITS]
+
+
+def carrier_mask(genotypes, alleles, alt_count):
+    # one byte per comma separated GT value, 1 if it calls any of the alleles
+    if alt_count > MAX_SINGLE_DIGIT_ALTS:
+        return None
+    hits = "".join(DIGITS[allele] for allele in alleles).encode()
+    # each GT value is reduced to its hit alleles, empty values carry none
+    deleted = NON_SEPARATORS.translate(None, hits)
+    values = genotypes.encode().translate(None, deleted).split(b",")
+    return bytes(map(bool, values))
+
+
+class CarrierBitset:
+    """
+    Samples calling a hit allele in any record of a scan, one bit per
+    GT value. The masks of records are OR-ed in as integers.
+    """
+
+    def __init__(self):
+        self.width = 0
+        self.bits = 0
+
+    def add_mask(self, mask):
+        # all records of a scan have the same samples
+        if not mask:
+            return
+        self.width = len(mask)
+        self.bits |= int(mask.translate(MASK_DIGITS), 2)
+
+    def add_indices(self, indices, width):
+        mask = bytearray(width)
+        for index in indices:
+            mask[index] = 1
+        self.add_mask(bytes(mask))
+
+    def select(self, names):
+        # names of the carriers, names are in GT value order
+        if not self.width:
+            return []
+        mask = format(self.bits, f"0{self.width}b").encode().translate(DIGIT_MASK)
+        return list(compress(names, mask))
+
+
+if __name__ == "__main__":
+    pass
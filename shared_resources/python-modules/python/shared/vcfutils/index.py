@@ -0,0 +1,294 @@
+import struct
+
+from .bgzf import decompress_all
+from .index_cache import index_cache
+from .sources import SourceError, open_source
+
+
+TBI_MAGIC = b"TBI\x01"
+CSI_MAGIC = b"CSI\x01"
+TBI_MIN_SHIFT = 14
+TBI_DEPTH = 5
+# weight of an uncompressed byte relative to a compressed byte
+# used when two virtual offsets fall in the same bgzf block
+UNCOMPRESSED_WEIGHT = 0.25
+
+
+class IndexNotFoundError(Exception):
+    pass
+
+
+def bin_first(level):
+    return ((1 << (3 * level)) - 1) // 7
+
+
+def bin_parent(bin):
+    return (bin - 1) >> 3
+
+
+# bins overlapping the 0-based half open interval [beg, end)
+def reg2bins(beg, end, min_shift, depth):
+    bins = []
+    end -= 1
+    shift = min_shift + depth * 3
+    offset = 0
+    for level in range(depth + 1):
+        bins.extend(range(offset + (beg >> shift), offset + (end >> shift) + 1))
+        offset += 1 << (3 * level)
+        shift -= 3
+    return bins
+
+
+class ReferenceIndex:
+    def __init__(self):
+        # bin -> [(chunk_beg, chunk_end), ...]
+        self.bins = {}
+        # bin -> loffset (csi only)
+        self.loffsets = {}
+        # linear index of 16 kb windows (tbi only)
+        self.intervals = []
+
+
+class VcfIndex:
+    """
+    Parsed tabix (.tbi) or coordinate sorted (.csi) index of a bgzipped VCF.
+    Only the parts needed for region queries and density estimates are kept.
+    """
+
+    def __init__(self, *, kind, min_shift, depth, names, references):
+        self.kind = kind
+        self.min_shift = min_shift
+        self.depth = depth
+        self.names = names
+        self.references = references
+        self.name_to_id = {name: n for n, name in enumerate(names)}
+
+    def chunks(self, chrom, beg, end):
+        # virtual offset chunks that may contain records overlapping [beg, end)
+        if chrom not in self.name_to_id:
+            return []
+        ref = self.references[self.name_to_id[chrom]]
+        beg = max(0, beg)
+        min_off = self.min_offset(ref, beg)
+        chunks = []
+
+        for bin in reg2bins(beg, end, self.min_shift, self.depth):
+            for chunk_beg, chunk_end in ref.bins.get(bin, ()):
+                if chunk_end > min_off:
+                    chunks.append((max(chunk_beg, min_off), chunk_end))
+
+        return merge_chunks(chunks)
+
+    def min_offset(self, ref, beg):
+        if self.kind == "tbi":
+            if not ref.intervals:
+                return 0
+            window = min(beg >> self.min_shift, len(ref.intervals) - 1)
+            return ref.intervals[window]
+        bin = bin_first(self.depth) + (beg >> self.min_shift)
+        while True:
+            if bin in ref.loffsets:
+                return ref.loffsets[bin]
+            if bin == 0:
+                return 0
+            bin = bin_parent(bin)
+
+    def meta_bin(self):
+        # pseudo bin holding the offsets and record counts of a reference
+        return bin_first(self.depth + 1) + 1
+
+    def mapped_records(self, chrom):
+        if chrom not in self.name_to_id:
+            return 0
+        ref = self.references[self.name_to_id[chrom]]
+        meta = ref.bins.get(self.meta_bin())
+        return meta[1][0] if meta and len(meta) > 1 else 0
+
+    def window_weights(self, chrom):
+        # estimated compressed bytes per window of 2 ** min_shift bases
+        if chrom not in self.name_to_id:
+            return []
+        ref = self.references[self.name_to_id[chrom]]
+
+        if self.kind == "tbi" and ref.intervals:
+            offsets = list(ref.intervals)
+            meta = ref.bins.get(self.meta_bin())
+            offsets.append(meta[0][1] if meta else offsets[-1])
+            return [
+                virtual_distance(offsets[i], offsets[i + 1])
+                for i in range(len(offsets) - 1)
+            ]
+
+        first = bin_first(self.depth)
+        weights = {}
+        for bin, chunks in ref.bins.items():
+            if first <= bin < bin_first(self.depth + 1):
+                weights[bin - first] = sum(
+                    virtual_distance(beg, end) for beg, end in chunks
+                )
+        if not weights:
+            return []
+        return [weights.get(window, 0) for window in range(max(weights) + 1)]
+
+    def occupied_spans(self, chrom):
+        # 0-based half open spans of the bins holding records
+        if chrom not in self.name_to_id:
+            return []
+        ref = self.references[self.name_to_id[chrom]]
+        spans = []
+
+        for bin, chunks in ref.bins.items():
+            if bin >= bin_first(self.depth + 1) or not chunks:
+                continue
+            level = 0
+            while bin >= bin_first(level + 1):
+                level += 1
+            shift = self.min_shift + 3 * (self.depth - level)
+            offset = bin - bin_first(level)
+            spans.append((offset << shift, (offset + 1) << shift))
+        return sorted(spans)
+
+
+def virtual_distance(start, end):
+    distance = (end >> 16) - (start >> 16)
+    distance += ((end & 0xFFFF) - (start & 0xFFFF)) * UNCOMPRESSED_WEIGHT
+    return max(0, distance)
+
+
+def merge_chunks(chunks):
+    merged = []
+    for chunk_beg, chunk_end in sorted(chunks):
+        # merge overlapping chunks and chunks sharing a compressed block
+        if merged and (
+            chunk_beg <= merged[-1][1] or chunk_beg >> 16 == merged[-1][1] >> 16
+        ):
+            if chunk_end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], chunk_end)
+        else:
+            merged.append((chunk_beg, chunk_end))
+    return merged
+
+
+def parse_names(data, offset, length):
+    names = data[offset : offset + length].split(b"\x00")
+    return [name.decode() for name in names if name]
+
+
+def parse_tbi(data):
+    if data[:4] != TBI_MAGIC:
+        raise ValueError("Not a tabix index")
+    n_ref, _, _, _, _, _, _, l_nm = struct.unpack_from("<8i", data, 4)
+    offset = 36
+    names = parse_names(data, offset, l_nm)
+    offset += l_nm
+    references = []
+
+    for _ in range(n_ref):
+        ref = ReferenceIndex()
+        (n_bin,) = struct.unpack_from("<i", data, offset)
+        offset += 4
+        for _ in range(n_bin):
+            bin, n_chunk = struct.unpack_from("<Ii", data, offset)
+            offset += 8
+            chunks = struct.unpack_from(f"<{2 * n_chunk}Q", data, offset)
+            offset += 16 * n_chunk
+            ref.bins[bin] = list(zip(chunks[::2], chunks[1::2]))
+        (n_intv,) = struct.unpack_from("<i", data, offset)
+        offset += 4
+        ref.intervals = list(struct.unpack_from(f"<{n_intv}Q", data, offset))
+        offset += 8 * n_intv
+        references.append(ref)
+
+    return VcfIndex(
+        kind="tbi",
+        min_shift=TBI_MIN_SHIFT,
+        depth=TBI_DEPTH,
+        names=names,
+        references=references,
+    )
+
+
+def parse_csi(data, header_names=None):
+    if data[:4] != CSI_MAGIC:
+        raise ValueError("Not a CSI index")
+    min_shift, depth, l_aux = struct.unpack_from("<3i", data, 4)
+    offset = 16
+    names = header_names or []
+    # tabix style meta data carries the sequence names
+    if l_aux >= 28:
+        (l_nm,) = struct.unpack_from("<i", data, offset + 24)
+        names = parse_names(data, offset + 28, l_nm)
+    offset += l_aux
+    (n_ref,) = struct.unpack_from("<i", data, offset)
+    offset += 4
+    references = []
+
+    for _ in range(n_ref):
+        ref = ReferenceIndex()
+        (n_bin,) = struct.unpack_from("<i", data, offset)
+        offset += 4
+        for _ in range(n_bin):
+            bin, loffset, n_chunk = struct.unpack_from("<IQi", data, offset)
+            offset += 16
+            chunks = struct.unpack_from(f"<{2 * n_chunk}Q", data, offset)
+            offset += 16 * n_chunk
+            ref.bins[bin] = list(zip(chunks[::2], chunks[1::2]))
+            ref.loffsets[bin] = loffset
+        references.append(ref)
+
+    return VcfIndex(
+        kind="csi",
+        min_shift=min_shift,
+        depth=depth,
+        names=names,
+        references=references,
+    )
+
+
+def parse_index(data, header_names=None):
+    data = decompress_all(data)
+    if data[:4] == TBI_MAGIC:
+        return parse_tbi(data)
+    return parse_csi(data, header_names)
+
+
+def find_index(vcf_location):
+    # location and etag of the index, one request per candidate
+    for suffix in (".tbi", ".csi"):
+        try:
+            return vcf_location + suffix, open_source(vcf_location + suffix).etag()
+        except SourceError:
+            pass
+    raise IndexNotFoundError(f"Could not find an index for {vcf_location}")
+
+
+def read_index_bytes(index_location):
+    source = open_source(index_location)
+    chunks = []
+    offset = 0
+    step = 1 << 22
+    while True:
+        chunk = source.read_range(offset, offset + step)
+        chunks.append(chunk)
+        if len(chunk) < step:
+            break
+        offset += step
+    return b"".join(chunks)
+
+
+def cache_index(vcf_location):
+    # local path of the index, downloaded once per etag by a warm container
+    index_location, etag = find_index(vcf_location)
+    path = index_cache.get(index_location, etag)
+    if path is None:
+        path = index_cache.put(index_location, etag, read_index_bytes(index_location))
+    return path
+
+
+def load_index(vcf_location, header_names=None):
+    with open(cache_index(vcf_location), "rb") as f:
+        return parse_index(f.read(), header_names)
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,80 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+
+# index files kept by a warm container, /tmp is cleared around this directory
+INDEX_CACHE_DIR = "/tmp/index-cache"
+INDEX_CACHE_BYTES = 256 * 1024 * 1024
+# entries used this recently may be open by bcftools and are not evicted
+EVICTION_GRACE_SECONDS = 60
+
+
+class IndexCache:
+    """
+    Index files on local disk, named by the location and ETag of the
+    index so that a replaced file is never served stale. The least
+    recently used files are removed once the directory exceeds its byte
+    budget. Files are written to a temporary name and renamed into place,
+    so readers only ever see complete files.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+
+    def path(self, location, etag):
+        suffix = os.path.splitext(location)[1]
+        name = hashlib.sha256(f"{location}\t{etag}".encode()).hexdigest()
+        return os.path.join(self.directory, name + suffix)
+
+    def get(self, location, etag):
+        path = self.path(location, etag)
+        with self.lock:
+            try:
+                # modification time orders the entries for eviction
+                os.utime(path)
+            except FileNotFoundError:
+                return None
+        return path
+
+    def put(self, location, etag, data):
+        path = self.path(location, etag)
+        os.makedirs(self.directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        with self.lock:
+            os.replace(temp_path, path)
+            self.evict()
+        return path
+
+    def evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        now = time.time()
+        for used, size, path in sorted(entries):
+            if total <= self.max_bytes or now - used < EVICTION_GRACE_SECONDS:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+index_cache = IndexCache(INDEX_CACHE_DIR, INDEX_CACHE_BYTES)
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,91 @@
+from array import array
+import hashlib
+import struct
+
+
+#
+# Variant key index of a VCF
+#
+# Maps the allele hashes of the existence filter to the virtual offsets of
+# their records. Entries are partitioned by the top bits of the hash and
+# sorted within a partition, so a lookup reads two entries of the partition
+# table and then a single partition.
+#   header      magic, number of partitions (uint32), etag of the VCF
+#   table       uint64[partitions + 1], first entry of each partition
+#   entries     (hash uint64, virtual offset uint64), sorted by hash
+#
+KEY_INDEX_MAGIC = b"SKI1"
+PARTITION_BITS = 12
+HEADER = struct.Struct("<4sI64s")
+ENTRY_SIZE = 16
+
+
+def key_index_key(vcf_location):
+    vcf_hash = hashlib.md5(vcf_location.encode()).hexdigest()
+    return f"vcf-keys/{vcf_hash}.keys"
+
+
+class KeyIndexWriter:
+    def __init__(self, partition_bits=PARTITION_BITS):
+        self.shift = 64 - partition_bits
+        # interleaved hashes and virtual offsets of each partition
+        self.partitions = [array("Q") for _ in range(1 << partition_bits)]
+
+    def add(self, value, voffset):
+        self.partitions[value >> self.shift].extend((value, voffset))
+
+    def write(self, file, etag):
+        file.write(
+            HEADER.pack(KEY_INDEX_MAGIC, len(self.partitions), etag.encode()[:64])
+        )
+        table = array("Q", [0])
+        for partition in self.partitions:
+            table.append(table[-1] + len(partition) // 2)
+        file.write(table.tobytes())
+        for partition in self.partitions:
+            pairs = sorted(zip(partition[::2], partition[1::2]))
+            file.write(array("Q", [n for pair in pairs for n in pair]).tobytes())
+
+
+class KeyIndexReader:
+    def __init__(self, source, partitions, etag):
+        self.source = source
+        self.partitions = partitions
+        self.shift = 64 - (partitions.bit_length() - 1)
+        # etag of the VCF the offsets belong to
+        self.etag = etag
+        self.entries_offset = HEADER.size + 8 * (partitions + 1)
+
+    @classmethod
+    def open(cls, source):
+        header = source.read_range(0, HEADER.size)
+        if len(header) != HEADER.size or header[:4] != KEY_INDEX_MAGIC:
+            raise ValueError("Not a key index file")
+        _, partitions, etag = HEADER.unpack(header)
+        return cls(source, partitions, etag.rstrip(b"\x00").decode())
+
+    def lookup(self, value):
+        # virtual offsets of the records with the allele hash, in file order
+        partition = value >> self.shift
+        first, last = struct.unpack(
+            "<QQ",
+            self.source.read_range(
+                HEADER.size + 8 * partition, HEADER.size + 8 * (partition + 2)
+            ),
+        )
+        if first == last:
+            return []
+        entries = array(
+            "Q",
+            self.source.read_range(
+                self.entries_offset + ENTRY_SIZE * first,
+                self.entries_offset + ENTRY_SIZE * last,
+            ),
+        )
+        return sorted(
+            entries[n + 1] for n in range(0, len(entries), 2) if entries[n] == value
+        )
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,328 @@
+from .bgzf import (
+    MAX_BLOCK_SIZE,
+    make_virtual_offset,
+    read_blocks,
+    read_virtual_range,
+    split_virtual_offset,
+)
+from .block_cache import CachedSource
+from .index import load_index
+from .sources import open_source
+
+
+class VcfRecord:
+    """
+    A single VCF data line split into the fields the query engine needs.
+    INFO and genotypes are only parsed when they are accessed.
+    """
+
+    __slots__ = (
+        "chrom",
+        "pos",
+        "ref",
+        "alts",
+        "info",
+        "_format",
+        "_samples",
+        "_sample_indices",
+        "_genotypes",
+        "_ac",
+        "_an",
+        "_vt",
+        "_info_parsed",
+    )
+
+    def __init__(
+        self,
+        chrom,
+        pos,
+        ref,
+        alts,
+        info,
+        *,
+        format="",
+        samples="",
+        sample_indices=None,
+        genotypes=None,
+    ):
+        self.chrom = chrom
+        self.pos = pos
+        self.ref = ref
+        self.alts = alts
+        self.info = info
+        self._format = format
+        self._samples = samples
+        self._sample_indices = sample_indices
+        self._genotypes = genotypes
+        self._info_parsed = False
+
+    @classmethod
+    def from_sites(cls, chrom, pos, ref, alts, ac, an, vt):
+        # records without genotypes, eg: read back from a sites sidecar
+        record = cls(chrom, pos, ref, alts, "")
+        record._ac = ac
+        record._an = an
+        record._vt = vt
+        record._info_parsed = True
+        return record
+
+    def _parse_info(self):
+        self._ac = None
+        self._an = None
+        self._vt = None
+        for info in self.info.split(";"):
+            if info.startswith("AC="):
+                self._ac = [int(c) if c != "." else 0 for c in info[3:].split(",")]
+            elif info.startswith("AN="):
+                self._an = int(info[3:])
+            elif info.startswith("VT="):
+                self._vt = info[3:]
+        self._info_parsed = True
+
+    @property
+    def ac(self):
+        if not self._info_parsed:
+            self._parse_info()
+        return self._ac
+
+    @property
+    def an(self):
+        if not self._info_parsed:
+            self._parse_info()
+        return self._an
+
+    @property
+    def vt(self):
+        if not self._info_parsed:
+            self._parse_info()
+        return self._vt
+
+    @property
+    def genotypes(self):
+        # comma separated GT values of the selected samples eg: "0|0,0|1,1/1"
+        if self._genotypes is None:
+            self._genotypes = extract_genotypes(
+                self._format, self._samples, self._sample_indices
+            )
+        return self._genotypes
+
+
+def extract_genotypes(format, samples, sample_indices=None):
+    if not samples or not format.startswith("GT"):
+        return ""
+    columns = samples.rstrip("\n").split("\t")
+    if sample_indices is not None:
+        columns = [columns[i] for i in sample_indices]
+    if format == "GT":
+        return ",".join(columns)
+    return ",".join([column.split(":", 1)[0] for column in columns])
+
+
+# header lines of identified files, (location, etag) -> lines
+headers = dict()
+
+
+class VcfReader:
+    """
+    Reads regions of a bgzipped and indexed VCF without spawning bcftools.
+    Only the BGZF blocks referenced by the index for a region are fetched.
+    """
+
+    def __init__(self, location, index=None, etag=None):
+        self.location = location
+        self.etag = etag
+        self.source = open_source(location)
+        # blocks of an identified file are shared by the readers of a container
+        if etag is not None:
+            self.source = CachedSource(self.source, etag)
+        self.header_lines = []
+        self.sample_names = []
+        self._header_read = False
+        self._index = index
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = load_index(self.location, self.contigs())
+        return self._index
+
+    def read_header(self):
+        if self._header_read:
+            return self.header_lines
+        if self.etag is not None and (self.location, self.etag) in headers:
+            self.set_header(headers[(self.location, self.etag)])
+            return self.header_lines
+        pending = b""
+        lines = []
+        done = False
+        # header spans as many blocks as needed
+        for _, block in read_blocks(self.source, step=4 * MAX_BLOCK_SIZE):
+            parts = (pending + block).split(b"\n")
+            pending = parts.pop()
+            for line in parts:
+                if not line.startswith(b"#"):
+                    done = True
+                    break
+                lines.append(line.decode("latin-1"))
+            if done:
+                break
+        if self.etag is not None:
+            headers[(self.location, self.etag)] = lines
+        self.set_header(lines)
+        return lines
+
+    def set_header(self, lines):
+        self.header_lines = lines
+        if lines and lines[-1].startswith("#CHROM"):
+            self.sample_names = lines[-1].split("\t")[9:]
+        self._header_read = True
+
+    def contigs(self):
+        contigs = []
+        for line in self.read_header():
+            if line.startswith("##contig=<"):
+                for field in line[len("##contig=<") : -1].split(","):
+                    if field.startswith("ID="):
+                        contigs.append(field[3:])
+        return contigs
+
+    def samples(self):
+        self.read_header()
+        return self.sample_names
+
+    def sample_indices(self, samples):
+        if not samples:
+            return None
+        wanted = set(samples)
+        return [n for n, name in enumerate(self.samples()) if name in wanted]
+
+    def prefetch(self, chrom, regions):
+        # reads the blocks of several (start, end) regions in few requests
+        chunks = [
+            chunk
+            for start, end in regions
+            for chunk in self.index.chunks(chrom, start - 1, end)
+        ]
+        self.source.prefetch(block_spans(chunks))
+
+    def fetch(self, chrom, start, end, samples=None):
+        # records overlapping 1-based inclusive [start, end], like bcftools --regions
+        sample_indices = self.sample_indices(samples)
+        chunks = self.index.chunks(chrom, start - 1, end)
+        self.source.prefetch(block_spans(chunks))
+
+        for chunk_beg, chunk_end in chunks:
+            pending = ""
+            finished = False
+            for piece in read_virtual_range(self.source, chunk_beg, chunk_end):
+                lines = (pending + piece.decode("latin-1")).split("\n")
+                pending = lines.pop()
+                for line in lines:
+                    record = self._parse(line, chrom, start, end, sample_indices)
+                    if record is False:
+                        finished = True
+                        break
+                    if record is not None:
+                        yield record
+                if finished:
+                    break
+            if finished:
+                break
+            if pending:
+                record = self._parse(pending, chrom, start, end, sample_indices)
+                if record is False:
+                    break
+                if record is not None:
+                    yield record
+
+    def fetch_from(self, voffset, chrom, start, end, samples=None):
+        # records of [start, end] read from the virtual offset of the first
+        # one, the index is not needed
+        sample_indices = self.sample_indices(samples)
+        coffset, uoffset = split_virtual_offset(voffset)
+        pending = ""
+
+        for _, block in read_blocks(self.source, coffset, step=2 * MAX_BLOCK_SIZE):
+            lines = (pending + block.decode("latin-1")[uoffset:]).split("\n")
+            uoffset = 0
+            pending = lines.pop()
+            for line in lines:
+                if not line.startswith(chrom + "\t"):
+                    return
+                record = self._parse(line, chrom, start, end, sample_indices)
+                if record is False:
+                    return
+                if record is not None:
+                    yield record
+        if pending.startswith(chrom + "\t"):
+            record = self._parse(pending, chrom, start, end, sample_indices)
+            if record:
+                yield record
+
+    def scan(self, samples=None):
+        # every record of the file in order, without using the index
+        for _, record in self.scan_offsets(samples):
+            yield record
+
+    def scan_offsets(self, samples=None):
+        # (virtual offset, record) of every record of the file in order
+        sample_indices = self.sample_indices(samples)
+        pending = ""
+        pending_offset = 0
+
+        for coffset, block in read_blocks(self.source):
+            lines = block.decode("latin-1").split("\n")
+            uoffset = 0
+            for n, line in enumerate(lines):
+                voffset = make_virtual_offset(coffset, uoffset)
+                uoffset += len(line) + 1
+                # the first line continues the last one of the previous block
+                if n == 0 and pending:
+                    line = pending + line
+                    voffset = pending_offset
+                if n == len(lines) - 1:
+                    pending = line
+                    pending_offset = voffset
+                elif line and not line.startswith("#"):
+                    fields = line.split("\t", 9)
+                    yield voffset, record_from_fields(fields, sample_indices)
+        if pending and not pending.startswith("#"):
+            fields = pending.split("\t", 9)
+            yield pending_offset, record_from_fields(fields, sample_indices)
+
+    @staticmethod
+    def _parse(line, chrom, start, end, sample_indices):
+        # returns a record, None to skip the line or False past the region
+        if not line or line.startswith("#"):
+            return None
+        fields = line.split("\t", 9)
+        if fields[0] != chrom:
+            return None
+        pos = int(fields[1])
+        if pos > end:
+            return False
+        if pos + len(fields[3]) - 1 < start:
+            return None
+        return record_from_fields(fields, sample_indices)
+
+
+def block_spans(chunks):
+    # compressed offsets of the first and last blocks of virtual offset chunks
+    return [(chunk_beg >> 16, chunk_end >> 16) for chunk_beg, chunk_end in chunks]
+
+
+def record_from_fields(fields, sample_indices=None):
+    return VcfRecord(
+        fields[0],
+        int(fields[1]),
+        fields[3],
+        fields[4].split(","),
+        fields[7],
+        format=fields[8] if len(fields) > 8 else "",
+        samples=fields[9] if len(fields) > 9 else "",
+        sample_indices=sample_indices,
+    )
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,251 @@
+from array import array
+from bisect import bisect_left, bisect_right
+import hashlib
+import json
+import struct
+
+from .reader import VcfRecord
+
+
+#
+# Sites sidecar of a single chromosome of a VCF
+#
+# The file is a sequence of uncompressed, 4 byte aligned blocks followed by
+# a JSON footer, the footer length (uint32) and the magic bytes.
+# Each block holds up to BLOCK_RECORDS records in little endian columns
+#   n          uint32
+#   pos        uint32[n]
+#   an         int32[n]         -1 when INFO/AN is missing
+#   vt         uint16[n]        index into footer["vt"]
+#   alt_start  uint32[n + 1]    range of the record in the alt columns
+#   ac         int32[n_alts]    -1 when INFO/AC is missing
+#   ref_off    uint32[n + 1]    ranges in the ref blob
+#   alt_off    uint32[n_alts + 1]
+#   ref blob, alt blob
+# The footer lists [first_pos, last_pos, offset, size] of every block so a
+# region needs one footer read and one read of the consecutive blocks, and
+# the etag of the VCF the sidecar was built from.
+#
+SIDECAR_MAGIC = b"SBS1"
+SIDECAR_VERSION = 1
+BLOCK_RECORDS = 4096
+TRAILER_SIZE = 8
+
+
+def sidecar_key(vcf_location, chrom):
+    vcf_hash = hashlib.md5(vcf_location.encode()).hexdigest()
+    return f"vcf-sidecars/{vcf_hash}/{chrom}.sites"
+
+
+def _pad(buffer):
+    buffer.extend(b"\x00" * (-len(buffer) % 4))
+
+
+class SidecarWriter:
+    def __init__(self, file, chrom, vcf_location="", etag=""):
+        self.file = file
+        self.chrom = chrom
+        self.vcf_location = vcf_location
+        self.etag = etag
+        self.blocks = []
+        self.vt_table = [""]
+        self.vt_lookup = {"": 0}
+        self.records = 0
+        # sidecar can answer queries only if every record has AC and AN
+        self.has_counts = True
+        self.offset = 0
+        self._reset()
+
+    def _reset(self):
+        self.pos = array("I")
+        self.an = array("i")
+        self.vt = array("H")
+        self.alt_start = array("I", [0])
+        self.ac = array("i")
+        self.ref_off = array("I", [0])
+        self.alt_off = array("I", [0])
+        self.ref_blob = bytearray()
+        self.alt_blob = bytearray()
+
+    def add(self, record):
+        alts = record.alts
+        ac = record.ac
+        an = record.an
+        if ac is None or an is None or len(ac) != len(alts):
+            self.has_counts = False
+        vt = record.vt or ""
+        if vt not in self.vt_lookup:
+            self.vt_lookup[vt] = len(self.vt_table)
+            self.vt_table.append(vt)
+
+        self.pos.append(record.pos)
+        self.an.append(-1 if an is None else an)
+        self.vt.append(self.vt_lookup[vt])
+        for n, alt in enumerate(alts):
+            self.ac.append(ac[n] if ac is not None and n < len(ac) else -1)
+            self.alt_blob.extend(alt.encode())
+            self.alt_off.append(len(self.alt_blob))
+        self.alt_start.append(len(self.ac))
+        self.ref_blob.extend(record.ref.encode())
+        self.ref_off.append(len(self.ref_blob))
+        self.records += 1
+
+        if len(self.pos) == BLOCK_RECORDS:
+            self.flush()
+
+    def flush(self):
+        if not self.pos:
+            return
+        block = bytearray(struct.pack("<I", len(self.pos)))
+        for column in (self.pos, self.an):
+            block.extend(column.tobytes())
+        block.extend(self.vt.tobytes())
+        _pad(block)
+        for column in (self.alt_start, self.ac, self.ref_off, self.alt_off):
+            block.extend(column.tobytes())
+        block.extend(self.ref_blob)
+        block.extend(self.alt_blob)
+        _pad(block)
+
+        self.blocks.append([self.pos[0], self.pos[-1], self.offset, len(block)])
+        self.file.write(block)
+        self.offset += len(block)
+        self._reset()
+
+    def close(self):
+        self.flush()
+        footer = json.dumps(
+            {
+                "version": SIDECAR_VERSION,
+                "chrom": self.chrom,
+                "vcf": self.vcf_location,
+                "etag": self.etag,
+                "records": self.records,
+                "has_counts": self.has_counts,
+                "vt": self.vt_table,
+                "blocks": self.blocks,
+            }
+        ).encode()
+        self.file.write(footer)
+        self.file.write(struct.pack("<I", len(footer)) + SIDECAR_MAGIC)
+
+
+def _column(view, offset, typecode, count):
+    size = array(typecode).itemsize * count
+    return view[offset : offset + size].cast(typecode), offset + size
+
+
+def decode_block(data, chrom, vt_table):
+    # decodes one block of the sidecar
+    # columns are views into data, nothing is copied until a record is built
+    view = memoryview(data)
+    (n,) = struct.unpack_from("<I", view, 0)
+    offset = 4
+    pos, offset = _column(view, offset, "I", n)
+    an, offset = _column(view, offset, "i", n)
+    vt, offset = _column(view, offset, "H", n)
+    offset += -offset % 4
+    alt_start, offset = _column(view, offset, "I", n + 1)
+    n_alts = alt_start[n]
+    ac, offset = _column(view, offset, "i", n_alts)
+    ref_off, offset = _column(view, offset, "I", n + 1)
+    alt_off, offset = _column(view, offset, "I", n_alts + 1)
+    ref_blob = bytes(view[offset : offset + ref_off[n]])
+    offset += ref_off[n]
+    alt_blob = bytes(view[offset : offset + alt_off[n_alts]])
+
+    return SidecarBlock(
+        chrom, vt_table, pos, an, vt, alt_start, ac, ref_off, alt_off, ref_blob, alt_blob
+    )
+
+
+class SidecarBlock:
+    def __init__(
+        self, chrom, vt_table, pos, an, vt, alt_start, ac, ref_off, alt_off, ref_blob, alt_blob
+    ):
+        self.chrom = chrom
+        self.vt_table = vt_table
+        self.pos = pos
+        self.an = an
+        self.vt = vt
+        self.alt_start = alt_start
+        self.ac = ac
+        self.ref_off = ref_off
+        self.alt_off = alt_off
+        self.ref_blob = ref_blob
+        self.alt_blob = alt_blob
+
+    def record(self, i):
+        alt_range = range(self.alt_start[i], self.alt_start[i + 1])
+        alts = [
+            self.alt_blob[self.alt_off[a] : self.alt_off[a + 1]].decode()
+            for a in alt_range
+        ]
+        ac = [self.ac[a] for a in alt_range]
+        an = self.an[i]
+        return VcfRecord.from_sites(
+            self.chrom,
+            self.pos[i],
+            self.ref_blob[self.ref_off[i] : self.ref_off[i + 1]].decode(),
+            alts,
+            None if -1 in ac else ac,
+            None if an < 0 else an,
+            self.vt_table[self.vt[i]] or None,
+        )
+
+    def fetch(self, start, end):
+        lo = bisect_left(self.pos, start)
+        hi = bisect_right(self.pos, end)
+        for i in range(lo, hi):
+            yield self.record(i)
+
+
+class SidecarReader:
+    def __init__(self, source, footer):
+        self.source = source
+        self.footer = footer
+        self.chrom = footer["chrom"]
+        self.has_counts = footer["has_counts"]
+        # etag of the vcf the sidecar belongs to, None in older sidecars
+        self.etag = footer.get("etag")
+        self.block_last = [block[1] for block in footer["blocks"]]
+
+    @classmethod
+    def open(cls, source, tail_size=1 << 16):
+        # a single read of the tail usually contains the whole footer
+        tail, size = source.read_tail(tail_size)
+        if tail[-4:] != SIDECAR_MAGIC:
+            raise ValueError("Not a sidecar file")
+        (footer_size,) = struct.unpack_from("<I", tail, len(tail) - TRAILER_SIZE)
+        if footer_size + TRAILER_SIZE > len(tail):
+            footer_start = size - TRAILER_SIZE - footer_size
+            tail = source.read_range(footer_start, size)
+        footer = json.loads(tail[-TRAILER_SIZE - footer_size : -TRAILER_SIZE])
+        return cls(source, footer)
+
+    def fetch(self, start, end):
+        # records with start <= pos <= end
+        blocks = self.footer["blocks"]
+        first = bisect_left(self.block_last, start)
+        chosen = []
+        for block in blocks[first:]:
+            if block[0] > end:
+                break
+            chosen.append(block)
+        if not chosen:
+            return
+        begin = chosen[0][2]
+        data = memoryview(
+            self.source.read_range(begin, chosen[-1][2] + chosen[-1][3])
+        )
+        for _, _, offset, size in chosen:
+            block = decode_block(
+                data[offset - begin : offset - begin + size],
+                self.chrom,
+                self.footer["vt"],
+            )
+            yield from block.fetch(start, end)
+
+
+if __name__ == "__main__":
+    pass
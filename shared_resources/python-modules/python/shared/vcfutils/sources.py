@@ -0,0 +1,193 @@
+import os
+import urllib.request
+import urllib.error
+
+import boto3
+import botocore
+
+from .bgzf import MAX_BLOCK_SIZE
+
+
+s3 = boto3.client("s3")
+
+
+class SourceError(Exception):
+    pass
+
+
+# random access to bytes of a local or remote file
+# end is exclusive and reads past the end of the file are clipped
+class ByteSource:
+    def __init__(self, location):
+        self.location = location
+
+    def read_range(self, start, end) -> bytes:
+        raise NotImplementedError
+
+    def read_tail(self, length):
+        # returns the last length bytes and the size of the file
+        raise NotImplementedError
+
+    def exists(self) -> bool:
+        raise NotImplementedError
+
+    def etag(self) -> str:
+        # identifies the content, changes when the file is replaced
+        raise NotImplementedError
+
+    def read_block_span(self, first, last):
+        # bytes of a bgzipped file from the block at first through the
+        # whole block at last, may run past the end of that block
+        return self.read_range(first, last + MAX_BLOCK_SIZE)
+
+    def prefetch(self, spans):
+        # hint that the block spans will be read, caching sources read ahead
+        pass
+
+
+class LocalSource(ByteSource):
+    def read_range(self, start, end):
+        with open(self.location, "rb") as f:
+            f.seek(start)
+            return f.read(max(0, end - start))
+
+    def read_tail(self, length):
+        size = os.path.getsize(self.location)
+        return self.read_range(max(0, size - length), size), size
+
+    def exists(self):
+        return os.path.isfile(self.location)
+
+    def etag(self):
+        try:
+            stat = os.stat(self.location)
+        except OSError as error:
+            raise SourceError(f"Could not read {self.location}: {error}")
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+class S3Source(ByteSource):
+    def __init__(self, location):
+        super().__init__(location)
+        self.bucket, self.key = location[len("s3://") :].split("/", 1)
+
+    def read_range(self, start, end):
+        if end <= start:
+            return b""
+        try:
+            response = s3.get_object(
+                Bucket=self.bucket, Key=self.key, Range=f"bytes={start}-{end - 1}"
+            )
+        except botocore.exceptions.ClientError as error:
+            if error.response["Error"]["Code"] == "InvalidRange":
+                return b""
+            raise SourceError(f"Could not read {self.location}: {error}")
+        except botocore.exceptions.BotoCoreError as error:
+            raise SourceError(f"Could not read {self.location}: {error}")
+        return response["Body"].read()
+
+    def read_tail(self, length):
+        try:
+            response = s3.get_object(
+                Bucket=self.bucket, Key=self.key, Range=f"bytes=-{length}"
+            )
+        except (
+            botocore.exceptions.ClientError,
+            botocore.exceptions.BotoCoreError,
+        ) as error:
+            raise SourceError(f"Could not read {self.location}: {error}")
+        data = response["Body"].read()
+        content_range = response.get("ContentRange")
+        size = int(content_range.split("/")[-1]) if content_range else len(data)
+        return data, size
+
+    def exists(self):
+        try:
+            s3.head_object(Bucket=self.bucket, Key=self.key)
+        except botocore.exceptions.ClientError:
+            return False
+        return True
+
+    def etag(self):
+        try:
+            response = s3.head_object(Bucket=self.bucket, Key=self.key)
+        except (
+            botocore.exceptions.ClientError,
+            botocore.exceptions.BotoCoreError,
+        ) as error:
+            raise SourceError(f"Could not read {self.location}: {error}")
+        return response["ETag"].strip('"')
+
+
+class HttpSource(ByteSource):
+    def read_range(self, start, end):
+        if end <= start:
+            return b""
+        request = urllib.request.Request(
+            self.location, headers={"Range": f"bytes={start}-{end - 1}"}
+        )
+        try:
+            with urllib.request.urlopen(request) as response:
+                data = response.read()
+                # server ignored the range header
+                if response.status == 200:
+                    data = data[start:end]
+                return data
+        except urllib.error.HTTPError as error:
+            if error.code == 416:
+                return b""
+            raise SourceError(f"Could not read {self.location}: {error}")
+
+    def read_tail(self, length):
+        request = urllib.request.Request(
+            self.location, headers={"Range": f"bytes=-{length}"}
+        )
+        try:
+            with urllib.request.urlopen(request) as response:
+                data = response.read()
+                content_range = response.headers.get("Content-Range")
+        except urllib.error.HTTPError as error:
+            raise SourceError(f"Could not read {self.location}: {error}")
+        if content_range:
+            return data, int(content_range.split("/")[-1])
+        return data[-length:], len(data)
+
+    def exists(self):
+        request = urllib.request.Request(self.location, method="HEAD")
+        try:
+            with urllib.request.urlopen(request):
+                return True
+        except urllib.error.URLError:
+            return False
+
+    def etag(self):
+        request = urllib.request.Request(self.location, method="HEAD")
+        try:
+            with urllib.request.urlopen(request) as response:
+                headers = response.headers
+        except urllib.error.URLError as error:
+            raise SourceError(f"Could not read {self.location}: {error}")
+        etag = headers.get("ETag") or headers.get("Last-Modified")
+        if not etag:
+            raise SourceError(f"No ETag or Last-Modified for {self.location}")
+        return etag.strip('"') + "-" + headers.get("Content-Length", "")
+
+
+def is_supported_location(location):
+    if location.startswith(("s3://", "http://", "https://")):
+        return True
+    return "://" not in location
+
+
+def open_source(location) -> ByteSource:
+    if location.startswith("s3://"):
+        return S3Source(location)
+    elif location.startswith(("http://", "https://")):
+        return HttpSource(location)
+    elif "://" not in location:
+        return LocalSource(location)
+    raise SourceError(f"Unsupported location {location}")
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,118 @@
+from array import array
+import hashlib
+import re
+import struct
+
+from .genotypes import allele_counts
+
+
+#
+# Count tiles of a single chromosome of a VCF
+#
+# A header of the magic bytes, the tile size, the number of tiles and the
+# etag of the VCF the tiles were counted from is followed by fixed width
+# little endian tiles, tile n covers the positions
+# n * tile_size + 1 to (n + 1) * tile_size
+#   sites      uint32   distinct called variants, as counted by performQuery
+#   ac         uint64   calls of the alternate alleles
+#   an         uint64   called alleles
+# so the tiles of a region are a single range read.
+#
+TILES_MAGIC = b"SCT2"
+TILE_SIZE = 100000
+HEADER = struct.Struct("<4sII64s")
+TILE = struct.Struct("<IQQ")
+get_all_calls = re.compile("[0-9]+").findall
+
+
+def tiles_key(vcf_location, chrom):
+    vcf_hash = hashlib.md5(vcf_location.encode()).hexdigest()
+    return f"vcf-tiles/{vcf_hash}/{chrom}.tiles"
+
+
+def allele_calls(record):
+    # calls of each alt and the number of called alleles, INFO is used
+    # when present and the genotypes otherwise
+    ac = record.ac
+    an = record.an
+    if ac is None or an is None:
+        counts = allele_counts(record.genotypes, len(record.alts))
+        if counts is None:
+            calls = get_all_calls(record.genotypes)
+            counts = [calls.count(str(n)) for n in range(len(record.alts) + 1)]
+        ac = counts[1:] if ac is None else ac
+        an = sum(counts) if an is None else an
+    return ac, an
+
+
+class TileWriter:
+    def __init__(self, file, chrom, etag="", tile_size=TILE_SIZE):
+        self.file = file
+        self.chrom = chrom
+        self.etag = etag
+        self.tile_size = tile_size
+        self.sites = array("I")
+        self.ac = array("Q")
+        self.an = array("Q")
+        # variants of the current position, duplicate records are counted once
+        self.pos = None
+        self.seen = set()
+
+    def add(self, record):
+        tile = (record.pos - 1) // self.tile_size
+        if tile >= len(self.sites):
+            padding = [0] * (tile + 1 - len(self.sites))
+            for column in (self.sites, self.ac, self.an):
+                column.extend(padding)
+        if record.pos != self.pos:
+            self.pos = record.pos
+            self.seen = set()
+
+        ac, an = allele_calls(record)
+        vt = record.vt or "N/A"
+        for alt, calls in zip(record.alts, ac):
+            if calls and (record.ref, alt, vt) not in self.seen:
+                self.seen.add((record.ref, alt, vt))
+                self.sites[tile] += 1
+        self.ac[tile] += sum(ac)
+        self.an[tile] += an
+
+    def close(self):
+        self.file.write(
+            HEADER.pack(
+                TILES_MAGIC, self.tile_size, len(self.sites), self.etag.encode()[:64]
+            )
+        )
+        for tile in zip(self.sites, self.ac, self.an):
+            self.file.write(TILE.pack(*tile))
+
+
+class TileReader:
+    def __init__(self, source, tile_size, tiles, etag):
+        self.source = source
+        self.tile_size = tile_size
+        self.tiles = tiles
+        # etag of the VCF the tiles were counted from
+        self.etag = etag
+
+    @classmethod
+    def open(cls, source):
+        header = source.read_range(0, HEADER.size)
+        if len(header) != HEADER.size or header[:4] != TILES_MAGIC:
+            raise ValueError("Not a tiles file")
+        _, tile_size, tiles, etag = HEADER.unpack(header)
+        return cls(source, tile_size, tiles, etag.rstrip(b"\x00").decode())
+
+    def read(self, first, last):
+        # (sites, ac, an) of tiles first to last, tiles past the end are empty
+        last = min(last, self.tiles - 1)
+        if first > last:
+            return []
+        data = self.source.read_range(
+            HEADER.size + first * TILE.size, HEADER.size + (last + 1) * TILE.size
+        )
+        return list(TILE.iter_unpack(data))
+
+
+if __name__ == "__main__":
+    pass
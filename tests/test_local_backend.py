@@ -0,0 +1,125 @@
+# Runs variant searches through the local execution backend in a process
+# without AWS credentials, tables or buckets.
+#
+# usage: python -m pytest tests
+import json
+import os
+import re
+import subprocess
+import sys
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SHARED = os.path.join(REPO, "shared_resources", "python-modules", "python")
+sys.path.insert(0, os.path.join(REPO, "benchmarks"))
+
+from synthetic_vcf import VcfSpec, write_vcf
+
+
+SEARCH = """
+import json
+import sys
+
+from shared.variantutils import perform_variant_search
+
+
+class Dataset:
+    def __init__(self, vcf):
+        self.id = "local"
+        self._vcfLocations = [vcf]
+        self._vcfChromosomeMap = [{"vcf": vcf, "chromosomes": ["chr1"]}]
+
+
+def search(start, end, granularity, **kwargs):
+    return [
+        response
+        for response in perform_variant_search(
+            datasets=[Dataset(sys.argv[1])],
+            reference_name="1",
+            reference_bases="N",
+            alternate_bases="N",
+            start=[start],
+            end=[end],
+            requested_granularity=granularity,
+            **kwargs,
+        )
+        if response.exists
+    ]
+
+
+records = search(50000, 150000, "record")
+with open(sys.argv[2], "w") as f:
+    json.dump(
+        {
+            "variants": sorted(
+                {variant for response in records for variant in response.variants}
+            ),
+            "exists": bool(search(0, 400000, "boolean")),
+            "page": sum(
+                len(response.variants)
+                for response in search(0, 400000, "record", page_size=10)
+            ),
+            "empty": bool(search(1000000, 1100000, "boolean")),
+        },
+        f,
+    )
+"""
+
+
+def local_environment(tmp_path):
+    # names of the tables, buckets and lambdas are read on import, none is
+    # reached by the local backend
+    with open(os.path.join(SHARED, "shared", "utils", "lambda_utils.py")) as f:
+        names = re.findall(r'os\.environ\["([A-Z_]+)"\]', f.read())
+    environment = {name: name.lower() for name in names}
+    environment.pop("VARIANTS_BUCKET", None)
+    environment.update(
+        {
+            "PATH": os.environ["PATH"],
+            "PYTHONPATH": os.pathsep.join(
+                [SHARED, os.environ.get("PYTHONPATH", "")]
+            ),
+            "HOME": str(tmp_path),
+            "TMPDIR": str(tmp_path),
+            "AWS_DEFAULT_REGION": "us-east-1",
+            "AWS_CONFIG_FILE": os.devnull,
+            "AWS_SHARED_CREDENTIALS_FILE": os.devnull,
+            "AWS_EC2_METADATA_DISABLED": "true",
+            "CONFIG_EXECUTION_BACKEND": "local",
+            "CONFIG_LOCAL_PROCESSES": "2",
+            "CONFIG_MAX_VARIANT_SEARCH_BASE_RANGE": "5000000",
+            "CONFIG_MAX_VARIANT_SEARCH_CONCURRENCY": "100",
+            "BEACON_DEFAULT_GRANULARITY": "boolean",
+            "BEACON_ENABLE_AUTH": "false",
+            "SPLIT_QUERY_LAMBDA": "splitQuery",
+        }
+    )
+    return environment
+
+
+def test_search_without_aws(tmp_path):
+    vcf = str(tmp_path / "local.vcf.gz")
+    result = str(tmp_path / "result.json")
+    positions = write_vcf(vcf, VcfSpec(samples=10, records=2000, sv_rate=0))["chr1"]
+
+    output = subprocess.run(
+        [sys.executable, "-c", SEARCH, vcf, result],
+        env=local_environment(tmp_path),
+        capture_output=True,
+        encoding="utf-8",
+        timeout=300,
+    )
+
+    assert output.returncode == 0, output.stderr
+    # every dynamodb or s3 call fails without credentials and is logged
+    assert "Unable to" not in output.stdout
+    assert "unavailable" not in output.stdout
+    with open(result) as f:
+        result = json.load(f)
+    found = {int(variant.split("\t")[1]) for variant in result["variants"]}
+    expected = {pos for pos in positions if 50000 < pos <= 150001}
+    assert found <= expected
+    # alternate alleles are called in most records
+    assert len(found) > 0.9 * len(expected)
+    assert result["exists"]
+    assert result["page"] >= 10
+    assert not result["empty"]
@@ -214,3 +214,9 @@ variable "config-max-variant-search-base-range" {
   description = "Max allowed range for variant searching"
   default     = 5000
 }
+
+variable "config-max-variant-search-concurrency" {
+  type        = number
+  description = "Max number of splitQuery lambdas a variant search can run at once, must be below the available lambda concurrency"
+  default     = 800
+}